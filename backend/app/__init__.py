@@ -2,6 +2,7 @@ from flask import Flask, request, redirect, jsonify
 from flask_cors import CORS
 from .extensions import db, login_manager, limiter, csrf, socketio, migrate
 from .models import User
+from .utils.instance import INSTANCE_DIR
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
@@ -16,7 +17,7 @@ def create_app():
     print("Backend Starting...")
     # Gunicorn runs from root, so 'build' should be in os.getcwd()
     static_folder = os.path.join(os.getcwd(), 'build')
-    app = Flask(__name__, static_folder=static_folder, static_url_path='')
+    app = Flask(__name__, static_folder=static_folder, static_url_path='', instance_path=INSTANCE_DIR)
 
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-prod')
@@ -151,11 +152,12 @@ def create_app():
     
     # Import socket handlers to register them
     from . import sockets
-    from .utils.auto_loader import load_knowledge_base
+    from .utils.auto_loader import kb_index_command
+    app.cli.add_command(kb_index_command)
 
     with app.app_context():
         db.create_all()
-        # Auto-load knowledge base files
-        load_knowledge_base(app)
 
+    # The background knowledge base indexer is started by the server entry
+    # point (wsgi.py), not here, so CLI commands never spawn it
     return app
@@ -1,64 +1,50 @@
 from typing import Dict, Any, List
 
-try:
-    from faster_whisper import WhisperModel
-    _model_available = True
-except ImportError:
+from .services.asr_service import ASRUnavailable, asr_service
+from .services.whisper_registry import whisper_registry
+
+if not whisper_registry.available:
     print("Warning: faster-whisper not installed. ASR disabled.")
-    _model_available = False
-    WhisperModel = None
 
-# Lazy loading variable
-_model = None
 
 def get_model():
-    global _model
-    if _model is None and _model_available:
-        try:
-            print("Loading Whisper model...")
-            # Use tiny model to save memory on Render free tier
-            _model = WhisperModel("tiny", device="cpu", compute_type="int8")
-        except Exception as e:
-            print(f"Warning: Failed to load Whisper model: {e}")
-            _model = None
-    return _model
+    """The shared Whisper model (see services/whisper_registry), or None."""
+    return whisper_registry.get()
 
-def transcribe_audio_with_words(path: str, language: str = "en") -> Dict[str, Any]:
+def transcribe_audio_with_words(audio, language: str = "en") -> Dict[str, Any]:
     """
-    Run ASR on the audio file and return word-level timestamps.
+    Run ASR and return word-level timestamps.
+
+    `audio` is a file path or, to skip decoding the file a second time, the
+    already-decoded samples as 16 kHz mono float32 (see to_whisper_audio).
+    Goes through the shared ASR queue (services/asr_service).
     """
-    model = get_model()
-    if model is None:
+    try:
+        result = asr_service.transcribe(audio, language=language, word_timestamps=True)
+    except ASRUnavailable:
         return {
             "full_text": "ASR model not loaded.",
             "language": language,
             "words": []
         }
 
-    segments, info = model.transcribe(
-        path,
-        language=language,
-        beam_size=5,
-        word_timestamps=True
-    )
-
     words: List[Dict[str, Any]] = []
     full_text_parts: List[str] = []
 
-    for seg in segments:
-        if seg.text:
-            full_text_parts.append(seg.text.strip())
-        for w in seg.words:
+    for seg in result["segments"]:
+        if seg["text"]:
+            full_text_parts.append(seg["text"].strip())
+        for w in seg["words"]:
             words.append({
-                "text": w.word.strip(),
-                "start_s": float(w.start),
-                "end_s": float(w.end)
+                "text": w["word"].strip(),
+                "start_s": w["start"],
+                "end_s": w["end"]
             })
 
     full_text = " ".join(full_text_parts).strip()
 
     return {
         "full_text": full_text,
-        "language": language or info.language,
+        "language": result["language"],
         "words": words
     }
@@ -70,9 +70,21 @@ class KnowledgeDocument(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     source = db.Column(db.String(255), nullable=False)
-    embedding = db.Column(db.JSON)
+    # Packed vector, see utils/embedding_codec.py
+    embedding = db.Column(db.LargeBinary)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class KnowledgeBaseState(db.Model):
+    """
+    Single row (id 1) counting knowledge base writes, so every worker can tell
+    its vector index is stale even when row counts and ids happen to match.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    # Bumped by every ingestion and every removal
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    # Generation of the last removal; none since an index was built means it can be appended to
+    removal_generation = db.Column(db.Integer, nullable=False, default=0)
+
 # Community Models (Tier 6)
 
 class SharedVoiceSample(db.Model):
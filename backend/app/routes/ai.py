@@ -102,6 +102,18 @@ def list_knowledge_base():
     })
 
 
+@ai_bp.route('/knowledge-base/stats', methods=['GET'])
+@login_required
+def knowledge_base_stats():
+    # Security Check: Only allow admin to view
+    admin_username = os.environ.get('ADMIN_USERNAME')
+    if not admin_username or current_user.username != admin_username:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    # Retrieval cache hit/miss counters and latency, index size
+    return jsonify(rag_system.cache_stats())
+
+
 @ai_bp.route('/chat', methods=['POST'])
 @login_required
 @limiter.limit("10 per minute")
@@ -2,18 +2,28 @@
 Voice Analysis Route - Lightweight Version
 Provides endpoints for analyzing recorded audio with voice metrics.
 Uses librosa for analysis and faster-whisper for transcription (no compilation needed).
+
+Frame-level tracks are extracted once per file (FrameTracks); overall and
+per-word metrics are aggregates of those tracks over time spans. Silences are
+cut first (utils/vad), so tracking and ASR only process speech; word times are
+mapped back onto the original recording.
 """
 
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 import os
 import tempfile
+from ..services.whisper_registry import WHISPER_ANALYZE_MODEL_SIZE, whisper_registry
 try:
     import numpy as np
     import librosa
     from scipy import signal
     from scipy.stats import skew, kurtosis
-    from faster_whisper import WhisperModel
+    # These need numpy themselves
+    from ..services.pitch_engines import PITCH_ENGINE, estimate_pitch
+    from ..services.asr_service import ASRQueueFull, ASRTimeout, asr_service, to_whisper_audio
+    from ..utils.span_stats import PrefixStats, frame_range
+    from ..utils.vad import ANALYSIS_VAD, SpeechSegments, detect_speech
     _deps_available = True
 except ImportError:
     _deps_available = False
@@ -22,42 +32,47 @@ except ImportError:
     signal = None
     skew = None
     kurtosis = None
-    WhisperModel = None
+    PITCH_ENGINE = None
+    estimate_pitch = None
+    ASRQueueFull = None
+    ASRTimeout = None
+    asr_service = None
+    to_whisper_audio = None
+    PrefixStats = None
+    frame_range = None
+    ANALYSIS_VAD = False
+    SpeechSegments = None
+    detect_speech = None
 
 analysis_bp = Blueprint('analysis', __name__)
 
-# Load Whisper model once at startup
-whisper_model = None
-
-
 
-def get_whisper_model():
-    """Lazy load Faster Whisper model"""
-    global whisper_model
-    if WhisperModel is None:
-        print("Faster Whisper not installed.")
-        return None
-        
-    if whisper_model is None:
-        print("Loading Faster Whisper model (base)...")
-        # Use base model, runs on CPU efficiently
-        whisper_model = WhisperModel("base", device="cpu", compute_type="int8")
-    return whisper_model
+# Frame grid shared by every track (librosa's defaults: centred 2048-sample
+# frames, 512-sample hop), so track i always describes time i * HOP / sr.
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
 
 
-def extract_pitch_librosa(y, sr):
-    """Extract pitch using librosa's pyin algorithm"""
+def extract_pitch_librosa(y, sr, engine=None):
+    """
+    Pitch summary of a whole signal with `engine` (default: PITCH_ENGINE).
+    Kept for existing callers; the analyze route reads pitch from
+    FrameTracks instead.
+    """
     try:
-        f0, voiced_flag, voiced_probs = librosa.pyin(
+        f0 = estimate_pitch(
             y,
+            sr,
             fmin=librosa.note_to_hz('C2'),  # ~65 Hz
             fmax=librosa.note_to_hz('C6'),  # ~1047 Hz
-            sr=sr
+            frame_length=FRAME_LENGTH,
+            hop_length=HOP_LENGTH,
+            engine=engine
         )
-        
+
         # Filter out unvoiced frames
         f0_voiced = f0[~np.isnan(f0)]
-        
+
         if len(f0_voiced) > 0:
             return {
                 'mean': float(np.mean(f0_voiced)),
@@ -73,69 +88,46 @@ def extract_pitch_librosa(y, sr):
         return None
 
 
-def estimate_formants_lpc(y, sr, n_formants=3):
-    """Estimate formants using Linear Predictive Coding"""
+def estimate_formant_track(y, sr, n_formants=3, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """
+    Frame-wise LPC formants on the shared frame grid.
+
+    Returns an (n_frames, n_formants) array, NaN where a formant is missing.
+    All frames are solved in one batch: LPC coefficients via librosa.lpc along
+    the frame axis, roots via the eigenvalues of the stacked companion matrices.
+    """
+    n_frames = 1 + len(y) // hop_length
+    track = np.full((n_frames, n_formants), np.nan)
     try:
         # Pre-emphasis filter
         pre_emphasis = 0.97
         y_emphasized = np.append(y[0], y[1:] - pre_emphasis * y[:-1])
-        
+        padded = np.pad(y_emphasized, frame_length // 2)
+        frames = librosa.util.frame(padded, frame_length=frame_length, hop_length=hop_length).T[:n_frames]
+
         # LPC analysis
         lpc_order = 2 + sr // 1000  # Rule of thumb: 2 + (sample_rate / 1000)
-        a = librosa.lpc(y_emphasized, order=lpc_order)
-        
-        # Find roots of LPC polynomial
-        roots = np.roots(a)
-        roots = roots[np.imag(roots) >= 0]  # Keep only positive frequencies
-        
-        # Convert to frequencies
-        angles = np.arctan2(np.imag(roots), np.real(roots))
-        freqs = sorted(angles * (sr / (2 * np.pi)))
-        
-        # Extract first n_formants
-        formants = {}
-        for i in range(min(n_formants, len(freqs))):
-            if freqs[i] > 0:  # Valid formant
-                formants[f'f{i+1}'] = float(freqs[i])
-        
-        return formants if formants else {'f1': None, 'f2': None, 'f3': None}
-        
-    except Exception as e:
-        print(f"Formant extraction error: {e}")
-        return {'f1': None, 'f2': None, 'f3': None}
+        a = librosa.lpc(np.ascontiguousarray(frames), order=lpc_order, axis=-1)
+        valid = np.all(np.isfinite(a), axis=1)
+        a = a[valid]
 
+        # Roots of every LPC polynomial: eigenvalues of its companion matrix
+        companion = np.zeros((len(a), lpc_order, lpc_order))
+        companion[:, 0, :] = -a[:, 1:] / a[:, :1]
+        companion[:, np.arange(1, lpc_order), np.arange(lpc_order - 1)] = 1.0
+        roots = np.linalg.eigvals(companion)
 
-def calculate_jitter_shimmer(y, sr, f0_contour):
-    """Estimate jitter and shimmer from pitch contour"""
-    try:
-        # Remove NaN values
-        f0_valid = f0_contour[~np.isnan(f0_contour)]
-        
-        if len(f0_valid) < 3:
-            return None, None
-        
-        # Jitter: period-to-period variation in pitch
-        periods = 1.0 / f0_valid
-        period_diffs = np.abs(np.diff(periods))
-        jitter = (np.mean(period_diffs) / np.mean(periods)) * 100  # Percentage
-        
-        # Shimmer: amplitude variation
-        # Use RMS energy in short frames as proxy
-        frame_length = int(sr * 0.01)  # 10ms frames
-        hop_length = frame_length // 2
-        rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
-        
-        if len(rms) > 1:
-            rms_diffs = np.abs(np.diff(rms))
-            shimmer = (np.mean(rms_diffs) / np.mean(rms)) * 100  # Percentage
-        else:
-            shimmer = None
-        
-        return float(jitter), float(shimmer) if shimmer else None
-        
+        # Convert to frequencies, keeping only positive-frequency roots
+        angles = np.arctan2(np.imag(roots), np.real(roots))
+        freqs = np.where(np.imag(roots) >= 0, angles * (sr / (2 * np.pi)), np.inf)
+        freqs.sort(axis=1)
+
+        # First n_formants, skipping invalid (zero-frequency) roots
+        first = freqs[:, :n_formants]
+        track[np.flatnonzero(valid), :first.shape[1]] = np.where(np.isfinite(first) & (first > 0), first, np.nan)
     except Exception as e:
-        print(f"Jitter/Shimmer calculation error: {e}")
-        return None, None
+        print(f"Formant extraction error: {e}")
+    return track
 
 
 def calculate_hnr(y, sr):
@@ -160,6 +152,146 @@ def calculate_hnr(y, sr):
         return None
 
 
+class FrameTracks:
+    """
+    Frame-level tracks for a whole recording, computed once: F0 (from the
+    configured pitch engine), RMS intensity, spectral centroid/rolloff and LPC
+    formants on the shared frame grid, plus the 10 ms RMS track used for shimmer. Metrics for any time span
+    (`span_metrics`) are aggregated from these tracks with prefix sums, so
+    each word costs O(1) for means/std and O(frames in word) for min/max/median.
+    """
+
+    def __init__(self, y, sr):
+        self.y = y
+        self.sr = sr
+
+        # Pitch, from the configured engine (PITCH_ENGINE; pyin by default)
+        self.f0 = estimate_pitch(
+            y,
+            sr,
+            fmin=librosa.note_to_hz('C2'),  # ~65 Hz
+            fmax=librosa.note_to_hz('C6'),  # ~1047 Hz
+            frame_length=FRAME_LENGTH,
+            hop_length=HOP_LENGTH
+        )
+        self.times = librosa.frames_to_time(np.arange(len(self.f0)), sr=sr, hop_length=HOP_LENGTH)
+
+        # Intensity (RMS energy in dB; the 80 dB floor is relative to the whole file)
+        rms = librosa.feature.rms(y=y, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)[0]
+        self.rms_db = librosa.amplitude_to_db(rms)
+
+        # Spectral features (for voice quality), sharing one magnitude spectrogram
+        S = np.abs(librosa.stft(y, n_fft=FRAME_LENGTH, hop_length=HOP_LENGTH))
+        self.centroid = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
+        self.rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr)[0]
+
+        # Formants
+        self.formants = estimate_formant_track(y, sr)
+
+        # Shimmer proxy: RMS in 10 ms frames
+        shimmer_frame = max(int(sr * 0.01), 2)
+        shimmer_hop = shimmer_frame // 2
+        self.shimmer_rms = librosa.feature.rms(y=y, frame_length=shimmer_frame, hop_length=shimmer_hop)[0]
+        self.shimmer_times = librosa.frames_to_time(np.arange(len(self.shimmer_rms)), sr=sr, hop_length=shimmer_hop)
+
+        # Jitter: period-to-period variation over the voiced frames, in order
+        voiced = ~np.isnan(self.f0)
+        periods = 1.0 / self.f0[voiced]
+        self._voiced_before = np.concatenate(([0], np.cumsum(voiced)))
+
+        # Prefix-sum indexes for O(1) span aggregates
+        self._f0 = PrefixStats(self.f0)
+        self._rms_db = PrefixStats(self.rms_db)
+        self._centroid = PrefixStats(self.centroid)
+        self._rolloff = PrefixStats(self.rolloff)
+        self._formants = [PrefixStats(self.formants[:, i]) for i in range(self.formants.shape[1])]
+        self._periods = PrefixStats(periods)
+        self._period_diffs = PrefixStats(np.abs(np.diff(periods)))
+        self._shimmer_rms = PrefixStats(self.shimmer_rms)
+        self._shimmer_diffs = PrefixStats(np.abs(np.diff(self.shimmer_rms)))
+
+    def _pitch(self, i0, i1):
+        contour = self.f0[i0:i1]
+        f0_voiced = contour[~np.isnan(contour)]
+        if len(f0_voiced) == 0:
+            return None
+        return {
+            'mean': float(self._f0.mean(i0, i1)),
+            'min': float(np.min(f0_voiced)),
+            'max': float(np.max(f0_voiced)),
+            'std': float(self._f0.std(i0, i1)),
+            'median': float(np.median(f0_voiced)),
+            'contour': contour.tolist()  # Full contour for visualization
+        }
+
+    def _jitter(self, i0, i1):
+        # Voiced frames in [i0, i1) are periods [j0, j1) of the compacted track
+        j0, j1 = self._voiced_before[i0], self._voiced_before[i1]
+        if j1 - j0 < 3:
+            return None
+        return float(self._period_diffs.mean(j0, j1 - 1) / self._periods.mean(j0, j1) * 100)  # Percentage
+
+    def _shimmer(self, start_time, end_time):
+        k0, k1 = frame_range(self.shimmer_times, start_time, end_time, min_frames=1)
+        if k1 - k0 < 2:
+            return None
+        shimmer = self._shimmer_diffs.mean(k0, k1 - 1) / self._shimmer_rms.mean(k0, k1) * 100  # Percentage
+        return float(shimmer) if shimmer else None
+
+    def span_metrics(self, start_time=None, end_time=None):
+        """
+        Voice metrics for [start_time, end_time) (the whole file by default):
+        pitch, formants, jitter, shimmer, HNR, intensity and spectral features.
+        """
+        whole_file = start_time is None or end_time is None
+        if whole_file:
+            start_time, end_time = 0.0, np.inf
+        i0, i1 = frame_range(self.times, start_time, end_time, min_frames=1)
+
+        metrics = {}
+
+        # Pitch analysis
+        pitch_data = self._pitch(i0, i1)
+        metrics['pitch'] = pitch_data
+
+        # Formants (mean of the frame-wise estimates)
+        formants = {}
+        for i, stats in enumerate(self._formants):
+            value = stats.mean(i0, i1)
+            if not np.isnan(value):
+                formants[f'f{i+1}'] = float(value)
+        metrics['formants'] = formants if formants else {'f1': None, 'f2': None, 'f3': None}
+
+        # Jitter and Shimmer (both need at least 3 voiced frames)
+        jitter = self._jitter(i0, i1) if pitch_data else None
+        if jitter is not None:
+            metrics['jitter'] = jitter
+            metrics['shimmer'] = self._shimmer(start_time, end_time)
+        else:
+            metrics['jitter'] = None
+            metrics['shimmer'] = None
+
+        # HNR (autocorrelation of the span's samples)
+        segment = self.y if whole_file else self.y[int(start_time * self.sr):int(end_time * self.sr)]
+        metrics['hnr'] = calculate_hnr(segment, self.sr)
+
+        # Intensity
+        if i1 > i0:
+            metrics['intensity'] = {
+                'mean': float(self._rms_db.mean(i0, i1)),
+                'max': float(np.max(self.rms_db[i0:i1]))
+            }
+        else:
+            metrics['intensity'] = None
+
+        metrics['spectral'] = {
+            'centroid': float(self._centroid.mean(i0, i1)),
+            'rolloff': float(self._rolloff.mean(i0, i1))
+        }
+
+        return metrics
+
+
 def extract_voice_metrics(y, sr, start_time=None, end_time=None):
     """
     Extract voice metrics from audio segment using librosa.
@@ -172,83 +304,46 @@ def extract_voice_metrics(y, sr, start_time=None, end_time=None):
     
     Returns:
         dict with pitch, formants, jitter, shimmer, HNR, intensity
+
+    Pitch comes from the configured engine (PITCH_ENGINE), as in FrameTracks.
+    For many segments of one file, build FrameTracks once and call
+    span_metrics per segment instead.
     """
     # Extract segment if times provided
     if start_time is not None and end_time is not None:
         start_sample = int(start_time * sr)
         end_sample = int(end_time * sr)
         y = y[start_sample:end_sample]
-    
-    metrics = {}
-    
-    # Pitch analysis
-    pitch_data = extract_pitch_librosa(y, sr)
-    metrics['pitch'] = pitch_data
-    
-    # Formants
-    metrics['formants'] = estimate_formants_lpc(y, sr)
-    
-    # Jitter and Shimmer
-    if pitch_data and 'contour' in pitch_data:
-        jitter, shimmer = calculate_jitter_shimmer(y, sr, np.array(pitch_data['contour']))
-        metrics['jitter'] = jitter
-        metrics['shimmer'] = shimmer
-    else:
-        metrics['jitter'] = None
-        metrics['shimmer'] = None
-    
-    # HNR
-    metrics['hnr'] = calculate_hnr(y, sr)
-    
-    # Intensity (RMS energy in dB)
-    rms = librosa.feature.rms(y=y)[0]
-    if len(rms) > 0:
-        rms_db = librosa.amplitude_to_db(rms)
-        metrics['intensity'] = {
-            'mean': float(np.mean(rms_db)),
-            'max': float(np.max(rms_db))
-        }
-    else:
-        metrics['intensity'] = None
-    
-    # Spectral features (for voice quality)
-    spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-    
-    metrics['spectral'] = {
-        'centroid': float(np.mean(spectral_centroid)),
-        'rolloff': float(np.mean(spectral_rolloff))
-    }
-    
-    return metrics
+
+    return FrameTracks(y, sr).span_metrics()
 
 
-def transcribe_with_timing(audio_path):
+def transcribe_with_timing(audio):
     """
     Transcribe audio and get word-level timing using Faster Whisper.
     
     Args:
-        audio_path: Path to audio file
+        audio: Path to audio file, or decoded 16 kHz mono float32 samples
     
     Returns:
         dict with 'text' and 'words' (list of {word, start, end})
     """
-    model = get_whisper_model()
-    
-    # Transcribe with word timestamps
-    segments, info = model.transcribe(audio_path, word_timestamps=True, language='en')
-    
+    # Shared, queued Whisper inference (services/asr_service); word timing
+    # needs the larger model (WHISPER_ANALYZE_MODEL_SIZE, base by default)
+    result = asr_service.transcribe(audio, language='en', word_timestamps=True,
+                                    model_size=WHISPER_ANALYZE_MODEL_SIZE)
+
     # Extract word-level timing
     words = []
     full_text = []
-    
-    for segment in segments:
-        full_text.append(segment.text)
-        for word in segment.words:
+
+    for segment in result['segments']:
+        full_text.append(segment['text'])
+        for word in segment['words']:
             words.append({
-                'text': word.word.strip(),
-                'start': word.start,
-                'end': word.end
+                'text': word['word'].strip(),
+                'start': word['start'],
+                'end': word['end']
             })
     
     return {
@@ -266,7 +361,7 @@ def analyze_audio():
     Returns: JSON with transcript, word-level metrics, and overall statistics
     """
 
-    if not _deps_available:
+    if not _deps_available or not whisper_registry.available:
         return jsonify({'error': 'Analysis dependencies (numpy, librosa, etc.) not installed.'}), 503
 
     # Check if file was uploaded
@@ -287,28 +382,33 @@ def analyze_audio():
         print("Loading audio...")
         y, sr = librosa.load(temp_path, sr=None)  # Keep original sample rate
         
-        # Get overall metrics
-        print("Extracting overall metrics...")
-        overall_metrics = extract_voice_metrics(y, sr)
+        # Speech spans; everything below runs on the speech only
+        speech = detect_speech(y, sr) if ANALYSIS_VAD else SpeechSegments.whole(sr, len(y))
+        y_speech = speech.trim(y)
+
+        # Frame-level tracks for the whole file, computed once
+        print("Extracting frame tracks...")
+        tracks = FrameTracks(y_speech, sr)
+        overall_metrics = tracks.span_metrics()
         
         # Transcribe and get word timing
         print("Transcribing audio...")
-        transcription = transcribe_with_timing(temp_path)
+        transcription = transcribe_with_timing(to_whisper_audio(y_speech, sr))
         
-        # Extract metrics for each word
+        # Aggregate the tracks over each word's time span (word times are in
+        # the trimmed signal; the response reports original times)
         print("Analyzing word-level metrics...")
         words_with_metrics = []
         for word_info in transcription['words']:
-            word_metrics = extract_voice_metrics(
-                y, sr,
+            word_metrics = tracks.span_metrics(
                 start_time=word_info['start'],
                 end_time=word_info['end']
             )
             
             words_with_metrics.append({
                 'text': word_info['text'],
-                'start': word_info['start'],
-                'end': word_info['end'],
+                'start': float(speech.to_original(word_info['start'])),
+                'end': float(speech.to_original(word_info['end'], is_end=True)),
                 'metrics': word_metrics
             })
         
@@ -328,6 +428,14 @@ def analyze_audio():
         }
         
         return jsonify(response), 200
+
+    except ASRQueueFull as e:
+        response = jsonify({'error': 'Transcription queue is full, please retry shortly.'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+
+    except ASRTimeout as e:
+        return jsonify({'error': str(e)}), 504
         
     except Exception as e:
         print(f"Analysis error: {e}")
@@ -344,7 +452,11 @@ def analyze_audio():
 @analysis_bp.route('/api/analyze/status', methods=['GET'])
 def analysis_status():
     """Health check endpoint"""
+    whisper_stats = whisper_registry.stats()
     return jsonify({
         'status': 'ready',
-        'whisper_loaded': whisper_model is not None
+        'whisper_loaded': bool(whisper_stats['models']),
+        'whisper': whisper_stats,
+        'asr': asr_service.stats() if asr_service is not None else None,
+        'pitch_engine': PITCH_ENGINE
     }), 200
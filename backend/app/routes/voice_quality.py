@@ -2,27 +2,32 @@ from flask import Blueprint, request, jsonify, send_file
 import os
 import tempfile
 import soundfile as sf
-from ..voice_quality_analysis import analyze_file, analyze_file_with_transcript, GOAL_PRESETS, clean_audio_signal, load_audio
-from ..asr_transcriber import transcribe_audio_with_words
+from ..voice_quality_analysis import GOAL_PRESETS, clean_audio_signal, load_audio, to_json_safe, score_against_goal
+from ..services.analysis_cache import complete_transcript, load_feature_bundle
+from ..services.analysis_executor import analysis_executor, run_voice_quality_analysis, AnalysisQueueFull, AnalysisTimeout
+from ..services.analysis_jobs import JobStoreFull, job_store, submit_analysis_job
+from ..services.asr_service import ASRQueueFull, ASRTimeout
 from ..validators import validate_file_upload
 from ..extensions import limiter
 
 voice_quality_bp = Blueprint('voice_quality', __name__)
 
-@voice_quality_bp.route('/api/voice-quality/analyze', methods=['POST'])
-@limiter.limit("10 per minute")
-def analyze():
+def _read_analysis_upload():
+    """
+    Validate the 'audio' upload and form options and save the file to a temp path.
+    Returns (params, None) on success or (None, error_response).
+    """
     if "audio" not in request.files:
-        return jsonify({"error": "No audio file uploaded (field name 'audio' required)."}), 400
+        return None, (jsonify({"error": "No audio file uploaded (field name 'audio' required)."}), 400)
 
     file = request.files["audio"]
     if file.filename == "":
-        return jsonify({"error": "Empty filename."}), 400
+        return None, (jsonify({"error": "Empty filename."}), 400)
 
     # Security: Validate file type (only audio allowed)
     is_valid, error = validate_file_upload(file.filename, allowed_types=['audio'])
     if not is_valid:
-        return jsonify({"error": error}), 400
+        return None, (jsonify({"error": error}), 400)
 
     goal_name = request.form.get("goal", "transfem_soft_slightly_breathy")
     if goal_name not in GOAL_PRESETS:
@@ -35,23 +40,124 @@ def analyze():
         tmp_path = tmp.name
         file.save(tmp_path)
 
+    return {"path": tmp_path, "goal_name": goal_name, "include_transcript": include_transcript}, None
+
+def _queue_full_response(e):
+    response = jsonify({"error": "Analysis queue is full, please retry shortly."})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+@voice_quality_bp.route('/api/voice-quality/analyze', methods=['POST'])
+@limiter.limit("10 per minute")
+def analyze():
+    params, error_response = _read_analysis_upload()
+    if error_response:
+        return error_response
+    tmp_path = params["path"]
+
     try:
-        if include_transcript:
-            result = analyze_file_with_transcript(
-                tmp_path,
-                goal_name=goal_name,
-                transcriber=transcribe_audio_with_words,
-                language="en"
-            )
-        else:
-            result = analyze_file(tmp_path, goal_name=goal_name)
+        # Runs in the analysis worker pool so a long file cannot stall this server.
+        # The upload is deleted once the job is done with it; after a timeout
+        # the job may still be queued or running when this request returns.
+        result, pending = analysis_executor.run(
+            run_voice_quality_analysis,
+            tmp_path,
+            params["goal_name"],
+            params["include_transcript"],
+            "en",
+            on_done=lambda: _remove_file(tmp_path)
+        )
+        # Transcription runs here, on the shared ASR queue and Whisper model
+        result = complete_transcript(result, pending)
+    except (AnalysisQueueFull, ASRQueueFull) as e:
+        return _queue_full_response(e)
+    except (AnalysisTimeout, ASRTimeout) as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
 
-    return jsonify(result)
+    return jsonify(to_json_safe(result))
+
+# ----------------------
+# Asynchronous analysis jobs (upload, then poll)
+# ----------------------
+
+@voice_quality_bp.route('/api/voice-quality/jobs', methods=['POST'])
+@limiter.limit("10 per minute")
+def create_analysis_job():
+    params, error_response = _read_analysis_upload()
+    if error_response:
+        return error_response
+    tmp_path = params["path"]
+
+    try:
+        job = submit_analysis_job(
+            tmp_path,
+            params["goal_name"],
+            include_transcript=params["include_transcript"],
+            language="en",
+            on_done=lambda: _remove_file(tmp_path)
+        )
+    except (AnalysisQueueFull, JobStoreFull) as e:
+        _remove_file(tmp_path)
+        return _queue_full_response(e)
+    except Exception as e:
+        _remove_file(tmp_path)
+        return jsonify({"error": str(e)}), 500
+
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = f"/api/voice-quality/jobs/{job.id}"
+    return response
+
+@voice_quality_bp.route('/api/voice-quality/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired."}), 404
+    return jsonify(job.to_dict())
+
+@voice_quality_bp.route('/api/voice-quality/jobs/<job_id>/result', methods=['GET'])
+def get_analysis_job_result(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired."}), 404
+    if job.status == "error":
+        return jsonify({"error": job.error, "job": job.to_dict()}), 500
+    if job.status != "done":
+        # Not finished yet: the client should keep polling
+        return jsonify(job.to_dict()), 202
+    return jsonify(to_json_safe(job.result))
+
+# ----------------------
+# Re-scoring extracted features against goal presets
+# ----------------------
+
+@voice_quality_bp.route('/api/voice-quality/bundles/<bundle_id>/scores', methods=['GET'])
+def score_bundle(bundle_id):
+    """
+    Score a previously analysed recording (the `bundle_id` of an analyze
+    result) against the presets given as repeated `goal` query parameters,
+    or against every preset when none is given. No audio is re-analysed.
+    """
+    goal_names = request.args.getlist("goal") or list(GOAL_PRESETS)
+    unknown = [g for g in goal_names if g not in GOAL_PRESETS]
+    if unknown:
+        return jsonify({"error": f"Unknown goal preset(s): {', '.join(unknown)}"}), 400
+
+    bundle = load_feature_bundle(bundle_id)
+    if bundle is None:
+        return jsonify({"error": "Features not found or expired; analyze the recording again."}), 404
+
+    return jsonify(to_json_safe({
+        "bundle_id": bundle_id,
+        "scores": {goal_name: score_against_goal(bundle, goal_name) for goal_name in goal_names}
+    }))
 
 @voice_quality_bp.route('/api/voice-quality/clean', methods=['POST'])
 @limiter.limit("5 per minute")
@@ -0,0 +1,341 @@
+"""
+analysis_cache.py
+
+Content-addressed cache in front of the offline voice-quality analysis.
+
+Entries are keyed by a SHA-256 of the decoded PCM (after load_audio's
+resampling and normalisation, so the same recording re-encoded or renamed
+still hits), the ANALYSIS_VERSION constant and the kind of entry:
+
+- "features": the goal-independent FeatureBundle (stored via to_bytes). The
+  goal comparison is re-applied on every hit (apply_goal), so one entry
+  serves every goal preset. With a backend shared across processes
+  (sqlite), the key doubles as the bundle's `bundle_id`, which the
+  re-score endpoint resolves with `load_feature_bundle`. The other backends
+  live in the analysis worker, out of the web process's reach, so their
+  results carry no `bundle_id`;
+- "asr:<language>": the raw ASR transcript (as JSON), so toggling
+  include_transcript or switching goals never re-runs Whisper.
+
+Transcription itself happens in the web process (complete_transcript),
+through the shared ASR queue and Whisper model; the analysis workers only
+extract features (analyze_file_for_transcript_cached).
+
+Backends only store bytes (the FeatureBundle npz format or UTF-8 JSON), so
+nothing read back from the cache is ever unpickled.
+
+Backends (ANALYSIS_CACHE_BACKEND):
+    sqlite   on-disk SQLite file shared by every process (default)
+    memory   in-process LRU
+    none     caching disabled
+Both real backends evict least-recently-used entries once the stored size
+exceeds ANALYSIS_CACHE_MAX_MB (default: 256). ANALYSIS_CACHE_PATH sets the
+SQLite file (default: analysis_cache.sqlite3 in the instance directory).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .feature_bundle import _json_default
+from ..utils.instance import instance_file
+
+ANALYSIS_CACHE_BACKEND = os.environ.get('ANALYSIS_CACHE_BACKEND', 'sqlite').lower()
+ANALYSIS_CACHE_MAX_BYTES = int(float(os.environ.get('ANALYSIS_CACHE_MAX_MB', 256)) * 1024 * 1024)
+ANALYSIS_CACHE_PATH = os.environ.get('ANALYSIS_CACHE_PATH')
+
+
+def audio_cache_key(y, sr, kind, version):
+    """Cache key for decoded audio `y` at `sr` Hz."""
+    digest = hashlib.sha256()
+    digest.update(f"{version}|{kind}|{int(sr)}|{y.dtype.str}|".encode())
+    digest.update(memoryview(np.ascontiguousarray(y)).cast('B'))
+    return digest.hexdigest()
+
+
+def _as_bytes(value):
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+        raise TypeError(f"Cache values must be bytes, not {type(value).__name__}")
+    return bytes(value)
+
+
+class NullCache:
+    """Backend that stores nothing (ANALYSIS_CACHE_BACKEND=none)."""
+
+    shared = False
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryLRUCache:
+    """In-process LRU of bytes values, bounded by their total size."""
+
+    # Private to the process (an analysis worker, usually)
+    shared = False
+
+    def __init__(self, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            blob = self._items.get(key)
+            if blob is None:
+                return None
+            self._items.move_to_end(key)
+            return blob
+
+    def set(self, key, value):
+        blob = _as_bytes(value)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self._items[key] = blob
+            self.total_bytes += len(blob)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+
+class SQLiteCache:
+    """
+    On-disk LRU in a single SQLite table, safe to share between the web
+    process and the analysis workers. Eviction drops the least recently
+    read/written rows until the stored blobs fit in `max_bytes`.
+    """
+
+    shared = True
+
+    def __init__(self, path=None, max_bytes=ANALYSIS_CACHE_MAX_BYTES, table='analysis_cache'):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name '{table}'")
+        self.path = path or ANALYSIS_CACHE_PATH or instance_file('analysis_cache.sqlite3')
+        self.max_bytes = max_bytes
+        self.table = table
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_accessed ON {table} (accessed_at)")
+
+    def _connect(self):
+        # sqlite3 connections must not cross threads (or processes)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return bytes(row[0])
+
+    def set(self, key, value):
+        blob = _as_bytes(value)
+        if len(blob) > self.max_bytes:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(blob), len(blob), time.time())
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn):
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at"):
+            doomed.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", doomed)
+
+    def clear(self):
+        self._connect().execute(f"DELETE FROM {self.table}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    """Process-wide cache backend selected by ANALYSIS_CACHE_BACKEND."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if ANALYSIS_CACHE_BACKEND == 'memory':
+                _cache = MemoryLRUCache()
+            elif ANALYSIS_CACHE_BACKEND == 'sqlite':
+                try:
+                    _cache = SQLiteCache()
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Warning: analysis cache unavailable ({e}); falling back to memory.")
+                    _cache = MemoryLRUCache()
+            else:
+                _cache = NullCache()
+        return _cache
+
+
+def load_feature_bundle(bundle_id, cache=None):
+    """Cached FeatureBundle for `bundle_id`, or None if unknown or evicted."""
+    from .feature_bundle import FeatureBundle
+
+    blob = (cache or get_analysis_cache()).get(bundle_id)
+    if blob is None:
+        return None
+    try:
+        return FeatureBundle.from_bytes(blob)
+    except (ValueError, KeyError, OSError) as e:
+        # e.g. an entry written by an older version of the cache
+        print(f"Ignoring unreadable cached features {bundle_id}: {e}")
+        return None
+
+
+def _cached_features(path, progress, cache):
+    from ..voice_quality_analysis import ANALYSIS_VERSION, _report, extract_audio_features, load_audio
+
+    _report(progress, "load")
+    y, sr = load_audio(path)
+
+    key = audio_cache_key(y, sr, "features", ANALYSIS_VERSION)
+    features = load_feature_bundle(key, cache)
+    if features is None:
+        features = extract_audio_features(y, sr, progress=progress)
+        cache.set(key, features.to_bytes())
+    # Only hand out ids the web process can resolve
+    features.bundle_id = key if cache.shared else None
+    return features, y, sr
+
+
+def analyze_file_cached(path, goal_name="transfem_soft_slightly_breathy", progress=None, cache=None):
+    """analyze_file, reusing cached goal-independent features for identical audio."""
+    from ..voice_quality_analysis import _deps_available, analyze_file, apply_goal
+
+    if not _deps_available:
+        return analyze_file(path, goal_name, progress=progress)
+
+    features, _, _ = _cached_features(path, progress, cache or get_analysis_cache())
+    return apply_goal(features, goal_name)
+
+
+def _cached_transcript(cache, key):
+    blob = cache.get(key)
+    if blob is None:
+        return None
+    try:
+        return json.loads(blob.decode("utf-8"))
+    except ValueError as e:
+        print(f"Ignoring unreadable cached transcript: {e}")
+        return None
+
+
+def analyze_file_for_transcript_cached(path, goal_name="transfem_soft_slightly_breathy", language="en",
+                                       progress=None, cache=None):
+    """
+    Analysis-worker half of analyze_file_with_transcript_cached: the goal
+    result, with the transcript attached when the ASR output is cached.
+    Returns (result, pending). `pending` is None when the result is complete,
+    else what `complete_transcript` needs to transcribe the recording in the
+    web process, where the shared Whisper model lives.
+    """
+    from ..voice_quality_analysis import ANALYSIS_VERSION, _deps_available, _report, align_transcript, apply_goal
+
+    if not _deps_available:
+        return analyze_file_cached(path, goal_name, progress=progress, cache=cache), None
+
+    cache = cache or get_analysis_cache()
+    features, y, sr = _cached_features(path, progress, cache)
+    base = apply_goal(features, goal_name)
+    if features.error:
+        return base, None
+
+    key = audio_cache_key(y, sr, f"asr:{language}", ANALYSIS_VERSION)
+    asr = _cached_transcript(cache, key)
+    if asr is None:
+        # The decoded speech (load_audio yields 16 kHz), so the web process does not decode the file again
+        return base, {"key": key, "audio": y.astype(np.float32, copy=False), "sr": sr, "language": language}
+
+    _report(progress, "align")
+    base["transcript"] = align_transcript(base["timeline"], asr)
+    return base, None
+
+
+def complete_transcript(base, pending, transcriber=None, progress=None, cache=None):
+    """
+    Web-process half: transcribe the `pending` audio of a result from
+    analyze_file_for_transcript_cached, cache the ASR output and attach the
+    aligned transcript. `transcriber` defaults to the shared ASR queue.
+    """
+    from ..voice_quality_analysis import _report, align_transcript, transcribe_speech
+
+    if pending is None:
+        return base
+
+    cache = cache or get_analysis_cache()
+    # Another process may have transcribed the same audio meanwhile (or the worker's cache is private)
+    asr = _cached_transcript(cache, pending["key"])
+    if asr is None:
+        if transcriber is None:
+            from ..asr_transcriber import transcribe_audio_with_words as transcriber
+        _report(progress, "asr")
+        asr = transcribe_speech(pending["audio"], pending["sr"], base["timeline"], transcriber, pending["language"])
+        # An empty word list may just mean the ASR model failed to load
+        if asr.get("words"):
+            cache.set(pending["key"], json.dumps(asr, default=_json_default).encode("utf-8"))
+
+    _report(progress, "align")
+    base["transcript"] = align_transcript(base["timeline"], asr)
+    return base
+
+
+def analyze_file_with_transcript_cached(path, goal_name="transfem_soft_slightly_breathy", transcriber=None,
+                                        language="en", progress=None, cache=None):
+    """analyze_file_with_transcript, reusing cached features and ASR output for identical audio."""
+    from ..voice_quality_analysis import _deps_available
+
+    if not _deps_available or not transcriber:
+        return analyze_file_cached(path, goal_name, progress=progress, cache=cache)
+
+    cache = cache or get_analysis_cache()
+    base, pending = analyze_file_for_transcript_cached(path, goal_name, language, progress, cache)
+    return complete_transcript(base, pending, transcriber, progress, cache)
@@ -0,0 +1,161 @@
+"""
+analysis_context.py
+
+Shared, lazily-built Praat artifacts for a single analysed signal.
+
+Several metrics need the same Praat objects (the pitch track feeds F0 stats,
+RBI voicing and the timeline; the PointProcess feeds jitter, shimmer and the
+PCA perturbation score). `AnalysisContext` creates each object once, on first
+use, and hands the same instance to every caller that asks for it with the
+same parameters.
+
+`sample_pitch` reads a Pitch track out of Praat once and resamples it onto
+any number of query times in NumPy.
+"""
+
+import numpy as np
+
+try:
+    import parselmouth
+    from parselmouth.praat import call
+    PRAAT_AVAILABLE = True
+except ImportError:
+    PRAAT_AVAILABLE = False
+    parselmouth = None
+    call = None
+
+POWER_CEPSTROGRAM_ARGS = (75, 600, 0.0001, 0.02, 50)
+
+
+def pitch_frame_times(pitch):
+    """Centre times of a Pitch track's frames (Praat's x1 + (i - 1) * dx)."""
+    return pitch.x1 + np.arange(pitch.nx) * pitch.dx
+
+
+def sample_pitch(pitch, times):
+    """
+    Sample a Praat Pitch at many times at once.
+
+    Pulls `selected_array['frequency']` once and interpolates on the track's
+    frame grid (`pitch_frame_times`) the way Pitch.get_value_at_time does: the
+    nearest frame must be voiced, and an unvoiced or out-of-range neighbour
+    falls back to the nearest value instead of bridging the gap.
+    Returns NaN where Praat would return undefined, and for NaN query times.
+    """
+    times = np.asarray(times, dtype=float)
+    # NaN queries (e.g. times in a trimmed-out silence) land before the track
+    times = np.where(np.isnan(times), pitch.xmin - 1.0, times)
+    values = pitch.selected_array['frequency']
+    nx = len(values)
+    if nx == 0:
+        return np.full(times.shape, np.nan)
+
+    # Same arithmetic as Praat's 1-based Sampled_xToIndex to stay bit-identical
+    ireal = (times - pitch.x1) / pitch.dx + 1.0
+    ileft = np.floor(ireal).astype(np.int64)
+    phase = ireal - ileft
+    ileft -= 1
+
+    upper = phase >= 0.5
+    inear = np.where(upper, ileft + 1, ileft)
+    ifar = np.where(upper, ileft, ileft + 1)
+    phase = np.where(upper, 1.0 - phase, phase)
+
+    fnear = np.where((inear >= 0) & (inear < nx), values[np.clip(inear, 0, nx - 1)], 0.0)
+    ffar = np.where((ifar >= 0) & (ifar < nx), values[np.clip(ifar, 0, nx - 1)], 0.0)
+
+    out = np.where(ffar > 0, fnear + phase * (ffar - fnear), fnear)
+    out[(fnear <= 0) | (times < pitch.xmin) | (times > pitch.xmax)] = np.nan
+    return out
+
+
+class AnalysisContext:
+    """
+    Memoizing wrapper around a parselmouth Sound.
+
+    Every accessor is keyed by its parameters, so two metrics asking for
+    `pitch(time_step=0.01)` get the same Pitch object, while a metric asking
+    for a different floor/ceiling gets its own.
+    """
+
+    def __init__(self, y=None, sr=None, sound=None):
+        if sound is None:
+            sound = parselmouth.Sound(y, sr)
+        self.sound = sound
+        self.sr = float(sound.sampling_frequency)
+        self.y = y if y is not None else sound.values[0]
+        self._cache = {}
+
+    @classmethod
+    def of(cls, obj, sr=None):
+        """
+        Coerce a context, parselmouth Sound or raw sample array into a context.
+        Raw arrays without a sample rate keep parselmouth's default rate, which
+        matches how the metric functions treated them before.
+        """
+        if isinstance(obj, cls):
+            return obj
+        if isinstance(obj, parselmouth.Sound):
+            return cls(sound=obj)
+        if sr is None:
+            return cls(sound=parselmouth.Sound(obj))
+        return cls(obj, sr)
+
+    def _memo(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def duration(self):
+        return self.sound.xmax - self.sound.xmin
+
+    def pitch(self, time_step=None, floor=75, ceiling=600):
+        # Praat's automatic time step is 0.75 / floor; resolving it here lets
+        # `to_pitch()` and `to_pitch(time_step=0.01)` share one track at 75 Hz.
+        if time_step is None:
+            time_step = 0.75 / floor
+        return self._memo(
+            ("pitch", round(time_step, 9), floor, ceiling),
+            lambda: self.sound.to_pitch(time_step=time_step, pitch_floor=floor, pitch_ceiling=ceiling)
+        )
+
+    def point_process(self, floor=75, ceiling=600):
+        return self._memo(
+            ("point_process", floor, ceiling),
+            lambda: call(self.sound, "To PointProcess (periodic, cc)", floor, ceiling)
+        )
+
+    def harmonicity(self, time_step=0.01, floor=75, silence_threshold=0.1, periods_per_window=1.0):
+        return self._memo(
+            ("harmonicity", time_step, floor, silence_threshold, periods_per_window),
+            lambda: call(self.sound, "To Harmonicity (cc)", time_step, floor, silence_threshold, periods_per_window)
+        )
+
+    def power_cepstrogram(self, *args):
+        # Positional Praat arguments; the default mirrors compute_cpp_praat verbatim.
+        args = args or POWER_CEPSTROGRAM_ARGS
+        return self._memo(
+            ("power_cepstrogram",) + args,
+            lambda: call(self.sound, "To PowerCepstrogram", *args)
+        )
+
+    def formant(self, time_step=0.0, num_formants=4, max_formant_hz=5500, window_length=0.025, pre_emphasis_hz=50.0):
+        args = (time_step, num_formants, max_formant_hz, window_length, pre_emphasis_hz)
+        return self._memo(
+            ("formant",) + args,
+            lambda: call(self.sound, "To Formant (burg)", *args)
+        )
+
+    def intensity(self, min_pitch=100, time_step=0, subtract_mean="yes"):
+        args = (min_pitch, time_step, subtract_mean)
+        return self._memo(
+            ("intensity",) + args,
+            lambda: call(self.sound, "To Intensity", *args)
+        )
+
+    def ltas(self, bandwidth=100):
+        return self._memo(
+            ("ltas", bandwidth),
+            lambda: call(self.sound, "To Ltas...", bandwidth)
+        )
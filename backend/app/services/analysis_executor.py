@@ -0,0 +1,218 @@
+"""
+analysis_executor.py
+
+Bounded process pool for offline voice-quality analysis.
+
+Praat and NumPy hold the GIL for parts of `analyze_file`, and the Socket.IO
+server runs in threading mode, so an analysis running in a request thread
+stalls every other request. `AnalysisExecutor` runs analyses in warm worker
+processes instead (the heavy imports are loaded once per worker, when the pool
+starts) and bounds how much work may be in flight:
+
+- at most `max_workers` analyses run at once, and at most `max_queue` more
+  wait for a worker; beyond that `submit` raises `AnalysisQueueFull`, which
+  routes turn into 503 + Retry-After;
+- `run` waits at most `timeout` seconds for a result and raises
+  `AnalysisTimeout` otherwise. A job that has not started is cancelled; a
+  worker cannot be interrupted mid-analysis, so a running job keeps its slot
+  until it actually finishes (the queue limit therefore still reflects the
+  real load on the pool), and its `on_done` cleanup runs only then.
+
+Workers report progress with `report_progress(job_id, stage)`; the events
+travel over a queue shared with every worker and are handed to the
+executor's `on_progress(job_id, stage)` callback in the parent process.
+
+Configuration (environment):
+    ANALYSIS_WORKERS       worker processes (default: CPU count; 0 runs inline)
+    ANALYSIS_MAX_QUEUE     jobs allowed to wait for a worker (default: 2 per worker)
+    ANALYSIS_JOB_TIMEOUT   seconds a request waits for its result (default: 120)
+    ANALYSIS_RETRY_AFTER   Retry-After hint in seconds when full (default: 5)
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', os.cpu_count() or 1))
+ANALYSIS_MAX_QUEUE = int(os.environ.get('ANALYSIS_MAX_QUEUE', 2 * max(ANALYSIS_WORKERS, 1)))
+ANALYSIS_JOB_TIMEOUT = float(os.environ.get('ANALYSIS_JOB_TIMEOUT', 120))
+ANALYSIS_RETRY_AFTER = int(os.environ.get('ANALYSIS_RETRY_AFTER', 5))
+
+
+class AnalysisQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+    def __init__(self, retry_after=ANALYSIS_RETRY_AFTER):
+        super().__init__("Analysis queue is full")
+        self.retry_after = retry_after
+
+
+class AnalysisTimeout(Exception):
+    """Raised when a job does not finish within its timeout."""
+
+
+# Where report_progress sends events: a multiprocessing queue inside workers,
+# the executor's dispatcher when running inline, None when nobody listens.
+_progress_sink = None
+
+
+def _init_worker(progress_queue, initializer):
+    global _progress_sink
+    _progress_sink = progress_queue.put
+    if initializer is not None:
+        initializer()
+
+
+def _warm_worker():
+    """
+    Pool initializer: pay the NumPy/SciPy/Praat/librosa import cost once per
+    worker. Workers never transcribe, so they never load Whisper.
+    """
+    from .. import voice_quality_analysis  # noqa: F401
+
+
+def report_progress(job_id, stage):
+    """Publish a progress event for `job_id`; a no-op when nobody listens."""
+    if _progress_sink is not None and job_id is not None:
+        _progress_sink((job_id, stage))
+
+
+def run_voice_quality_analysis(path, goal_name, include_transcript=False, language="en", job_id=None):
+    """
+    Worker entry point for the voice-quality analyze and job endpoints.
+
+    Returns (result, pending transcript). A pending transcript is finished in
+    the parent with analysis_cache.complete_transcript, through the shared ASR
+    queue: each worker loading its own Whisper model would multiply its memory
+    by the pool size.
+    """
+    from .analysis_cache import analyze_file_cached, analyze_file_for_transcript_cached
+
+    def progress(stage):
+        report_progress(job_id, stage)
+
+    if include_transcript:
+        return analyze_file_for_transcript_cached(path, goal_name=goal_name, language=language, progress=progress)
+    return analyze_file_cached(path, goal_name=goal_name, progress=progress), None
+
+
+class AnalysisExecutor:
+    """
+    Process pool with a hard cap on running + waiting jobs.
+
+    The pool is created lazily on first use (spawned workers, so they never
+    inherit the parent's threads or open sockets).
+    """
+
+    def __init__(self, max_workers=ANALYSIS_WORKERS, max_queue=ANALYSIS_MAX_QUEUE,
+                 timeout=ANALYSIS_JOB_TIMEOUT, retry_after=ANALYSIS_RETRY_AFTER,
+                 initializer=_warm_worker):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._initializer = initializer
+        self._pool = None
+        self._progress_queue = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1) + max_queue)
+        self.on_progress = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                ctx = multiprocessing.get_context('spawn')
+                if self._progress_queue is None:
+                    self._progress_queue = ctx.Queue()
+                    threading.Thread(target=self._drain_progress, daemon=True).start()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=ctx,
+                    initializer=_init_worker,
+                    initargs=(self._progress_queue, self._initializer)
+                )
+            return self._pool
+
+    def _dispatch_progress(self, event):
+        if self.on_progress is not None:
+            try:
+                self.on_progress(*event)
+            except Exception as e:
+                print(f"Progress handler error: {e}")
+
+    def _drain_progress(self):
+        progress_queue = self._progress_queue
+        while True:
+            try:
+                event = progress_queue.get()
+            except (EOFError, OSError, queue.Empty):
+                return
+            if event is None:
+                return
+            self._dispatch_progress(event)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)` on the pool and return its Future.
+        Raises AnalysisQueueFull instead of queueing beyond the limit.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise AnalysisQueueFull(self.retry_after)
+
+        if self.max_workers <= 0:
+            # Inline mode (ANALYSIS_WORKERS=0): still bounded, no processes
+            global _progress_sink
+            _progress_sink = self._dispatch_progress
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self._slots.release()
+            return future
+
+        try:
+            future = self._get_pool().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args, timeout=None, on_done=None, **kwargs):
+        """
+        Submit and wait for the result, raising AnalysisTimeout after `timeout` seconds.
+
+        `on_done()` runs once the job can no longer touch its inputs: when it
+        finishes, fails or is cancelled, or right away if it was never queued.
+        After a timeout that may be well after `run` has returned, so callers
+        clean up job inputs (e.g. the uploaded file) there, not themselves.
+        """
+        try:
+            future = self.submit(fn, *args, **kwargs)
+        except Exception:
+            if on_done is not None:
+                on_done()
+            raise
+        if on_done is not None:
+            future.add_done_callback(lambda _: on_done())
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            # Drops the job if it has not started yet; a running job finishes on its own
+            future.cancel()
+            raise AnalysisTimeout(f"Analysis did not finish within {self.timeout if timeout is None else timeout:g}s")
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+
+analysis_executor = AnalysisExecutor()
+atexit.register(analysis_executor.shutdown, wait=False)
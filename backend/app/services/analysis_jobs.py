@@ -0,0 +1,207 @@
+"""
+analysis_jobs.py
+
+In-memory store for asynchronous voice-quality analysis jobs.
+
+A job is created when an upload is accepted, runs on the shared analysis
+executor, and moves through queued -> running -> done | error. Workers report
+the stage they are in ("load", "praat", "rbi") via `report_progress`, which
+lands here through the executor's progress callback. A transcript ("asr",
+"align") is then completed in this process, on a thread of its own.
+Finished jobs, with their results, are kept for ANALYSIS_JOB_TTL seconds
+(default: 1 hour) and purged lazily on later store access. At most
+ANALYSIS_JOB_MAX jobs (default: 256) are kept: a new job evicts the least
+recently used finished one, and when every stored job is still unfinished
+`create` raises `JobStoreFull` (a 503 for the client).
+
+The store lives in the web process, so with several gunicorn workers a client
+must poll the worker that accepted its job (sticky sessions or one web worker).
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from .analysis_cache import complete_transcript
+from .analysis_executor import ANALYSIS_RETRY_AFTER, analysis_executor, run_voice_quality_analysis
+
+ANALYSIS_JOB_TTL = float(os.environ.get('ANALYSIS_JOB_TTL', 3600))
+ANALYSIS_JOB_MAX = int(os.environ.get('ANALYSIS_JOB_MAX', 256))
+
+# Stage -> fraction of the job completed once that stage starts
+JOB_STAGES = {
+    "load": 0.05,
+    "praat": 0.15,
+    "rbi": 0.45,
+    "asr": 0.6,
+    "align": 0.9
+}
+
+
+class JobStoreFull(Exception):
+    """Raised when the store is at ANALYSIS_JOB_MAX and no finished job can be evicted."""
+
+    def __init__(self, retry_after=ANALYSIS_RETRY_AFTER):
+        super().__init__("Too many analysis jobs in progress")
+        self.retry_after = retry_after
+
+
+class AnalysisJob:
+    def __init__(self, job_id, params=None):
+        self.id = job_id
+        self.params = params or {}
+        self.status = "queued"
+        self.stage = None
+        self.progress = 0.0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error
+        }
+
+
+class JobStore:
+    """
+    Thread-safe job registry with TTL-based retention of finished jobs and a
+    cap on the number of jobs, evicting finished jobs least recently used first.
+    """
+
+    def __init__(self, ttl=ANALYSIS_JOB_TTL, max_jobs=ANALYSIS_JOB_MAX):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, params=None):
+        job = AnalysisJob(uuid.uuid4().hex, params)
+        with self._lock:
+            self._purge_expired()
+            if len(self._jobs) >= self.max_jobs:
+                # Oldest access first; unfinished jobs are never evicted
+                finished = next((job_id for job_id, j in self._jobs.items() if j.finished_at is not None), None)
+                if finished is None:
+                    raise JobStoreFull()
+                del self._jobs[finished]
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs.move_to_end(job_id)
+            return job
+
+    def discard(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def record_progress(self, job_id, stage):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            # Progress events can trail the result; never reopen a finished job
+            if job is None or job.finished_at is not None:
+                return
+            if job.started_at is None:
+                job.started_at = time.time()
+            job.status = "running"
+            job.stage = stage
+            job.progress = max(job.progress, JOB_STAGES.get(stage, job.progress))
+
+    def finish(self, job_id, result=None, error=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.finished_at = time.time()
+            if error is not None:
+                job.status = "error"
+                job.error = error
+            else:
+                job.status = "done"
+                job.stage = None
+                job.progress = 1.0
+                job.result = result
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_store = JobStore()
+analysis_executor.on_progress = job_store.record_progress
+
+
+def submit_analysis_job(path, goal_name, include_transcript=False, language="en", on_done=None, executor=None):
+    """
+    Create a job and queue the analysis of `path` on the analysis executor.
+
+    `on_done()` runs once the job has finished (e.g. to delete the upload).
+    Raises AnalysisQueueFull, after discarding the job, when the pool is full,
+    and JobStoreFull when the job store is.
+    """
+    executor = executor or analysis_executor
+    job = job_store.create({"goal": goal_name, "include_transcript": include_transcript})
+    try:
+        future = executor.submit(
+            run_voice_quality_analysis,
+            path,
+            goal_name,
+            include_transcript,
+            language,
+            job_id=job.id
+        )
+    except Exception:
+        job_store.discard(job.id)
+        raise
+
+    def _transcribe(result, pending):
+        # Blocks on the ASR queue, so not on the executor's callback thread
+        try:
+            result = complete_transcript(
+                result,
+                pending,
+                progress=lambda stage: job_store.record_progress(job.id, stage)
+            )
+        except Exception as e:
+            job_store.finish(job.id, error=str(e))
+        else:
+            job_store.finish(job.id, result=result)
+
+    def _done(fut):
+        try:
+            if fut.cancelled():
+                job_store.finish(job.id, error="Job was cancelled.")
+            elif fut.exception() is not None:
+                job_store.finish(job.id, error=str(fut.exception()))
+            else:
+                result, pending = fut.result()
+                if pending is None:
+                    job_store.finish(job.id, result=result)
+                else:
+                    threading.Thread(target=_transcribe, args=(result, pending), daemon=True).start()
+        finally:
+            # The upload is no longer needed: transcription uses the decoded audio
+            if on_done is not None:
+                on_done()
+
+    future.add_done_callback(_done)
+    return job
@@ -0,0 +1,246 @@
+"""
+asr_service.py
+
+Queued Whisper inference shared by every transcription path.
+
+Callers hand `transcribe` an audio path or already-decoded audio (16 kHz mono
+float32, see `to_whisper_audio`) and get back plain segment/word dicts.
+Passing decoded audio skips faster-whisper's own ffmpeg decode of the file. Behind it a fixed pool of ASR_WORKERS inference threads runs the
+shared model from whisper_registry. The model is loaded with the same number
+of CTranslate2 workers, and the CPU cores are split between them, so
+concurrent requests run side by side at a predictable per-request speed
+instead of oversubscribing the cores. Admission is bounded the same way as
+the analysis executor. At most ASR_WORKERS transcriptions run and
+ASR_MAX_QUEUE more wait. Beyond that `transcribe` raises `ASRQueueFull`,
+which routes turn into 503 + Retry-After.
+
+`model_size` picks a model from whisper_registry (default: the registry's
+default model). Identical requests in flight are coalesced. The same audio
+bytes with the same model and options attach to the already-queued transcription instead of running
+it twice (a double-submitted upload, or the same take analysed for two goals).
+
+With ASR_BATCHED enabled and a faster-whisper that ships
+BatchedInferencePipeline (>= 1.1), each file's VAD chunks are decoded in
+batches of ASR_BATCH_SIZE. Otherwise, or if the pipeline fails, the model's
+sequential `transcribe` is used.
+
+Configuration (environment):
+    ASR_WORKERS        inference threads (default: WHISPER_NUM_WORKERS)
+    ASR_MAX_QUEUE      requests allowed to wait (default: 4 per worker)
+    ASR_TIMEOUT        seconds a caller waits for its transcript (default: 300)
+    ASR_RETRY_AFTER    Retry-After hint in seconds when full (default: 5)
+    ASR_BEAM_SIZE      beam width; 1 = greedy, lowest latency (default: 5)
+    ASR_BATCHED        use the batched pipeline when available (default: true)
+    ASR_BATCH_SIZE     chunks per batch in the batched pipeline (default: 8)
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from .whisper_registry import WHISPER_NUM_WORKERS, whisper_registry
+
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:
+    # faster-whisper < 1.1 (or not installed)
+    BatchedInferencePipeline = None
+
+ASR_WORKERS = max(int(os.environ.get('ASR_WORKERS', WHISPER_NUM_WORKERS)), 1)
+ASR_MAX_QUEUE = int(os.environ.get('ASR_MAX_QUEUE', 4 * ASR_WORKERS))
+ASR_TIMEOUT = float(os.environ.get('ASR_TIMEOUT', 300))
+ASR_RETRY_AFTER = int(os.environ.get('ASR_RETRY_AFTER', 5))
+ASR_BEAM_SIZE = int(os.environ.get('ASR_BEAM_SIZE', 5))
+ASR_BATCHED = os.environ.get('ASR_BATCHED', 'true').lower() in ('1', 'true', 'yes')
+ASR_BATCH_SIZE = int(os.environ.get('ASR_BATCH_SIZE', 8))
+
+# Whisper's input format for in-memory audio
+WHISPER_SAMPLE_RATE = 16000
+
+
+class ASRQueueFull(Exception):
+    """Raised when every inference thread is busy and the wait queue is full."""
+
+    def __init__(self, retry_after=ASR_RETRY_AFTER):
+        super().__init__("ASR queue is full")
+        self.retry_after = retry_after
+
+
+class ASRTimeout(Exception):
+    """Raised when a transcript is not ready within the timeout."""
+
+
+class ASRUnavailable(Exception):
+    """Raised when no Whisper model can be loaded."""
+
+
+def to_whisper_audio(y, sr):
+    """Mono float32 at 16 kHz, the array format `transcribe` accepts."""
+    y = np.asarray(y)
+    if y.ndim > 1:
+        y = np.mean(y, axis=1)
+    if sr != WHISPER_SAMPLE_RATE:
+        from ..utils.resample import resample_audio
+        y = resample_audio(y, sr, WHISPER_SAMPLE_RATE)
+    return np.ascontiguousarray(y, dtype=np.float32)
+
+
+def _audio_digest(audio):
+    digest = hashlib.sha256()
+    if isinstance(audio, np.ndarray):
+        digest.update(b"pcm|")
+        digest.update(memoryview(audio).cast('B'))
+        return digest.hexdigest()
+    with open(audio, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ASRService:
+    """
+    Bounded thread pool around the shared Whisper model, with coalescing of
+    identical in-flight requests.
+    """
+
+    def __init__(self, workers=ASR_WORKERS, max_queue=ASR_MAX_QUEUE, timeout=ASR_TIMEOUT,
+                 retry_after=ASR_RETRY_AFTER, beam_size=ASR_BEAM_SIZE, batched=ASR_BATCHED,
+                 batch_size=ASR_BATCH_SIZE, registry=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.beam_size = beam_size
+        self.batched = batched and BatchedInferencePipeline is not None
+        self.batch_size = batch_size
+        self.registry = registry or whisper_registry
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._in_flight = {}
+        self._pipelines = {}
+        self.registry.on_unload(self._forget_pipeline)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='asr')
+        return self._pool
+
+    def submit(self, audio, language="en", word_timestamps=True, beam_size=None, model_size=None):
+        """
+        Queue a transcription of `audio` (a file path, or 16 kHz mono float32
+        samples) and return its Future. Raises
+        ASRQueueFull when the service is at capacity; a request identical to
+        one already in flight gets that request's Future without using a slot.
+        """
+        beam_size = beam_size or self.beam_size
+        if isinstance(audio, np.ndarray):
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+        model_size = model_size or self.registry.model_size
+        key = (_audio_digest(audio), language, bool(word_timestamps), beam_size, model_size)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            if not self._slots.acquire(blocking=False):
+                raise ASRQueueFull(self.retry_after)
+            try:
+                future = self._get_pool().submit(self._run, audio, language, word_timestamps, beam_size, model_size)
+            except Exception:
+                self._slots.release()
+                raise
+            self._in_flight[key] = future
+
+        def _done(_):
+            with self._lock:
+                self._in_flight.pop(key, None)
+            self._slots.release()
+
+        future.add_done_callback(_done)
+        return future
+
+    def transcribe(self, audio, language="en", word_timestamps=True, beam_size=None, timeout=None,
+                   model_size=None):
+        """
+        Transcribe `audio` (path or 16 kHz float32 samples) through the queue. Returns
+        {"language", "segments": [{"text", "start", "end", "words": [{"word", "start", "end"}]}]}.
+        """
+        future = self.submit(audio, language, word_timestamps, beam_size, model_size)
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            raise ASRTimeout(f"Transcription did not finish within {timeout or self.timeout:.0f}s")
+
+    def _run(self, audio, language, word_timestamps, beam_size, model_size=None):
+        with self.registry.use(model_size) as model:
+            if model is None:
+                raise ASRUnavailable("Whisper model could not be loaded")
+            if self.batched:
+                try:
+                    return self._decode(self._pipeline(model), audio, language, word_timestamps, beam_size,
+                                        batch_size=self.batch_size)
+                except Exception as e:
+                    print(f"Batched ASR failed ({e}); falling back to sequential decoding.")
+            return self._decode(model, audio, language, word_timestamps, beam_size)
+
+    def _pipeline(self, model):
+        # One pipeline per loaded model, dropped when the registry unloads it
+        with self._lock:
+            pipeline = self._pipelines.get(id(model))
+            if pipeline is None or pipeline.model is not model:
+                pipeline = BatchedInferencePipeline(model=model)
+                self._pipelines[id(model)] = pipeline
+            return pipeline
+
+    def _forget_pipeline(self, model):
+        with self._lock:
+            pipeline = self._pipelines.get(id(model))
+            if pipeline is not None and pipeline.model is model:
+                del self._pipelines[id(model)]
+
+    @staticmethod
+    def _decode(engine, audio, language, word_timestamps, beam_size, **kwargs):
+        segments, info = engine.transcribe(
+            audio,
+            language=language,
+            beam_size=beam_size,
+            word_timestamps=word_timestamps,
+            **kwargs
+        )
+        # The segment generator does the actual decoding; drain it on this thread
+        result = []
+        for seg in segments:
+            result.append({
+                "text": seg.text,
+                "start": float(seg.start),
+                "end": float(seg.end),
+                "words": [
+                    {"word": w.word, "start": float(w.start), "end": float(w.end)}
+                    for w in (seg.words or [])
+                ]
+            })
+        return {"language": language or info.language, "segments": result}
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "beam_size": self.beam_size,
+            "batched": self.batched,
+            "batch_size": self.batch_size
+        }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+asr_service = ASRService()
@@ -0,0 +1,253 @@
+"""
+embeddings.py
+
+Text embeddings for the RAG knowledge base, behind one provider interface.
+
+A provider turns a batch of texts into vectors (`embed(texts, task_type)`)
+and has a `key` naming the model, so vectors from different models never
+mix in the cache. Providers:
+
+    gemini   Gemini embedding-001: several contents per embed_content call.
+    hashing  Deterministic local stand-in: signed feature hashing of
+             character 3-5-grams into `dim` buckets, L2-normalised. No
+             network, no key; similar texts share n-grams and so score high,
+             which is enough to exercise and benchmark ingestion offline.
+
+`EmbeddingService` sits in front of a provider. Texts are keyed by a SHA-256
+of (provider key, task type, text) and stored as raw float32 blobs
+(utils/embedding_codec). Identical chunks in a request are
+embedded once, and chunks seen before come from the cache. The rest are cut
+into batches of EMBEDDING_BATCH_SIZE and sent on at most
+EMBEDDING_CONCURRENCY threads at a time.
+
+Configuration (environment):
+    EMBEDDING_PROVIDER        gemini or hashing (default: gemini)
+    EMBEDDING_BATCH_SIZE      texts per provider call (default: 100)
+    EMBEDDING_CONCURRENCY     provider calls in flight (default: 4)
+    EMBEDDING_CACHE_BACKEND   sqlite, memory or none (default: sqlite)
+    EMBEDDING_CACHE_PATH      SQLite file (default: embedding_cache.sqlite3 in
+                              the instance directory)
+    EMBEDDING_CACHE_MAX_MB    cache size bound (default: 256)
+
+`backend/benchmark_embeddings.py` measures ingestion throughput offline.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .analysis_cache import MemoryLRUCache, NullCache, SQLiteCache
+from ..utils.embedding_codec import decode_embedding, encode_embedding
+from ..utils.instance import instance_file
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'gemini').lower()
+EMBEDDING_BATCH_SIZE = max(int(os.environ.get('EMBEDDING_BATCH_SIZE', 100)), 1)
+EMBEDDING_CONCURRENCY = max(int(os.environ.get('EMBEDDING_CONCURRENCY', 4)), 1)
+EMBEDDING_CACHE_BACKEND = os.environ.get('EMBEDDING_CACHE_BACKEND', 'sqlite').lower()
+EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH')
+EMBEDDING_CACHE_MAX_BYTES = int(float(os.environ.get('EMBEDDING_CACHE_MAX_MB', 256)) * 1024 * 1024)
+
+
+class GeminiEmbeddings:
+    """Gemini embedding model; one API call per batch of texts."""
+
+    name = 'gemini'
+
+    def __init__(self, model="models/embedding-001", title="Voice Training Knowledge"):
+        self.model = model
+        self.title = title
+        self.key = f"gemini:{model}"
+
+    def embed(self, texts, task_type="retrieval_document"):
+        if genai is None:
+            raise RuntimeError("google-generativeai is not installed")
+        kwargs = {"title": self.title} if task_type == "retrieval_document" else {}
+        result = genai.embed_content(model=self.model, content=list(texts), task_type=task_type, **kwargs)
+        return result['embedding']
+
+
+class HashingEmbeddings:
+    """Feature-hashed character n-grams; deterministic across processes and runs."""
+
+    name = 'hashing'
+
+    def __init__(self, dim=768, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.key = f"hashing:{dim}:{ngram_range[0]}-{ngram_range[1]}"
+
+    def _embed_one(self, text):
+        data = np.frombuffer(f" {' '.join(text.lower().split())} ".encode('utf-8'), dtype=np.uint8)
+        data = data.astype(np.uint64)
+        vector = np.zeros(self.dim)
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            count = len(data) - n + 1
+            if count <= 0:
+                continue
+            # Polynomial hash of every n-gram at once, then a splitmix64 finaliser
+            h = np.full(count, n, dtype=np.uint64)
+            for j in range(n):
+                h = h * np.uint64(1000003) + data[j:j + count]
+            h ^= h >> np.uint64(30)
+            h *= np.uint64(0xBF58476D1CE4E5B9)
+            h ^= h >> np.uint64(27)
+            h *= np.uint64(0x94D049BB133111EB)
+            h ^= h >> np.uint64(31)
+            signs = np.where(h >> np.uint64(63), -1.0, 1.0)
+            vector += np.bincount((h % np.uint64(self.dim)).astype(np.int64), weights=signs, minlength=self.dim)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+    def embed(self, texts, task_type="retrieval_document"):
+        return [self._embed_one(text) for text in texts]
+
+
+EMBEDDING_PROVIDERS = {
+    'gemini': GeminiEmbeddings,
+    'hashing': HashingEmbeddings
+}
+
+
+def get_embedding_provider(name=None):
+    """A provider instance by name (default: EMBEDDING_PROVIDER)."""
+    name = (name or EMBEDDING_PROVIDER).lower()
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. Available: {', '.join(EMBEDDING_PROVIDERS)}")
+    return EMBEDDING_PROVIDERS[name]()
+
+
+def _make_cache(backend=EMBEDDING_CACHE_BACKEND):
+    if backend == 'memory':
+        return MemoryLRUCache(EMBEDDING_CACHE_MAX_BYTES)
+    if backend == 'sqlite':
+        try:
+            path = EMBEDDING_CACHE_PATH or instance_file('embedding_cache.sqlite3')
+            return SQLiteCache(path, EMBEDDING_CACHE_MAX_BYTES, table='embedding_cache')
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: embedding cache unavailable ({e}); falling back to memory.")
+            return MemoryLRUCache(EMBEDDING_CACHE_MAX_BYTES)
+    return NullCache()
+
+
+class EmbeddingService:
+    """
+    Cached, batched, bounded-concurrency embedding calls to one provider.
+    Failed batches yield None for their texts; nothing is cached for them.
+    """
+
+    def __init__(self, provider=None, cache=None, batch_size=EMBEDDING_BATCH_SIZE,
+                 concurrency=EMBEDDING_CONCURRENCY):
+        self._provider = provider
+        self._cache = cache
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._pool = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            self._provider = get_embedding_provider()
+        return self._provider
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = _make_cache()
+        return self._cache
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='embed')
+            return self._pool
+
+    def _key(self, text, task_type):
+        digest = hashlib.sha256(f"{self.provider.key}|{task_type}|".encode())
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _embed_batch(self, texts, task_type):
+        with self._lock:
+            self.calls += 1
+        vectors = self.provider.embed(texts, task_type)
+        if len(vectors) != len(texts):
+            raise ValueError(f"Provider returned {len(vectors)} embeddings for {len(texts)} texts")
+        return vectors
+
+    def embed(self, texts, task_type="retrieval_document", use_cache=True):
+        """Vectors (float32 arrays) for `texts`, in order; None where embedding failed."""
+        keys = [self._key(text, task_type) for text in texts]
+        found = {}
+        for key in dict.fromkeys(keys):
+            blob = self.cache.get(key) if use_cache else None
+            if blob is not None:
+                found[key] = decode_embedding(blob)
+
+        # Unique texts still to embed, in first-seen order
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        with self._lock:
+            # Repeats within the request count as hits too
+            self.hits += len(keys) - len(pending)
+            self.misses += len(pending)
+
+        pending_keys = list(pending)
+        batches = [pending_keys[i:i + self.batch_size] for i in range(0, len(pending_keys), self.batch_size)]
+        if len(batches) <= 1:
+            # Nothing to overlap; skip the pool
+            results = [self._safe_batch([pending[k] for k in batch], task_type) for batch in batches]
+        else:
+            pool = self._get_pool()
+            futures = [pool.submit(self._safe_batch, [pending[k] for k in batch], task_type) for batch in batches]
+            results = [future.result() for future in futures]
+
+        for batch, vectors in zip(batches, results):
+            if vectors is None:
+                continue
+            for key, vector in zip(batch, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                found[key] = vector
+                if use_cache:
+                    self.cache.set(key, encode_embedding(vector, 'float32'))
+        return [found.get(key) for key in keys]
+
+    def _safe_batch(self, texts, task_type):
+        try:
+            return self._embed_batch(texts, task_type)
+        except Exception as e:
+            print(f"Embedding error ({len(texts)} texts): {e}")
+            return None
+
+    def embed_query(self, text):
+        """Embedding of a search query (not cached here), or None."""
+        vectors = self._safe_batch([text], "retrieval_query")
+        return np.asarray(vectors[0], dtype=np.float32) if vectors else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "provider": self.provider.key,
+                "batch_size": self.batch_size,
+                "concurrency": self.concurrency,
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "provider_calls": self.calls
+            }
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,73 @@
+"""
+feature_bundle.py
+
+Goal-independent output of the offline voice-quality analysis.
+
+A `FeatureBundle` holds everything `score_against_goal` needs (summary and
+global metrics) plus the timeline as NumPy arrays. It round-trips through a
+compact binary form (`to_bytes` / `from_bytes`: a compressed .npz with the
+scalars as a JSON header, no pickle), which is what the analysis cache stores
+and what the re-score endpoint loads by `bundle_id`.
+"""
+
+import io
+import json
+
+import numpy as np
+
+# Timeline entries stored as arrays; everything else in the timeline is JSON
+TIMELINE_ARRAYS = ("times", "labels", "energy_db", "f0", "rbi")
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class FeatureBundle:
+    def __init__(self, summary=None, features_global=None, timeline=None, error=None,
+                 version=None, bundle_id=None):
+        self.summary = summary or {}
+        self.features_global = features_global or {}
+        self.timeline = timeline or {}
+        self.error = error
+        self.version = version
+        self.bundle_id = bundle_id
+
+    def to_bytes(self):
+        meta = {
+            "version": self.version,
+            "bundle_id": self.bundle_id,
+            "error": self.error,
+            "summary": self.summary,
+            "features_global": self.features_global,
+            "timeline": {k: v for k, v in self.timeline.items() if k not in TIMELINE_ARRAYS}
+        }
+        arrays = {f"timeline_{k}": np.asarray(self.timeline[k]) for k in TIMELINE_ARRAYS if k in self.timeline}
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            meta=np.frombuffer(json.dumps(meta, default=_json_default).encode("utf-8"), dtype=np.uint8),
+            **arrays
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            meta = json.loads(npz["meta"].tobytes().decode("utf-8"))
+            timeline = meta["timeline"]
+            for key in TIMELINE_ARRAYS:
+                if f"timeline_{key}" in npz:
+                    timeline[key] = npz[f"timeline_{key}"]
+        return cls(
+            summary=meta["summary"],
+            features_global=meta["features_global"],
+            timeline=timeline,
+            error=meta["error"],
+            version=meta["version"],
+            bundle_id=meta["bundle_id"]
+        )
@@ -0,0 +1,174 @@
+"""
+pitch_engines.py
+
+One pitch-tracking API over interchangeable backends.
+
+`estimate_pitch(y, sr, ...)` returns an F0 track in Hz (NaN = unvoiced) on
+librosa's centred frame grid: frame i is centred on sample i * hop_length and
+there are 1 + len(y) // hop_length frames, whatever the engine. Engines:
+
+    pyin    librosa.pyin: probabilistic YIN with Viterbi voicing decoding.
+            The reference, and by far the slowest.
+    praat   Praat's autocorrelation pitch (parselmouth), resampled onto the
+            grid with `sample_pitch`.
+    yin     YIN in NumPy: one FFT cross-correlation over all frames,
+            cumulative-mean-normalised difference, first dip below
+            `threshold`, parabolic refinement. No temporal smoothing.
+
+PITCH_ENGINE (environment) selects the default engine (default: pyin).
+
+voice_quality_analysis does not go through here: it needs Praat's Pitch
+object itself, shared with the point process behind jitter/shimmer and
+sampled at arbitrary times by the RBI timeline, not a frame-grid array.
+`backend/benchmark_pitch.py` compares speed and accuracy of the engines.
+"""
+
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .analysis_context import sample_pitch
+
+try:
+    import librosa
+except ImportError:
+    librosa = None
+
+try:
+    import parselmouth
+except ImportError:
+    parselmouth = None
+
+PITCH_ENGINE = os.environ.get('PITCH_ENGINE', 'pyin').lower()
+
+# Defaults match the analysis route (C2-C6, librosa's 2048/512 framing)
+DEFAULT_FMIN = 65.41
+DEFAULT_FMAX = 1046.5
+DEFAULT_FRAME_LENGTH = 2048
+DEFAULT_HOP_LENGTH = 512
+
+
+def frame_count(n_samples, hop_length=DEFAULT_HOP_LENGTH):
+    """Number of frames on the centred grid for a signal of `n_samples`."""
+    return 1 + n_samples // hop_length
+
+
+def _pyin(y, sr, fmin, fmax, frame_length, hop_length):
+    f0, _, _ = librosa.pyin(
+        y,
+        fmin=fmin,
+        fmax=fmax,
+        sr=sr,
+        frame_length=frame_length,
+        hop_length=hop_length
+    )
+    return f0
+
+
+def _praat(y, sr, fmin, fmax, frame_length, hop_length):
+    times = np.arange(frame_count(len(y), hop_length)) * hop_length / sr
+    try:
+        pitch = parselmouth.Sound(np.asarray(y, dtype=np.float64), sr).to_pitch(
+            time_step=hop_length / sr, pitch_floor=fmin, pitch_ceiling=fmax
+        )
+    except parselmouth.PraatError:
+        # Too short for Praat's analysis window
+        return np.full(len(times), np.nan)
+    return sample_pitch(pitch, times)
+
+
+def _yin(y, sr, fmin, fmax, frame_length, hop_length, threshold=0.1, silence_db=-60.0):
+    y = np.asarray(y, dtype=np.float64)
+    n_frames = frame_count(len(y), hop_length)
+    win_length = frame_length // 2
+    min_period = max(int(np.floor(sr / fmax)), 1)
+    max_period = min(int(np.ceil(sr / fmin)), frame_length - win_length - 1)
+    if max_period <= min_period + 1:
+        raise ValueError("fmin/fmax do not fit in frame_length at this sample rate")
+
+    # Each frame holds the analysis window plus the longest lag, centred on
+    # its grid point
+    span = win_length + max_period + 1
+    half = span // 2
+    padded = np.pad(y, (half, max((n_frames - 1) * hop_length + span - half - len(y), 0)))
+    frames = sliding_window_view(padded, span)[::hop_length][:n_frames]
+
+    # Difference function d(tau) = e(0) + e(tau) - 2 r(tau) over a win_length window
+    n_fft = 1 << int(np.ceil(np.log2(span + win_length)))
+    spectrum = np.fft.rfft(frames, n_fft, axis=1)
+    head = np.fft.rfft(frames[:, :win_length], n_fft, axis=1)
+    cross = np.fft.irfft(spectrum * np.conj(head), n_fft, axis=1)[:, :max_period + 2]
+    energy = np.cumsum(np.concatenate((np.zeros((n_frames, 1)), frames ** 2), axis=1), axis=1)
+    lags = np.arange(max_period + 2)
+    window_energy = energy[:, lags + win_length] - energy[:, lags]
+    diff = np.maximum(window_energy[:, :1] + window_energy - 2.0 * cross, 0.0)
+
+    # Cumulative mean normalised difference
+    cmnd = np.ones_like(diff)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cmnd[:, 1:] = diff[:, 1:] * lags[1:] / np.cumsum(diff[:, 1:], axis=1)
+    cmnd[~np.isfinite(cmnd)] = 1.0
+
+    # First trough below the threshold in [min_period, max_period]
+    search = cmnd[:, min_period:max_period + 1]
+    trough = np.zeros(search.shape, dtype=bool)
+    trough[:, 1:-1] = (search[:, 1:-1] <= search[:, :-2]) & (search[:, 1:-1] < search[:, 2:])
+    candidates = trough & (search < threshold)
+    voiced = candidates.any(axis=1)
+    period = np.argmax(candidates, axis=1) + min_period
+
+    # Parabolic interpolation around the chosen lag
+    rows = np.arange(n_frames)
+    left = cmnd[rows, period - 1]
+    centre = cmnd[rows, period]
+    right = cmnd[rows, period + 1]
+    curvature = left - 2.0 * centre + right
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift = np.where(np.abs(curvature) > 1e-12, 0.5 * (left - right) / curvature, 0.0)
+    refined = period + np.clip(shift, -1.0, 1.0)
+
+    # Silence gate relative to the loudest frame
+    frame_energy = window_energy[:, 0] / win_length
+    loudest = np.max(frame_energy) if n_frames else 0.0
+    if loudest > 0:
+        with np.errstate(divide='ignore'):
+            voiced &= 10 * np.log10(frame_energy / loudest) > silence_db
+    else:
+        voiced[:] = False
+
+    f0 = np.where(voiced, sr / refined, np.nan)
+    f0[(f0 < fmin) | (f0 > fmax)] = np.nan
+    return f0
+
+
+PITCH_ENGINES = {
+    "pyin": _pyin,
+    "praat": _praat,
+    "yin": _yin
+}
+
+
+def available_pitch_engines():
+    """Engines whose dependencies are installed."""
+    available = ["yin"]
+    if librosa is not None:
+        available.insert(0, "pyin")
+    if parselmouth is not None:
+        available.insert(-1, "praat")
+    return available
+
+
+def estimate_pitch(y, sr, fmin=DEFAULT_FMIN, fmax=DEFAULT_FMAX, frame_length=DEFAULT_FRAME_LENGTH,
+                   hop_length=DEFAULT_HOP_LENGTH, engine=None):
+    """
+    F0 track of `y` in Hz, NaN where unvoiced, on the centred frame grid
+    (see `frame_count`). `engine` defaults to PITCH_ENGINE.
+    """
+    engine = (engine or PITCH_ENGINE).lower()
+    if engine not in PITCH_ENGINES:
+        raise ValueError(f"Unknown pitch engine '{engine}'. Choose from: {', '.join(PITCH_ENGINES)}")
+    if engine not in available_pitch_engines():
+        raise RuntimeError(f"Pitch engine '{engine}' is not available (missing dependency)")
+    f0 = PITCH_ENGINES[engine](y, sr, fmin, fmax, frame_length, hop_length)
+    return np.asarray(f0, dtype=np.float64)
@@ -10,6 +10,10 @@ Features:
 - Vocal Tract Length (VTL) Estimation
 - Enhanced CPP Measurement
 - PCA-based Jitter/Shimmer (more robust than single measures)
+
+Analysis functions accept either a parselmouth Sound or an AnalysisContext;
+given a context they reuse its Formant, PointProcess, Ltas and Intensity
+objects instead of rebuilding them.
 """
 
 import numpy as np
@@ -23,6 +27,8 @@ except ImportError:
     parselmouth = None
     call = None
 
+from .analysis_context import AnalysisContext
+
 
 # ----------------------
 # Vocal Tract Length Estimation (Formant Dispersion Method)
@@ -37,7 +43,7 @@ def estimate_vtl(sound, num_formants=4, max_formant_hz=5500):
     using the relationship:  VTL = c / (2 * Δf)  where c is speed of sound (~35000 cm/s).
     
     Args:
-        sound: Parselmouth Sound object
+        sound: Parselmouth Sound object or AnalysisContext
         num_formants: Number of formants to track (typically 4-5)
         max_formant_hz: Maximum formant frequency (affects Praat's search ceiling)
     
@@ -50,9 +56,10 @@ def estimate_vtl(sound, num_formants=4, max_formant_hz=5500):
     try:
         # FormantPath is VoiceLab's preferred method, but standard Burg is solid.
         # Using Burg for broader compatibility.
-        formant = call(sound, "To Formant (burg)", 0.0, num_formants, max_formant_hz, 0.025, 50.0)
+        ctx = AnalysisContext.of(sound)
+        formant = ctx.formant(0.0, num_formants, max_formant_hz, 0.025, 50.0)
         
-        duration = call(sound, "Get total duration")
+        duration = call(ctx.sound, "Get total duration")
         formant_means = []
         
         for i in range(1, num_formants + 1):
@@ -131,7 +138,7 @@ def compute_perturbation_pca(sound, floor_hz=75, ceiling_hz=600):
     VoiceLab uses this to create a single, more robust metric than any individual measure.
     
     Args:
-        sound: Parselmouth Sound object
+        sound: Parselmouth Sound object or AnalysisContext
         floor_hz: Pitch floor (related to expected F0 range)
         ceiling_hz: Pitch ceiling
         
@@ -142,7 +149,9 @@ def compute_perturbation_pca(sound, floor_hz=75, ceiling_hz=600):
         return {"jitter_pca": None, "shimmer_pca": None, "error": "Praat not available"}
     
     try:
-        point_process = call(sound, "To PointProcess (periodic, cc)", floor_hz, ceiling_hz)
+        ctx = AnalysisContext.of(sound)
+        sound = ctx.sound
+        point_process = ctx.point_process(floor_hz, ceiling_hz)
         
         # Jitter measures
         jitter_local = call(point_process, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3)
@@ -217,7 +226,7 @@ def measure_ltas(sound, bandwidth=100):
     Essential for matching a user's voice to a target "Voice Twin".
     
     Args:
-        sound: Parselmouth Sound object
+        sound: Parselmouth Sound object or AnalysisContext
         bandwidth: Bandwidth in Hz for the LTAS analysis
         
     Returns:
@@ -230,7 +239,7 @@ def measure_ltas(sound, bandwidth=100):
         # 1. Pitch Correct (Optional but recommended by VoiceLab - skipping for speed)
         
         # 2. Compute LTAS
-        ltas = call(sound, "To Ltas...", bandwidth)
+        ltas = AnalysisContext.of(sound).ltas(bandwidth)
         
         # 3. Extract Metrics
         mean_db = call(ltas, "Get mean", 0, 0, "dB")
@@ -271,7 +280,7 @@ def measure_speech_rate(sound, min_intensity_db=50, min_dip_db=2):
     Measure Speech Rate by counting syllable nuclei (intensity peaks).
     
     Args:
-        sound: Parselmouth Sound object
+        sound: Parselmouth Sound object or AnalysisContext
         min_intensity_db: Silence threshold
         min_dip_db: Minimum dip between peaks to count as separate syllables
         
@@ -283,24 +292,17 @@ def measure_speech_rate(sound, min_intensity_db=50, min_dip_db=2):
         
     try:
         # 1. Get Intensity
-        intensity = call(sound, "To Intensity", 100, 0, "yes")
+        ctx = AnalysisContext.of(sound)
+        sound = ctx.sound
+        intensity = ctx.intensity(100, 0, "yes")
         
         # 2. Find Peaks (Syllable Nuclei)
         # Praat functionality for this is via "To TextGrid (silences)..." or custom loops.
         # VoiceLab essentially mimics Praat's "count peaks" script logic.
         # For simplicity/speed here, we use a basic intensity peak finder.
         
-        # Extract intensity curve
-        num_frames = call(intensity, "Get number of frames")
-        times = []
-        values = []
-        for i in range(1, num_frames + 1):
-            t = call(intensity, "Get time from frame number", i)
-            v = call(intensity, "Get value in frame", i)
-            times.append(t)
-            values.append(v)
-            
-        values = np.array(values)
+        # Extract intensity curve (one read instead of a Praat call per frame)
+        values = np.array(intensity.values[0])
         
         # Simple Peak Finding logic
         # 1. Thresholding
@@ -401,7 +403,7 @@ def run_voicelab_analysis(sound, pitch_floor=75, pitch_ceiling=500):
     Run a comprehensive VoiceLab-style analysis on a sound.
     
     Args:
-        sound: Parselmouth Sound object
+        sound: Parselmouth Sound object or AnalysisContext
         pitch_floor: Expected minimum F0
         pitch_ceiling: Expected maximum F0
         
@@ -409,6 +411,8 @@ def run_voicelab_analysis(sound, pitch_floor=75, pitch_ceiling=500):
         dict: Contains vtl, perturbations, and any errors.
     """
     results = {}
+    if PRAAT_AVAILABLE and sound is not None:
+        sound = AnalysisContext.of(sound)
     
     # VTL Estimation
     vtl_result = estimate_vtl(sound)
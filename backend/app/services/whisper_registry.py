@@ -0,0 +1,281 @@
+"""
+whisper_registry.py
+
+One shared faster-whisper model per process.
+
+Both ASR paths (the voice-quality transcript in asr_transcriber and the
+word-level analysis route) get their model here, so a worker holds a single
+copy instead of one per module, and the load can happen at worker boot
+(gunicorn `post_fork`, see gunicorn.conf.py) instead of inside the first
+request. Only web processes load models: the analysis pool workers hand their
+transcripts back to the web process (analysis_cache.complete_transcript).
+
+Models are keyed by (size, device, compute type). For each one the registry
+records when it was loaded and last used, how many times it was used, and the
+growth in process RSS its load caused. `stats()` exposes this, and
+/api/analyze/status reports it. A model idle for WHISPER_IDLE_UNLOAD seconds is
+dropped by a background reaper and reloaded on next use. Models in use (inside
+`use()`) are never unloaded.
+
+A worker holds at most WHISPER_MAX_MODELS models: loading one more first
+unloads the least recently used idle model. Models in use are not evicted,
+so the cap is only exceeded while every loaded model is busy. Per worker,
+Whisper memory is therefore bounded by WHISPER_MAX_MODELS times the largest
+configured model's footprint (`rss_bytes` in `stats()`); multiply by the
+gunicorn worker count for the host. Callbacks registered with `on_unload` are told
+which model was dropped, so holders of per-model state can release it.
+
+Configuration (environment):
+    WHISPER_MODEL_SIZE     model size/name (default: tiny)
+    WHISPER_ANALYZE_MODEL_SIZE
+                           model for the word-level /api/analyze route, which
+                           needs the accuracy (default: base; tiny opts into
+                           sharing the default model)
+    WHISPER_DEVICE         cpu | cuda | auto (default: cpu)
+    WHISPER_COMPUTE_TYPE   CTranslate2 compute type (default: int8)
+    WHISPER_CPU_THREADS    threads per inference, 0 = library default, or the
+                           cores split across WHISPER_NUM_WORKERS (default: 0)
+    WHISPER_NUM_WORKERS    transcriptions the model can run in parallel (default: 1)
+    WHISPER_PRELOAD        load both models at worker boot (default: false)
+    WHISPER_IDLE_UNLOAD    seconds of idleness before unloading, 0 = never (default: 0)
+    WHISPER_MAX_MODELS     models a worker keeps loaded, 0 = no cap (default: 2,
+                           the default and analyze models)
+"""
+
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from faster_whisper import WhisperModel
+    WHISPER_AVAILABLE = True
+except ImportError:
+    WhisperModel = None
+    WHISPER_AVAILABLE = False
+
+WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', 'tiny')
+WHISPER_ANALYZE_MODEL_SIZE = os.environ.get('WHISPER_ANALYZE_MODEL_SIZE', 'base')
+WHISPER_DEVICE = os.environ.get('WHISPER_DEVICE', 'cpu')
+WHISPER_COMPUTE_TYPE = os.environ.get('WHISPER_COMPUTE_TYPE', 'int8')
+WHISPER_CPU_THREADS = int(os.environ.get('WHISPER_CPU_THREADS', 0))
+WHISPER_NUM_WORKERS = max(int(os.environ.get('WHISPER_NUM_WORKERS', 1)), 1)
+WHISPER_PRELOAD = os.environ.get('WHISPER_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+WHISPER_IDLE_UNLOAD = float(os.environ.get('WHISPER_IDLE_UNLOAD', 0))
+WHISPER_MAX_MODELS = int(os.environ.get('WHISPER_MAX_MODELS', 2))
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unknown."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Entry:
+    def __init__(self, model, rss_bytes):
+        self.model = model
+        self.rss_bytes = rss_bytes
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.uses = 0
+        self.active = 0
+
+
+class WhisperRegistry:
+    """Thread-safe cache of loaded Whisper models with idle and LRU unloading."""
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE,
+                 cpu_threads=WHISPER_CPU_THREADS, num_workers=WHISPER_NUM_WORKERS,
+                 idle_unload=WHISPER_IDLE_UNLOAD, max_models=WHISPER_MAX_MODELS, loader=None):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.idle_unload = idle_unload
+        self.max_models = max_models
+        self._loader = loader or WhisperModel
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._reaper = None
+        self._reaper_pid = None
+        self._unload_callbacks = []
+
+    @property
+    def available(self):
+        return self._loader is not None
+
+    def _key(self, model_size=None, compute_type=None):
+        return (model_size or self.model_size, self.device, compute_type or self.compute_type)
+
+    def _load(self, key):
+        model_size, device, compute_type = key
+        print(f"Loading Whisper model ({model_size}, {device}, {compute_type})...")
+        before = current_rss()
+        kwargs = {"device": device, "compute_type": compute_type}
+        if self.num_workers > 1:
+            # Parallel transcriptions split the cores instead of oversubscribing them
+            kwargs["num_workers"] = self.num_workers
+            kwargs["cpu_threads"] = self.cpu_threads or max((os.cpu_count() or 1) // self.num_workers, 1)
+        elif self.cpu_threads:
+            kwargs["cpu_threads"] = self.cpu_threads
+        model = self._loader(model_size, **kwargs)
+        after = current_rss()
+        rss_bytes = after - before if before is not None and after is not None else None
+        return _Entry(model, rss_bytes)
+
+    def _acquire(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.active += 1
+                return entry
+        # One load at a time; re-check in case another thread just loaded it
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                self._evict_for_load()
+                entry = self._load(key)
+                with self._lock:
+                    self._entries[key] = entry
+            with self._lock:
+                entry.active += 1
+        self._ensure_reaper()
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.active -= 1
+            entry.uses += 1
+            entry.last_used = time.time()
+
+    @contextmanager
+    def use(self, model_size=None, compute_type=None):
+        """
+        Yield the shared model (loading it if needed), or None if it cannot be
+        loaded. Consume `transcribe`'s segment generator inside the block; the
+        model is not unloaded while any block using it is open.
+        """
+        if not self.available:
+            yield None
+            return
+        try:
+            entry = self._acquire(self._key(model_size, compute_type))
+        except Exception as e:
+            print(f"Warning: Failed to load Whisper model: {e}")
+            yield None
+            return
+        try:
+            yield entry.model
+        finally:
+            self._release(entry)
+
+    def get(self, model_size=None, compute_type=None):
+        """The shared model, or None. Prefer `use()` so idle unloading can see the caller."""
+        with self.use(model_size, compute_type) as model:
+            return model
+
+    def preload(self, *model_sizes):
+        """
+        Load the given models (default: the default model) now, at worker boot.
+        Only the first `max_models` are loaded, so preloading never evicts.
+        """
+        model_sizes = list(dict.fromkeys(model_sizes or (self.model_size,)))
+        if self.max_models > 0:
+            model_sizes = model_sizes[:self.max_models]
+        for model_size in model_sizes:
+            if self.get(model_size) is not None:
+                print(f"Whisper model {model_size} preloaded (pid {os.getpid()}).")
+
+    def on_unload(self, callback):
+        """Call `callback(model)` whenever a model is dropped from the registry."""
+        with self._lock:
+            self._unload_callbacks.append(callback)
+
+    def _unloaded(self, entries):
+        with self._lock:
+            callbacks = list(self._unload_callbacks)
+        for entry in entries:
+            for callback in callbacks:
+                try:
+                    callback(entry.model)
+                except Exception as e:
+                    print(f"Warning: Whisper unload callback failed: {e}")
+        entries.clear()
+        gc.collect()
+
+    def _evict_for_load(self):
+        """Unload least recently used idle models until one more fits under `max_models`."""
+        if self.max_models <= 0:
+            return
+        with self._lock:
+            idle = sorted((entry.last_used, key) for key, entry in self._entries.items() if entry.active == 0)
+            excess = len(self._entries) - self.max_models + 1
+            evicted = [key for _, key in idle[:max(excess, 0)]]
+            dropped = [self._entries.pop(key) for key in evicted]
+        if dropped:
+            self._unloaded(dropped)
+            print(f"Evicted Whisper model(s) {', '.join(key[0] for key in evicted)} to stay within "
+                  f"WHISPER_MAX_MODELS={self.max_models}.")
+
+    def unload_idle(self, now=None):
+        """Drop models unused for `idle_unload` seconds. Returns how many were dropped."""
+        if self.idle_unload <= 0:
+            return 0
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [key for key, entry in self._entries.items()
+                    if entry.active == 0 and now - entry.last_used >= self.idle_unload]
+            dropped = [self._entries.pop(key) for key in idle]
+        if dropped:
+            self._unloaded(dropped)
+            print(f"Unloaded {len(idle)} idle Whisper model(s).")
+        return len(idle)
+
+    def _ensure_reaper(self):
+        if self.idle_unload <= 0:
+            return
+        with self._lock:
+            # Threads do not survive fork; restart the reaper in a new worker
+            if self._reaper is not None and self._reaper_pid == os.getpid():
+                return
+            self._reaper = threading.Thread(target=self._reap, daemon=True)
+            self._reaper_pid = os.getpid()
+        self._reaper.start()
+
+    def _reap(self):
+        interval = min(max(self.idle_unload / 2, 1.0), 60.0)
+        while True:
+            time.sleep(interval)
+            self.unload_idle()
+
+    def stats(self):
+        with self._lock:
+            models = [{
+                "model_size": key[0],
+                "device": key[1],
+                "compute_type": key[2],
+                "loaded_at": entry.loaded_at,
+                "last_used": entry.last_used,
+                "uses": entry.uses,
+                "active": entry.active,
+                "rss_bytes": entry.rss_bytes
+            } for key, entry in self._entries.items()]
+        return {
+            "available": self.available,
+            "default_model": self.model_size,
+            "num_workers": self.num_workers,
+            "idle_unload": self.idle_unload,
+            "max_models": self.max_models,
+            "process_rss_bytes": current_rss(),
+            "models": models
+        }
+
+
+whisper_registry = WhisperRegistry()
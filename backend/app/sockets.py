@@ -1,72 +1,72 @@
+import os
 from flask import request
 from flask_socketio import emit
-from .voice_quality_analysis import (
-    compute_frame_features, 
-    compute_chunk_scores_from_frames, 
-    compute_raw_rbi_features, 
-    pre_emphasis,
-    classify_laryngeal_mechanism,
-    analyze_consonant_burst,
-    analyze_phrase_ending
-)
 from .extensions import socketio
 
 try:
     import numpy as np
-    import scipy.signal
+    from .utils.resample import StreamingResampler
+    from .utils.ring_buffer import RingBuffer
+    from .streaming_analysis import StreamingVoiceAnalyzer
     _deps_available = True
 except ImportError:
     _deps_available = False
     np = None
-    scipy = None
+    StreamingResampler = None
+    RingBuffer = None
+    StreamingVoiceAnalyzer = None
 
-# In-memory buffer per client
+# In-memory ring buffer, resampler and incremental analyzer per client
 CLIENT_BUFFERS = {}
-CLIENT_STATS = {}
-CLIENT_LAST_RBI = {}
+CLIENT_RESAMPLERS = {}
+CLIENT_ANALYZERS = {}
 
 TARGET_SR = 16000
 MAX_BUFFER_SEC = 3.0
+# How often (in seconds of new audio) full-window Praat metrics are recomputed
+PRAAT_REFRESH_SEC = float(os.environ.get('LIVE_PRAAT_REFRESH_SEC', 0.25))
+
+def _new_buffer():
+    return RingBuffer(int(MAX_BUFFER_SEC * TARGET_SR))
+
+def _new_analyzer():
+    return StreamingVoiceAnalyzer(TARGET_SR, praat_refresh_sec=PRAAT_REFRESH_SEC)
 
 def _append_to_buffer(sid, pcm, sr):
     """
     Append mono float32 PCM to per-client buffer, resampling to TARGET_SR.
+    Returns the number of samples appended.
     """
     if pcm.ndim > 1:
         pcm = np.mean(pcm, axis=1)
 
     if sr != TARGET_SR:
-        # Resample using scipy
-        number_of_samples = int(round(len(pcm) * float(TARGET_SR) / sr))
-        pcm = scipy.signal.resample(pcm, number_of_samples)
+        # Stateful polyphase resampling keeps filter history across chunks,
+        # so chunk boundaries stay continuous
+        resampler = CLIENT_RESAMPLERS.get(sid)
+        if resampler is None or resampler.src_sr != sr:
+            resampler = CLIENT_RESAMPLERS[sid] = StreamingResampler(sr, TARGET_SR)
+        pcm = resampler.process(pcm)
 
     buf = CLIENT_BUFFERS.get(sid)
     if buf is None:
-        buf = np.zeros(0, dtype=np.float32)
-
-    buf = np.concatenate([buf, pcm.astype(np.float32)], axis=0)
+        buf = CLIENT_BUFFERS[sid] = _new_buffer()
 
-    max_len = int(MAX_BUFFER_SEC * TARGET_SR)
-    if buf.size > max_len:
-        buf = buf[-max_len:]
-
-    CLIENT_BUFFERS[sid] = buf
+    # Written in place; the oldest audio beyond MAX_BUFFER_SEC is overwritten
+    return buf.append(pcm)
 
 @socketio.on("connect")
 def handle_connect():
-    CLIENT_BUFFERS[request.sid] = np.zeros(0, dtype=np.float32)
-    CLIENT_STATS[request.sid] = {
-        "ratio_min": None, "ratio_max": None,
-        "centroid_min": None, "centroid_max": None,
-        "tilt_min": None, "tilt_max": None
-    }
-    CLIENT_LAST_RBI[request.sid] = 50.0
+    if not _deps_available:
+        return
+    CLIENT_BUFFERS[request.sid] = _new_buffer()
+    CLIENT_ANALYZERS[request.sid] = _new_analyzer()
 
 @socketio.on("disconnect")
 def handle_disconnect():
     CLIENT_BUFFERS.pop(request.sid, None)
-    CLIENT_STATS.pop(request.sid, None)
-    CLIENT_LAST_RBI.pop(request.sid, None)
+    CLIENT_RESAMPLERS.pop(request.sid, None)
+    CLIENT_ANALYZERS.pop(request.sid, None)
 
 @socketio.on("audio_chunk")
 def handle_audio_chunk(data):
@@ -100,132 +100,15 @@ def handle_audio_chunk(data):
     if pcm.size == 0:
         return
 
-    _append_to_buffer(sid, pcm, sr)
+    n_new = _append_to_buffer(sid, pcm, sr)
 
-    buf = CLIENT_BUFFERS.get(sid)
-    if buf is None or buf.size == 0:
-        return
+    analyzer = CLIENT_ANALYZERS.get(sid)
+    if analyzer is None:
+        analyzer = CLIENT_ANALYZERS[sid] = _new_analyzer()
 
-    window_sec = 1.0
-    n_window = int(window_sec * TARGET_SR)
-    
-    # Analyze if we have enough data (or just analyze what we have if it's > 0.1s)
-    if buf.size < int(0.1 * TARGET_SR):
+    # Only the newly completed hops are analyzed; full-window metrics refresh on a cadence
+    update = analyzer.process(CLIENT_BUFFERS[sid].latest(), n_new)
+    if update is None:
         return
 
-    # Use up to last 1 second
-    window = buf[-n_window:] if buf.size > n_window else buf
-
-    # 1. Standard metrics (CPP, HNR, etc)
-    # This also gives us F0 for the window
-    frame_data = compute_frame_features(window, TARGET_SR)
-    scores = compute_chunk_scores_from_frames(frame_data)
-
-    # 2. Live RBI with global stats
-    f0_list = frame_data["f0"]
-    
-    # NEW: Register & Articulatory Analysis
-    f0_mean = float(np.nanmean(f0_list)) if f0_list else 0.0
-    spectral_slope = frame_data.get("spectral_slope", -6.0)
-    jitter = frame_data.get("jitter", 0.0)
-    hnr = frame_data.get("hnr", 20.0)
-    
-    register = classify_laryngeal_mechanism(f0_mean, spectral_slope, jitter, hnr)
-    
-    # Analyze raw audio for articulation
-    touch = analyze_consonant_burst(window, TARGET_SR)
-    ending = analyze_phrase_ending(window, TARGET_SR)
-    
-    # Pre-emphasis for RBI
-    y_pre = pre_emphasis(window)
-    hop_len = int(0.01 * TARGET_SR)
-    frame_len = int(0.04 * TARGET_SR)
-    
-    client_stats = CLIENT_STATS.get(sid)
-    last_rbi = CLIENT_LAST_RBI.get(sid, 50.0)
-    
-    rbi_sum = 0
-    rbi_count = 0
-    
-    idx = 0
-    for start in range(0, len(y_pre) - frame_len, hop_len):
-        if idx >= len(f0_list): break
-        
-        frame = y_pre[start:start+frame_len]
-        f0 = f0_list[idx]
-        
-        # Gate
-        rms = np.sqrt(np.mean(frame**2))
-        energy_db = 20 * np.log10(rms + 1e-9)
-        is_voiced = (energy_db > -40) and (f0 is not None) and (f0 > 80) and (f0 < 400)
-        
-        if is_voiced:
-            ratio, cent, tilt = compute_raw_rbi_features(frame, TARGET_SR, f0)
-            
-            # Update stats
-            def update(name, val):
-                if client_stats[f"{name}_min"] is None: client_stats[f"{name}_min"] = val
-                else: client_stats[f"{name}_min"] = min(client_stats[f"{name}_min"], val)
-                
-                if client_stats[f"{name}_max"] is None: client_stats[f"{name}_max"] = val
-                else: client_stats[f"{name}_max"] = max(client_stats[f"{name}_max"], val)
-            
-            update("ratio", ratio)
-            update("centroid", cent)
-            update("tilt", tilt)
-            
-            # Normalize
-            def norm(val, name):
-                vmin, vmax = client_stats[f"{name}_min"], client_stats[f"{name}_max"]
-                if vmin is None or vmax is None or vmax <= vmin: return 0.5
-                return np.clip((val - vmin) / (vmax - vmin + 1e-9), 0.0, 1.0)
-            
-            r_norm = norm(ratio, "ratio")
-            c_norm = norm(cent, "centroid")
-            t_norm = norm(tilt, "tilt")
-            
-            f0_clip = min(max(f0, 120), 300)
-            f0_norm = (f0_clip - 120) / (180)
-            
-            raw_score = (0.4 * r_norm) + (0.25 * c_norm) + (0.25 * t_norm) + (0.10 * f0_norm)
-            current_rbi = np.clip(raw_score * 100, 0, 100)
-            
-            # Smooth
-            alpha = 0.2
-            last_rbi = (alpha * current_rbi) + ((1 - alpha) * last_rbi)
-            
-            rbi_sum += last_rbi
-            rbi_count += 1
-            
-        idx += 1
-        
-    CLIENT_STATS[sid] = client_stats
-    CLIENT_LAST_RBI[sid] = last_rbi
-    
-    avg_rbi = rbi_sum / rbi_count if rbi_count > 0 else last_rbi
-
-    emit("analysis_update", {
-        "label": scores["label"],
-        "breathiness_score": scores["breathiness_score"],
-        "roughness_score": scores["roughness_score"],
-        "strain_score": scores["strain_score"],
-        "cpp_mean": scores["cpp_mean"],
-        "hnr_mean": scores["hnr_mean"],
-        "h1_h2_mean": scores["h1_h2_mean"],
-        "rbi_score": avg_rbi,
-        "window_sec": len(window) / TARGET_SR,
-        # NEW: Ventricular engagement detection
-        "ventricular_detected": scores["ventricular_detected"],
-        "ventricular_severity": scores["ventricular_severity"],
-        "ventricular_feedback": scores["ventricular_feedback"],
-        # NEW: Open Quotient estimation
-        "oq_percent": scores["oq_percent"],
-        "oq_zone": scores["oq_zone"],
-        "oq_feedback": scores["oq_feedback"],
-        # NEW: Register & Articulation
-        "register": register,
-        "touch": touch,
-        "ending": ending,
-        "spectral_slope": spectral_slope
-    })
-
+    emit("analysis_update", update)
@@ -0,0 +1,225 @@
+"""
+Incremental live analysis for the Socket.IO audio stream.
+
+`StreamingVoiceAnalyzer` keeps per-session state so each incoming chunk only
+costs work proportional to the audio it adds:
+
+- Per-hop features (energy gate, F0, RBI) are computed once for each newly
+  completed 10 ms hop, with a short pitch track over just the new audio plus
+  a little left context. The new hops of a chunk are processed as one batch,
+  using the same RBI feature/scoring/smoothing helpers as the offline series.
+- RBI normalisation stats, the EMA-smoothed RBI and the recent per-hop values
+  are carried across chunks instead of being rebuilt from the whole window.
+- Full-window Praat metrics (CPP, HNR, jitter/shimmer, spectral slope) and the
+  register/articulation analyses are refreshed on a configurable cadence and
+  reused between refreshes.
+"""
+
+from collections import deque
+
+from .voice_quality_analysis import (
+    compute_frame_features,
+    compute_chunk_scores_from_frames,
+    compute_raw_rbi_features_vectorized,
+    score_rbi_frames,
+    smooth_rbi,
+    pre_emphasis,
+    classify_laryngeal_mechanism,
+    analyze_consonant_burst,
+    analyze_phrase_ending,
+    _deps_available
+)
+from .services.analysis_context import sample_pitch
+
+if _deps_available:
+    import numpy as np
+    import parselmouth
+else:
+    np = None
+    parselmouth = None
+
+# Left context (seconds) prepended to new audio before pitch tracking, so the
+# first new hop has a full autocorrelation window (3 periods at 75 Hz = 40 ms).
+PITCH_CONTEXT_SEC = 0.06
+
+
+class StreamingVoiceAnalyzer:
+    """
+    Per-session incremental analyzer.
+
+    Call `process(buf, n_new)` after appending audio to the session buffer,
+    where `buf` holds the most recent audio (newest sample last) and `n_new`
+    is how many samples at its end arrived since the previous call.
+    """
+
+    def __init__(self, sr=16000, window_sec=1.0, praat_refresh_sec=0.25,
+                 frame_length_s=0.04, hop_length_s=0.01, min_analysis_sec=0.1):
+        self.sr = sr
+        self.window_len = int(window_sec * sr)
+        self.frame_len = int(frame_length_s * sr)
+        self.hop_len = int(hop_length_s * sr)
+        self.praat_refresh_len = int(praat_refresh_sec * sr)
+        self.min_analysis_len = int(min_analysis_sec * sr)
+
+        # Absolute sample positions in the session stream
+        self.total_samples = 0
+        self.next_frame_start = 0
+        self.last_praat_at = None
+
+        # Incremental RBI state
+        self.stats = {
+            "ratio_min": None, "ratio_max": None,
+            "centroid_min": None, "centroid_max": None,
+            "tilt_min": None, "tilt_max": None
+        }
+        self.last_rbi = 50.0
+
+        # (frame_start, value) for voiced hops inside the trailing window
+        self.recent_rbi = deque()
+        self.recent_f0 = deque()
+
+        # Cached full-window results, refreshed every praat_refresh_sec
+        self.window_metrics = None
+
+    def process(self, buf, n_new):
+        """
+        Analyze the newly arrived hops and return the `analysis_update` payload,
+        or None while there is not enough audio yet.
+        """
+        self.total_samples += n_new
+
+        if buf is None or len(buf) < self.min_analysis_len:
+            return None
+
+        self._analyze_new_hops(buf)
+        self._expire_recent()
+
+        window = buf[-self.window_len:] if len(buf) > self.window_len else buf
+        if self.window_metrics is None or self.total_samples - self.last_praat_at >= self.praat_refresh_len:
+            self.window_metrics = self._compute_window_metrics(window)
+            self.last_praat_at = self.total_samples
+
+        rbi_values = [v for _, v in self.recent_rbi]
+        avg_rbi = sum(rbi_values) / len(rbi_values) if rbi_values else self.last_rbi
+
+        return {
+            **self.window_metrics,
+            "rbi_score": avg_rbi,
+            "window_sec": len(window) / self.sr
+        }
+
+    # ----------------------
+    # Per-hop (incremental) analysis
+    # ----------------------
+
+    def _analyze_new_hops(self, buf):
+        buf_start = self.total_samples - len(buf)
+
+        # Skip hops that already fell out of the buffer
+        if self.next_frame_start < buf_start:
+            skipped = -(-(buf_start - self.next_frame_start) // self.hop_len)
+            self.next_frame_start += skipped * self.hop_len
+
+        last_start = self.total_samples - self.frame_len
+        if last_start < self.next_frame_start:
+            return
+        frame_starts = np.arange(self.next_frame_start, last_start + 1, self.hop_len)
+        self.next_frame_start = int(frame_starts[-1]) + self.hop_len
+
+        # Segment covering the new hops plus left context for the pitch tracker
+        seg_start = max(buf_start, int(frame_starts[0]) - int(PITCH_CONTEXT_SEC * self.sr))
+        segment = np.asarray(buf[seg_start - buf_start:], dtype=np.float64)
+        y_pre = pre_emphasis(segment)
+
+        f0_values = self._track_pitch(segment, (frame_starts - seg_start + self.frame_len / 2) / self.sr)
+
+        # All new hops as one (n_hops, frame_len) view
+        offsets = frame_starts - seg_start
+        frames = np.lib.stride_tricks.sliding_window_view(y_pre, self.frame_len)[offsets]
+
+        # Gate
+        rms = np.sqrt(np.mean(frames**2, axis=1))
+        energy_db = 20 * np.log10(rms + 1e-9)
+        with np.errstate(invalid='ignore'):
+            voiced = (energy_db > -40) & (f0_values > 80) & (f0_values < 400)
+        if not np.any(voiced):
+            return
+
+        voiced_starts = frame_starts[voiced]
+        voiced_f0s = f0_values[voiced]
+        ratios, centroids, tilts = compute_raw_rbi_features_vectorized(frames[voiced], self.sr)
+
+        # Each hop is normalised against the min/max seen up to and including it
+        frame_stats = {}
+        for name, values in (("ratio", ratios), ("centroid", centroids), ("tilt", tilts)):
+            frame_stats[f"{name}_min"] = self._running(np.minimum, name, "min", values)
+            frame_stats[f"{name}_max"] = self._running(np.maximum, name, "max", values)
+        self.stats = {key: float(values[-1]) for key, values in frame_stats.items()}
+
+        current_rbi = score_rbi_frames(ratios, centroids, tilts, voiced_f0s, frame_stats)
+        smoothed = smooth_rbi(current_rbi, initial=self.last_rbi)
+        self.last_rbi = float(smoothed[-1])
+
+        starts = voiced_starts.tolist()
+        self.recent_rbi.extend(zip(starts, smoothed.tolist()))
+        self.recent_f0.extend(zip(starts, voiced_f0s.tolist()))
+
+    def _track_pitch(self, segment, query_times):
+        try:
+            pitch = parselmouth.Sound(segment, self.sr).to_pitch(
+                time_step=self.hop_len / self.sr, pitch_floor=75, pitch_ceiling=600
+            )
+        except parselmouth.PraatError:
+            return np.full(len(query_times), np.nan)
+        return sample_pitch(pitch, query_times)
+
+    def _running(self, ufunc, name, bound, values):
+        """Running min/max of `values`, continuing from the carried-over stat."""
+        prev = self.stats[f"{name}_{bound}"]
+        if prev is not None:
+            values = np.concatenate(([prev], values))
+        running = ufunc.accumulate(values)
+        return running[1:] if prev is not None else running
+
+    def _expire_recent(self):
+        horizon = self.total_samples - self.window_len
+        for recent in (self.recent_rbi, self.recent_f0):
+            while recent and recent[0][0] < horizon:
+                recent.popleft()
+
+    # ----------------------
+    # Full-window analysis (refreshed on a cadence)
+    # ----------------------
+
+    def _compute_window_metrics(self, window):
+        frame_data = compute_frame_features(window, self.sr)
+        scores = compute_chunk_scores_from_frames(frame_data)
+
+        f0_recent = [f for _, f in self.recent_f0]
+        f0_mean = sum(f0_recent) / len(f0_recent) if f0_recent else 0.0
+        spectral_slope = frame_data.get("spectral_slope", -6.0)
+        jitter = frame_data.get("jitter", 0.0)
+        hnr = frame_data.get("hnr", 20.0)
+
+        return {
+            "label": scores["label"],
+            "breathiness_score": scores["breathiness_score"],
+            "roughness_score": scores["roughness_score"],
+            "strain_score": scores["strain_score"],
+            "cpp_mean": scores["cpp_mean"],
+            "hnr_mean": scores["hnr_mean"],
+            "h1_h2_mean": scores["h1_h2_mean"],
+            # Ventricular engagement detection
+            "ventricular_detected": scores["ventricular_detected"],
+            "ventricular_severity": scores["ventricular_severity"],
+            "ventricular_feedback": scores["ventricular_feedback"],
+            # Open Quotient estimation
+            "oq_percent": scores["oq_percent"],
+            "oq_zone": scores["oq_zone"],
+            "oq_feedback": scores["oq_feedback"],
+            # Register & Articulation
+            "register": classify_laryngeal_mechanism(f0_mean, spectral_slope, jitter, hnr),
+            "touch": analyze_consonant_burst(window, self.sr),
+            "ending": analyze_phrase_ending(window, self.sr),
+            "spectral_slope": spectral_slope
+        }
@@ -1,55 +1,277 @@
+"""
+Incremental knowledge base indexer.
+
+`sync_knowledge_base` brings the RAG tables in line with the files in the
+knowledge base directory (.pdf, .txt, .md). A JSON manifest records each
+file's size, mtime and SHA-256 and how many chunks were ingested from it:
+
+- unchanged size and mtime: skipped without reading the file;
+- changed stat but same hash (touched, copied): only the manifest is updated;
+- new or changed content: re-ingested, then the file's old chunks deleted;
+- files gone from the directory: their chunks are deleted.
+
+Files already in the database but missing from the manifest (ingested before
+the manifest existed) are adopted as they are, not re-embedded. The manifest
+is rewritten after every file, so an interrupted run resumes where it
+stopped. An exclusive lock file next to the manifest makes sure only one
+process indexes at a time; others skip the run. Both live in the instance
+directory, one manifest per (knowledge base directory, database), never in
+the git-tracked knowledge base directory.
+
+Run it with `flask kb-index` (add --force to re-ingest everything), or let
+the server start it on a background thread (KB_AUTO_INDEX): wsgi.py calls
+`start_background_indexer` for each web worker, while create_app does not,
+so CLI commands and scripts never start it. Either way the app boots without
+waiting for ingestion.
+
+Configuration (environment):
+    KNOWLEDGE_BASE_DIR   directory to index (default: backend/knowledge_base
+                         under the working directory)
+    KB_MANIFEST_PATH     manifest file for KNOWLEDGE_BASE_DIR (default: kb_manifest_<hash>.json
+                         in the instance directory)
+    KB_AUTO_INDEX        background indexing at startup: true/false (default: true)
+    KB_INDEX_INTERVAL    seconds between background re-scans; 0 = once (default: 0)
+"""
+import hashlib
+import json
 import os
+import threading
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from .instance import instance_file
 from .rag import rag_system
 
-def load_knowledge_base(app):
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+KNOWLEDGE_BASE_DIR = os.environ.get(
+    'KNOWLEDGE_BASE_DIR',
+    os.path.join(os.getcwd(), 'backend', 'knowledge_base')
+)
+KB_MANIFEST_PATH = os.environ.get('KB_MANIFEST_PATH')
+KB_AUTO_INDEX = os.environ.get('KB_AUTO_INDEX', 'true').lower() in ('1', 'true', 'yes')
+KB_INDEX_INTERVAL = float(os.environ.get('KB_INDEX_INTERVAL', 0))
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.md')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_manifest_path(kb_dir):
+    """Manifest for `kb_dir` and the current app's database, in the instance directory."""
+    if KB_MANIFEST_PATH and kb_dir == KNOWLEDGE_BASE_DIR:
+        return KB_MANIFEST_PATH
+    from ..extensions import db
+
+    key = f"{os.path.abspath(kb_dir)}|{db.engine.url.render_as_string(hide_password=False)}"
+    return instance_file(f"kb_manifest_{hashlib.sha256(key.encode()).hexdigest()[:16]}.json")
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"files": {}}
+    except (OSError, ValueError) as e:
+        print(f"[AutoLoader] Ignoring unreadable manifest {path}: {e}")
+        return {"files": {}}
+    manifest.setdefault("files", {})
+    return manifest
+
+
+def save_manifest(path, manifest):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class IndexLock:
+    """Exclusive lock on `path`; `acquired` tells whether we got it (without `wait`, it may not)."""
+
+    def __init__(self, path, wait=False):
+        self.path = path
+        self.wait = wait
+        self.acquired = False
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if self.wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK if self.wait else msvcrt.LK_NBLCK, 1)
+            self.acquired = True
+        except OSError:
+            self.acquired = False
+        return self
+
+    def __exit__(self, *exc):
+        if self.acquired:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        return False
+
+
+def _ingest(file_path, filename):
+    if filename.lower().endswith('.pdf'):
+        return rag_system.add_pdf(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return rag_system.add_document(text, source=filename)
+
+
+def sync_knowledge_base(kb_dir=None, manifest_path=None, force=False, wait=False):
     """
-    Scans the backend/knowledge_base directory and uploads new files to the RAG system.
+    Index new and changed files in `kb_dir` and drop removed ones. Must run in
+    an app context. Returns counts per outcome, or None if another process
+    holds the indexer lock (with `wait`, waits for it instead).
     """
-    kb_dir = os.path.join(os.getcwd(), 'backend', 'knowledge_base')
-    
-    # Ensure directory exists
+    kb_dir = kb_dir or KNOWLEDGE_BASE_DIR
+    manifest_path = manifest_path or default_manifest_path(kb_dir)
     if not os.path.exists(kb_dir):
         try:
             os.makedirs(kb_dir)
             print(f"[AutoLoader] Created knowledge base directory at {kb_dir}")
         except Exception as e:
             print(f"[AutoLoader] Failed to create directory: {e}")
-            return
-
-    print(f"[AutoLoader] Scanning {kb_dir} for new documents...")
-    
-    files = [f for f in os.listdir(kb_dir) if os.path.isfile(os.path.join(kb_dir, f))]
-    
-    count = 0
-    for filename in files:
-        file_path = os.path.join(kb_dir, filename)
-        
-        # Check if already exists
-        if rag_system.document_exists(filename):
-            print(f"[AutoLoader] Skipping {filename} (already exists)")
-            continue
-            
-        print(f"[AutoLoader] Processing {filename}...")
-        
-        try:
-            chunks_added = 0
-            if filename.lower().endswith('.pdf'):
-                chunks_added = rag_system.add_pdf(file_path)
-            elif filename.lower().endswith('.txt') or filename.lower().endswith('.md'):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
-                chunks_added = rag_system.add_document(text, source=filename)
-            
-            if chunks_added > 0:
-                print(f"[AutoLoader] Successfully loaded {filename} ({chunks_added} chunks)")
-                count += 1
-            else:
+            return None
+
+    with IndexLock(manifest_path + '.lock', wait=wait) as lock:
+        if not lock.acquired:
+            print("[AutoLoader] Another indexer is running; skipping.")
+            return None
+
+        start = time.time()
+        manifest = load_manifest(manifest_path)
+        entries = manifest["files"]
+        summary = {"added": 0, "updated": 0, "unchanged": 0, "adopted": 0, "removed": 0, "failed": 0}
+
+        files = sorted(
+            f for f in os.listdir(kb_dir)
+            if os.path.isfile(os.path.join(kb_dir, f)) and f.lower().endswith(SUPPORTED_EXTENSIONS)
+        )
+        for filename in files:
+            file_path = os.path.join(kb_dir, filename)
+            stat = os.stat(file_path)
+            entry = entries.get(filename)
+            if not force and entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+                summary["unchanged"] += 1
+                continue
+
+            sha256 = file_sha256(file_path)
+            if not force and entry and entry.get("sha256") == sha256:
+                entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                save_manifest(manifest_path, manifest)
+                summary["unchanged"] += 1
+                continue
+
+            old_ids = rag_system.document_ids(filename)
+            if not force and entry is None and old_ids:
+                # Ingested before the manifest existed
+                print(f"[AutoLoader] Adopting {filename} ({len(old_ids)} chunks already indexed)")
+                entries[filename] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256,
+                                     "chunks": len(old_ids)}
+                save_manifest(manifest_path, manifest)
+                summary["adopted"] += 1
+                continue
+
+            print(f"[AutoLoader] Processing {filename}...")
+            try:
+                chunks_added = _ingest(file_path, filename)
+            except Exception as e:
+                print(f"[AutoLoader] Error processing {filename}: {e}")
+                chunks_added = 0
+            if chunks_added <= 0:
+                # Keep the previous chunks (if any); retry on the next run
                 print(f"[AutoLoader] Failed to load {filename} or file was empty")
-                
-        except Exception as e:
-            print(f"[AutoLoader] Error processing {filename}: {e}")
-            
-    if count > 0:
-        print(f"[AutoLoader] Finished. Added {count} new documents.")
-    else:
-        print("[AutoLoader] No new documents added.")
+                summary["failed"] += 1
+                continue
+
+            # New chunks are in; retire the ones from the previous version
+            rag_system.remove_documents(old_ids)
+            entries[filename] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256,
+                                 "chunks": chunks_added, "indexed_at": time.time()}
+            save_manifest(manifest_path, manifest)
+            summary["updated" if entry else "added"] += 1
+            print(f"[AutoLoader] Successfully loaded {filename} ({chunks_added} chunks)")
+
+        for filename in sorted(set(entries) - set(files)):
+            removed = rag_system.remove_documents(rag_system.document_ids(filename))
+            print(f"[AutoLoader] Removed {filename} ({removed} chunks)")
+            del entries[filename]
+            save_manifest(manifest_path, manifest)
+            summary["removed"] += 1
+
+        print(f"[AutoLoader] Sync finished in {time.time() - start:.1f}s: "
+              + ", ".join(f"{count} {outcome}" for outcome, count in summary.items() if count))
+        return summary
+
+
+def load_knowledge_base(app):
+    """Synchronous sync of the knowledge base directory (kept for scripts)."""
+    with app.app_context():
+        return sync_knowledge_base()
+
+
+def start_background_indexer(app, interval=None):
+    """
+    Sync the knowledge base on a daemon thread (every `interval` seconds if
+    > 0), then warm the vector index. Returns the thread, or None when
+    KB_AUTO_INDEX is off.
+    """
+    if not KB_AUTO_INDEX:
+        return None
+    interval = KB_INDEX_INTERVAL if interval is None else interval
+
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    sync_knowledge_base()
+                    rag_system.build_index()
+                except Exception as e:
+                    print(f"[AutoLoader] Background indexing failed: {e}")
+                finally:
+                    from ..extensions import db
+                    db.session.remove()
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='kb-indexer', daemon=True)
+    thread.start()
+    return thread
+
+
+@click.command('kb-index')
+@click.option('--force', is_flag=True, help='Re-ingest every file, even unchanged ones.')
+@click.option('--dir', 'kb_dir', default=None, help='Knowledge base directory (default: KNOWLEDGE_BASE_DIR).')
+@with_appcontext
+def kb_index_command(force, kb_dir):
+    """Incrementally index the knowledge base directory."""
+    # Waits for a background indexer started by this same app, if any
+    summary = sync_knowledge_base(kb_dir=kb_dir, force=force, wait=True)
+    if summary is None:
+        raise click.ClickException("Knowledge base indexing did not run (directory unavailable).")
+    rag_system.build_index()
@@ -0,0 +1,134 @@
+"""
+Streaming text chunking for knowledge base ingestion.
+
+Every stage is a generator, so a document is never held in memory whole:
+
+    pages (str per PDF page, or one str)
+      -> iter_paragraphs: normalised paragraphs (NFKC, ligatures, hyphenated
+         line breaks re-joined, whitespace collapsed); a paragraph running
+         over a page break is stitched back together
+      -> iter_chunks: chunks of whole sentences up to `max_tokens`, each
+         starting with the last `overlap_tokens` worth of sentences of the
+         previous one
+
+Sizes are counted in estimated tokens (about 4 characters each, the usual
+rule of thumb for English with Gemini/GPT tokenizers), not characters.
+A sentence longer than a whole chunk is split on word boundaries, and a
+single word longer than a chunk is cut every `max_tokens` tokens' worth of
+characters.
+"""
+import re
+import unicodedata
+
+CHARS_PER_TOKEN = 4
+
+_HYPHEN_BREAK = re.compile(r'(\w)-\n(\w)')
+_CONTROL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+_SPACES = re.compile(r'\s+')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+# End of a sentence: terminal punctuation, optional closing quote/bracket, then
+# whitespace before something that can start a sentence
+_SENTENCE_END = re.compile(r'(?<=[.!?…])["\'”’)\]]*\s+(?=["\'“‘(\[]?[A-Z0-9])')
+_TERMINAL = ('.', '!', '?', '…', ':', '"', '”', ')')
+
+
+def estimate_tokens(text):
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+
+def _clean(text):
+    text = unicodedata.normalize('NFKC', text)
+    text = _CONTROL.sub('', text).replace('\r\n', '\n').replace('\r', '\n')
+    return _HYPHEN_BREAK.sub(r'\1\2', text)
+
+
+def iter_paragraphs(pages):
+    """Normalised, non-empty paragraphs from an iterable of page texts."""
+    carry = ''
+    for page in pages:
+        if not page:
+            continue
+        parts = _PARAGRAPH_BREAK.split(_clean(page))
+        for i, part in enumerate(parts):
+            paragraph = _SPACES.sub(' ', part).strip()
+            if not paragraph:
+                continue
+            if carry and i == 0:
+                paragraph = f"{carry} {paragraph}"
+                carry = ''
+            elif carry:
+                yield carry
+                carry = ''
+            if i == len(parts) - 1 and not paragraph.endswith(_TERMINAL):
+                # May continue on the next page
+                carry = paragraph
+            else:
+                yield paragraph
+    if carry:
+        yield carry
+
+
+def split_sentences(paragraph):
+    return [s for s in _SENTENCE_END.split(paragraph) if s]
+
+
+def _split_long(sentence, max_tokens):
+    width = max_tokens * CHARS_PER_TOKEN
+    piece, piece_tokens = [], 0
+    for word in sentence.split(' '):
+        if len(word) > width:
+            # No space to break at (a URL, a table flattened by PDF
+            # extraction): cut the word every `width` characters
+            if piece:
+                yield ' '.join(piece)
+            for start in range(0, len(word) - width, width):
+                yield word[start:start + width]
+            word = word[(len(word) - 1) // width * width:]
+            piece, piece_tokens = [], 0
+        tokens = estimate_tokens(word + ' ')
+        if piece and piece_tokens + tokens > max_tokens:
+            yield ' '.join(piece)
+            piece, piece_tokens = [], 0
+        piece.append(word)
+        piece_tokens += tokens
+    if piece:
+        yield ' '.join(piece)
+
+
+def iter_chunks(paragraphs, max_tokens=256, overlap_tokens=32):
+    """
+    Pack the sentences of `paragraphs` into chunks of at most `max_tokens`
+    estimated tokens. Paragraphs inside a chunk are separated by a blank line.
+    """
+    current = []  # (sentence, tokens, starts_paragraph)
+    current_tokens = 0
+
+    def render(items):
+        text = ''
+        for sentence, _, starts_paragraph in items:
+            if text:
+                text += '\n\n' if starts_paragraph else ' '
+            text += sentence
+        return text
+
+    for paragraph in paragraphs:
+        starts_paragraph = True
+        for sentence in split_sentences(paragraph):
+            pieces = [sentence] if estimate_tokens(sentence) <= max_tokens else _split_long(sentence, max_tokens)
+            for piece in pieces:
+                tokens = estimate_tokens(piece)
+                if current and current_tokens + tokens > max_tokens:
+                    yield render(current)
+                    # Carry whole trailing sentences into the next chunk
+                    overlap, overlap_size = [], 0
+                    for item in reversed(current):
+                        if overlap_size + item[1] > overlap_tokens or overlap_size + item[1] + tokens > max_tokens:
+                            break
+                        overlap.insert(0, item)
+                        overlap_size += item[1]
+                    current, current_tokens = overlap, overlap_size
+                current.append((piece, tokens, starts_paragraph))
+                current_tokens += tokens
+                starts_paragraph = False
+    if current:
+        yield render(current)
@@ -0,0 +1,22 @@
+"""
+The app's instance directory, for runtime state the app owns: caches, vector
+index snapshots, the knowledge base manifest.
+
+It is the directory Flask uses as `app.instance_path` (create_app passes it
+in), resolved here without an app so the analysis worker processes, which
+have none, agree on it. Created on first use, readable by the owner only.
+
+Configuration (environment):
+    INSTANCE_DIR   directory to use (default: backend/instance)
+"""
+import os
+
+INSTANCE_DIR = os.path.abspath(os.environ.get('INSTANCE_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'instance'
+))
+
+
+def instance_file(name):
+    """Path of `name` inside the instance directory, creating the directory if needed."""
+    os.makedirs(INSTANCE_DIR, mode=0o700, exist_ok=True)
+    return os.path.join(INSTANCE_DIR, name)
@@ -0,0 +1,83 @@
+"""
+Bounded LRU + TTL cache for RAG queries.
+
+`SimpleRAG.query` keeps two of these, keyed by the normalised question text
+(`normalize_query`: Unicode-normalised, case-folded, whitespace collapsed,
+trailing punctuation dropped, so "How do I raise my pitch?" and "how do i
+raise my  pitch" share an entry):
+
+- query text -> query embedding (skips the embedding API call);
+- query text + k -> top-k results (skips the embedding call and the search).
+
+Result entries are only valid for the vector index version they were
+computed against; `SimpleRAG` clears them when the version changes.
+
+Configuration (environment):
+    RAG_QUERY_CACHE_SIZE   entries per cache; 0 disables caching (default: 256)
+    RAG_QUERY_CACHE_TTL    seconds an entry stays valid (default: 600)
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+RAG_QUERY_CACHE_SIZE = int(os.environ.get('RAG_QUERY_CACHE_SIZE', 256))
+RAG_QUERY_CACHE_TTL = float(os.environ.get('RAG_QUERY_CACHE_TTL', 600))
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_query(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return _SPACES.sub(' ', text).strip().rstrip('?!.').rstrip()
+
+
+class QueryCache:
+    """Thread-safe LRU of at most `max_entries`, each expiring `ttl` seconds after it was set."""
+
+    def __init__(self, max_entries=RAG_QUERY_CACHE_SIZE, ttl=RAG_QUERY_CACHE_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and self._clock() - item[0] > self.ttl:
+                del self._items[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = (self._clock(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -1,34 +1,199 @@
+import hashlib
 import json
 import os
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
 try:
     import numpy as np
+    from .vector_index import VectorIndex
+    from .embedding_codec import decode_embedding, encode_embedding
     _numpy_available = True
 except ImportError:
     np = None
+    VectorIndex = None
+    decode_embedding = encode_embedding = None
     _numpy_available = False
-import google.generativeai as genai
-from pypdf import PdfReader
-from ..models import KnowledgeDocument
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+from ..models import KnowledgeBaseState, KnowledgeDocument
 from ..extensions import db
+from ..services.embeddings import EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, embedding_service
+from .chunking import iter_chunks, iter_paragraphs
+from .instance import instance_file
+from .query_cache import QueryCache, normalize_query
+
+# Snapshot of the in-memory vector index, shared (memory-mapped) by workers.
+# Unset: one snapshot per database in the instance directory. Set it to an
+# empty string to always build from the database.
+RAG_INDEX_PATH = os.environ.get('RAG_INDEX_PATH')
+# Chunk size and overlap in estimated tokens (~4 characters each)
+RAG_CHUNK_TOKENS = int(os.environ.get('RAG_CHUNK_TOKENS', 256))
+RAG_CHUNK_OVERLAP_TOKENS = int(os.environ.get('RAG_CHUNK_OVERLAP_TOKENS', 32))
+# Chunks embedded and inserted per step while ingesting (bounds memory)
+RAG_INGEST_WINDOW = int(os.environ.get('RAG_INGEST_WINDOW', EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY))
+# How often (seconds) a query checks the table for rows added by other workers
+RAG_INDEX_REFRESH = float(os.environ.get('RAG_INDEX_REFRESH', 30))
 
 class SimpleRAG:
     def __init__(self):
-        # No local storage needed anymore
-        pass
+        # Embeddings live in the database; queries search an in-memory index of them
+        self.index = None
+        self._index_lock = threading.Lock()
+        self._checked_at = 0.0
+        # Repeated questions skip the embedding call (and the search, while the index is unchanged)
+        self._embedding_cache = QueryCache()
+        self._results_cache = QueryCache()
+        self._results_version = None
+        self._timings = {"cached": [0, 0.0], "uncached": [0, 0.0]}
+        self._timings_lock = threading.Lock()
 
-    def get_embedding(self, text):
-        try:
-            # Use Gemini's embedding model
-            result = genai.embed_content(
-                model="models/embedding-001",
-                content=text,
-                task_type="retrieval_document",
-                title="Voice Training Knowledge"
+    def _index_path(self):
+        """RAG_INDEX_PATH, or this database's snapshot in the instance directory ('' = none)."""
+        if RAG_INDEX_PATH is not None:
+            return RAG_INDEX_PATH
+        url = db.engine.url
+        if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+            # Private to this process; nothing to share
+            return ''
+        digest = hashlib.sha256(url.render_as_string(hide_password=False).encode()).hexdigest()[:16]
+        return instance_file(f'rag_index_{digest}')
+
+    def _table_signature(self):
+        # (row count, max id, generation): cheap to read. The generation
+        # changes on every write, even when a deleted max id is reused.
+        generation = db.session.query(KnowledgeBaseState.generation) \
+            .filter(KnowledgeBaseState.id == 1).scalar_subquery()
+        count, max_id, generation = db.session.query(
+            db.func.count(KnowledgeDocument.id), db.func.max(KnowledgeDocument.id), generation
+        ).one()
+        return int(count or 0), int(max_id or 0), int(generation or 0)
+
+    def _bump_generation(self, removal=False):
+        """Count a knowledge base write, in the caller's transaction."""
+        values = {"generation": KnowledgeBaseState.generation + 1}
+        if removal:
+            values["removal_generation"] = KnowledgeBaseState.generation + 1
+        update = db.update(KnowledgeBaseState).where(KnowledgeBaseState.id == 1).values(**values)
+        if not db.session.execute(update).rowcount:
+            # Tables made by create_all rather than the migration start without the row
+            self._ensure_state_row()
+            db.session.execute(update)
+
+    def _ensure_state_row(self):
+        """Insert the generation row unless it exists; safe when workers race to create it."""
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            db.session.execute(
+                insert(KnowledgeBaseState).values(id=1, generation=0, removal_generation=0)
+                .on_conflict_do_nothing(index_elements=['id'])
             )
-            return result['embedding']
-        except Exception as e:
-            print(f"Embedding error: {e}")
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(KnowledgeBaseState(id=1, generation=0, removal_generation=0))
+        except IntegrityError:
+            pass
+
+    def _index_rows(self, index, after_id=0):
+        """Add rows with id > after_id to `index`, streaming only (id, embedding)."""
+        ids, vectors = [], []
+        dim = index.dim if len(index) else None
+        rows = db.session.query(KnowledgeDocument.id, KnowledgeDocument.embedding) \
+            .filter(KnowledgeDocument.id > after_id).order_by(KnowledgeDocument.id).yield_per(1000)
+        for doc_id, blob in rows:
+            embedding = decode_embedding(blob)
+            if embedding is None or len(embedding) == 0:
+                continue
+            if dim is None:
+                dim = len(embedding)
+            elif len(embedding) != dim:
+                print(f"Skipping document {doc_id}: embedding size {len(embedding)} != {dim}")
+                continue
+            ids.append(doc_id)
+            vectors.append(embedding)
+        if ids:
+            index.add(ids, np.stack(vectors))
+
+    def build_index(self):
+        """
+        Load the index snapshot if it matches the table, otherwise build the
+        index from the database (and write a new snapshot).
+        """
+        if not _numpy_available:
             return None
+        with self._index_lock:
+            try:
+                signature = self._table_signature()
+            except Exception as e:
+                print(f"Database query error: {e}")
+                return None
+            path = self._index_path()
+            index = VectorIndex.load(path) if path else None
+            if index is None or index.meta.get('signature') != list(signature):
+                start = time.time()
+                index = VectorIndex()
+                try:
+                    self._index_rows(index)
+                except Exception as e:
+                    print(f"Database query error: {e}")
+                    return None
+                index.meta['signature'] = list(signature)
+                print(f"Built RAG vector index: {len(index)} chunks in {time.time() - start:.2f}s")
+                self._save_index(index)
+            self.index = index
+            self._checked_at = time.time()
+            return index
+
+    def _save_index(self, index):
+        try:
+            path = self._index_path()
+            if path:
+                index.save(path)
+        except OSError as e:
+            print(f"Could not write RAG index snapshot: {e}")
+
+    def _sync_index(self):
+        """Pick up rows written by other workers since the last check."""
+        if self.index is None:
+            return self.build_index()
+        if time.time() - self._checked_at < RAG_INDEX_REFRESH:
+            return self.index
+        with self._index_lock:
+            index = self.index
+            self._checked_at = time.time()
+            try:
+                signature = self._table_signature()
+                known = tuple(index.meta.get('signature') or ())
+                if signature == known:
+                    return index
+                known_count, known_max, known_generation = known if len(known) == 3 else (0, 0, -1)
+                removed_at = db.session.query(KnowledgeBaseState.removal_generation) \
+                    .filter(KnowledgeBaseState.id == 1).scalar() or 0
+                new_rows = db.session.query(db.func.count(KnowledgeDocument.id)) \
+                    .filter(KnowledgeDocument.id > known_max).scalar()
+                # Nothing removed since the index was built: only appends to pick up
+                if removed_at <= known_generation and signature[0] == known_count + new_rows:
+                    self._index_rows(index, after_id=known_max)
+                    index.meta['signature'] = list(signature)
+                    self._save_index(index)
+                    return index
+            except Exception as e:
+                print(f"Database query error: {e}")
+                return index
+        # Rows were deleted; rebuild rather than track removals
+        return self.build_index()
+
+    def get_embedding(self, text):
+        vector = embedding_service.embed([text])[0]
+        return None if vector is None else vector.tolist()
 
     def document_exists(self, source):
         try:
@@ -38,95 +203,179 @@ class SimpleRAG:
             print(f"Error checking document existence: {e}")
             return False
 
-    def add_document(self, text, source="unknown"):
-        # Chunking (simple split by paragraphs or length)
-        # For simplicity, let's chunk by 1000 characters overlap
-        chunk_size = 1000
-        overlap = 100
-        
-        chunks = []
-        for i in range(0, len(text), chunk_size - overlap):
-            chunks.append(text[i:i + chunk_size])
-            
-        count = 0
-        for chunk in chunks:
-            if len(chunk.strip()) < 50: continue
-            
-            embedding = self.get_embedding(chunk)
-            if embedding:
-                doc = KnowledgeDocument(
-                    content=chunk,
-                    source=source,
-                    embedding=embedding
-                )
-                db.session.add(doc)
-                count += 1
-        
+    def document_ids(self, source):
+        """Ids of the chunks ingested from `source`."""
+        try:
+            return [doc_id for (doc_id,) in db.session.query(KnowledgeDocument.id).filter_by(source=source)]
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def remove_documents(self, ids):
+        """Delete the chunks with these ids. Returns how many were deleted."""
+        if not ids:
+            return 0
         try:
+            removed = KnowledgeDocument.query.filter(KnowledgeDocument.id.in_(list(ids))) \
+                .delete(synchronize_session=False)
+            if removed:
+                self._bump_generation(removal=True)
             db.session.commit()
         except Exception as e:
             print(f"Database error: {e}")
             db.session.rollback()
             return 0
-            
-        return count
+        # Deletions make the next query's sync rebuild the index
+        self._checked_at = 0.0
+        return removed
+
+    def add_document(self, text, source="unknown"):
+        return self.add_chunks(iter_chunks(iter_paragraphs([text]), RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP_TOKENS),
+                               source)
+
+    def add_chunks(self, chunks, source="unknown"):
+        """
+        Embed and store an iterable of chunk texts, RAG_INGEST_WINDOW chunks
+        at a time: each window is embedded first (no transaction open while
+        the provider is called), then bulk inserted and committed on its own.
+        If any window fails, the rows already committed for this call are
+        deleted again. Returns the number of chunks stored (0 on failure).
+        """
+        inserted = []
+        try:
+            window = []
+            for chunk in chunks:
+                if len(chunk.strip()) < 50: continue
+                window.append(chunk)
+                if len(window) >= RAG_INGEST_WINDOW:
+                    inserted += self._insert_window(window, source)
+                    window = []
+            if window:
+                inserted += self._insert_window(window, source)
+        except Exception as e:
+            print(f"Error ingesting {source}: {e}")
+            db.session.rollback()
+            if inserted:
+                # Don't leave half a document behind
+                self.remove_documents(inserted)
+            return 0
+
+        # Rows written here are picked up by the next query's sync
+        self._checked_at = 0.0
+        return len(inserted)
+
+    def _insert_window(self, chunks, source):
+        """Embed `chunks`, then insert and commit them. Returns the new row ids."""
+        embeddings = embedding_service.embed(chunks)
+        rows = [
+            {"content": chunk, "source": source, "embedding": encode_embedding(embedding)}
+            for chunk, embedding in zip(chunks, embeddings)
+            if embedding is not None
+        ]
+        if not rows:
+            return []
+        # Core-style bulk insert: no ORM objects kept in the session
+        ids = db.session.execute(db.insert(KnowledgeDocument).returning(KnowledgeDocument.id), rows).scalars().all()
+        self._bump_generation()
+        db.session.commit()
+        return ids
 
     def add_pdf(self, file_path):
+        if PdfReader is None:
+            print("pypdf is not installed; cannot read PDF files.")
+            return 0
         try:
             reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return self.add_document(text, source=os.path.basename(file_path))
         except Exception as e:
             print(f"Error reading PDF: {e}")
             return 0
+        # Pages are extracted one at a time as the chunker asks for them
+        pages = (page.extract_text() or "" for page in reader.pages)
+        chunks = iter_chunks(iter_paragraphs(pages), RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP_TOKENS)
+        return self.add_chunks(chunks, source=os.path.basename(file_path))
 
     def query(self, query_text, k=3):
-        # Fetch all documents (naive approach for small datasets)
-        # In production with large datasets, use pgvector
-        try:
-            documents = KnowledgeDocument.query.all()
-        except Exception as e:
-            print(f"Database query error: {e}")
+        # Calculate Cosine Similarity
+        if not _numpy_available:
+            print("Numpy not available for vector similarity.")
             return []
 
-        if not documents:
+        start = time.perf_counter()
+        index = self._sync_index()
+        if index is None or len(index) == 0:
             return []
 
+        normalized = normalize_query(query_text)
+        if self._results_version != index.version:
+            # Added or removed chunks: every cached result may be stale
+            self._results_cache.clear()
+            self._results_version = index.version
+        results_key = (embedding_service.provider.key, normalized, k)
+        cached = self._results_cache.get(results_key)
+        if cached is not None:
+            self._record_timing("cached", start)
+            return [dict(result) for result in cached]
+
         # Embed query
+        embedding_key = (embedding_service.provider.key, normalized)
+        query_embedding = self._embedding_cache.get(embedding_key)
+        if query_embedding is None:
+            query_embedding = embedding_service.embed_query(query_text)
+            if query_embedding is None:
+                return []
+            self._embedding_cache.set(embedding_key, query_embedding)
+
         try:
-            query_embedding = genai.embed_content(
-                model="models/embedding-001",
-                content=query_text,
-                task_type="retrieval_query"
-            )['embedding']
-        except Exception as e:
-            print(f"Query embedding error: {e}")
+            hits = index.search(query_embedding, k)
+        except ValueError as e:
+            print(f"Vector search error: {e}")
+            return []
+        if not hits:
             return []
 
-        # Calculate Cosine Similarity
-        if not _numpy_available:
-            print("Numpy not available for vector similarity.")
+        # Only the k winning rows are loaded from the database
+        try:
+            docs = KnowledgeDocument.query.filter(KnowledgeDocument.id.in_([doc_id for doc_id, _ in hits])).all()
+        except Exception as e:
+            print(f"Database query error: {e}")
             return []
+        by_id = {doc.id: doc for doc in docs}
 
-        query_vec = np.array(query_embedding)
         results = []
-
-        for doc in documents:
-            if not doc.embedding: continue
-            
-            doc_vec = np.array(doc.embedding)
-            similarity = np.dot(query_vec, doc_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(doc_vec))
+        for doc_id, score in hits:
+            doc = by_id.get(doc_id)
+            if doc is None: continue
             results.append({
                 "text": doc.content,
                 "source": doc.source,
-                "score": float(similarity)
+                "score": float(score)
             })
+        if index.version == self._results_version:
+            self._results_cache.set(results_key, [dict(result) for result in results])
+        self._record_timing("uncached", start)
+        return results
+
+    def _record_timing(self, kind, start):
+        with self._timings_lock:
+            self._timings[kind][0] += 1
+            self._timings[kind][1] += time.perf_counter() - start
 
-        # Sort by score desc
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:k]
+    def cache_stats(self):
+        """Query cache counters, mean query latency with and without a cached result, and index size."""
+        with self._timings_lock:
+            latency = {
+                f"{kind}_avg_ms": round(1000 * total / count, 2) if count else None
+                for kind, (count, total) in self._timings.items()
+            }
+        index = self.index
+        return {
+            "query_embeddings": self._embedding_cache.stats(),
+            "query_results": self._results_cache.stats(),
+            "latency": latency,
+            "index": {"chunks": len(index) if index is not None else 0,
+                      "version": index.version if index is not None else None},
+            "embeddings": embedding_service.stats()
+        }
 
 # Singleton instance
 rag_system = SimpleRAG()
@@ -0,0 +1,105 @@
+"""
+Rational polyphase resampling.
+
+`resample_audio` is the whole-signal path (scipy's polyphase `resample_poly`,
+linear in the input length rather than a full-length FFT). `StreamingResampler`
+applies the same anti-aliasing filter chunk by chunk, carrying the filter
+history across calls so consecutive chunks join without boundary artifacts.
+"""
+from math import gcd
+
+import numpy as np
+import scipy.signal
+
+
+def polyphase_ratio(src_sr, dst_sr):
+    """Reduced (up, down) factors for converting src_sr to dst_sr."""
+    src_sr, dst_sr = int(src_sr), int(dst_sr)
+    g = gcd(src_sr, dst_sr)
+    return dst_sr // g, src_sr // g
+
+
+def design_filter(up, down):
+    """Anti-aliasing FIR, identical to the one scipy.signal.resample_poly designs."""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    return scipy.signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+
+
+def resample_audio(y, src_sr, dst_sr):
+    """Resample a whole signal (along axis 0) from src_sr to dst_sr."""
+    up, down = polyphase_ratio(src_sr, dst_sr)
+    if up == down:
+        return y
+    return scipy.signal.resample_poly(y, up, down, axis=0)
+
+
+class StreamingResampler:
+    """
+    Stateful polyphase resampler for chunked input.
+
+    Output sample k is sum_i x[i] * h[k*down + delay - i*up], the same
+    zero-phase alignment resample_poly uses, so the concatenated output of
+    successive `process` calls matches resampling the whole stream at once.
+    Outputs whose filter support is not yet complete are held back until the
+    next chunk (about 10 output samples) or until `flush`.
+    """
+
+    def __init__(self, src_sr, dst_sr):
+        self.src_sr = int(src_sr)
+        self.dst_sr = int(dst_sr)
+        self.up, self.down = polyphase_ratio(src_sr, dst_sr)
+
+        # Equal rates pass through; a single tap keeps the bookkeeping uniform
+        h = design_filter(self.up, self.down) if self.up != self.down else np.ones(1)
+        self._delay = (len(h) - 1) // 2
+
+        # Polyphase table: _phases[p, t] = h[p + t * up]
+        self._n_taps = -(-len(h) // self.up)
+        h_padded = np.zeros(self._n_taps * self.up)
+        h_padded[:len(h)] = h
+        self._phases = h_padded.reshape(self._n_taps, self.up).T
+        self._tap_offsets = np.arange(self._n_taps)
+
+        # Last n_taps - 1 inputs (zeros stand in for samples before the stream)
+        self.reset()
+
+    def process(self, chunk):
+        """Feed a chunk of input samples and return the newly available output."""
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+
+        base = self._n_in - len(self._history)  # input index of xs[0]
+        xs = np.concatenate([self._history, chunk])
+        self._n_in += len(chunk)
+        self._history = xs[len(xs) - len(self._history):]
+
+        # Last output whose newest tap index (k*down + delay) // up is available
+        k_end = (self.up * self._n_in - 1 - self._delay) // self.down + 1
+        if k_end <= self._n_out:
+            return np.zeros(0)
+
+        k = np.arange(self._n_out, k_end)
+        m = k * self.down + self._delay
+        newest = m // self.up - base
+        taps = xs[newest[:, None] - self._tap_offsets]
+        out = np.einsum('ij,ij->i', taps, self._phases[m % self.up])
+
+        self._n_out = int(k_end)
+        return out
+
+    def flush(self):
+        """
+        Emit the held-back tail as if the stream ended with silence, then reset
+        so the resampler can start a new stream.
+        """
+        expected = -(-self._n_in * self.up // self.down)
+        remaining = expected - self._n_out
+        # n_taps zeros always advance past the filter delay
+        out = self.process(np.zeros(self._n_taps))[:max(remaining, 0)]
+        self.reset()
+        return out
+
+    def reset(self):
+        self._history = np.zeros(self._n_taps - 1)
+        self._n_in = 0
+        self._n_out = 0
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity ring buffer for streaming audio.
+
+    Samples are written in place into preallocated storage, so appending never
+    allocates. The storage is mirrored (every sample is kept at `i` and
+    `i + capacity`), which means the newest `n` samples are always contiguous
+    and `latest(n)` can return a zero-copy view.
+    """
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        if self.capacity <= 0:
+            raise ValueError("RingBuffer capacity must be positive")
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        self._pos = 0             # next write index in [0, capacity)
+        self.size = 0             # valid samples currently held
+        self.total_written = 0    # samples appended since creation or the last clear()
+
+    def __len__(self):
+        return self.size
+
+    def append(self, samples):
+        """
+        Append samples, overwriting the oldest ones once full.
+        Returns the number of samples appended.
+        """
+        samples = np.asarray(samples, dtype=self._data.dtype).ravel()
+        n = len(samples)
+        if n == 0:
+            return 0
+
+        cap = self.capacity
+        # Only the newest `capacity` samples can survive this write
+        tail = samples[-cap:] if n > cap else samples
+        pos = (self._pos + n - len(tail)) % cap
+
+        first = min(len(tail), cap - pos)
+        rest = len(tail) - first
+        self._data[pos:pos + first] = tail[:first]
+        self._data[pos + cap:pos + cap + first] = tail[:first]
+        if rest:
+            self._data[:rest] = tail[first:]
+            self._data[cap:cap + rest] = tail[first:]
+
+        self._pos = (pos + len(tail)) % cap
+        self.size = min(cap, self.size + n)
+        self.total_written += n
+        return n
+
+    def latest(self, n=None):
+        """
+        Read-only view of the newest `n` samples (all held samples by default),
+        oldest first. The view is only valid until the next append.
+        """
+        n = self.size if n is None else min(int(n), self.size)
+        end = self._pos + self.capacity
+        view = self._data[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def clear(self):
+        self._pos = 0
+        self.size = 0
+        self.total_written = 0
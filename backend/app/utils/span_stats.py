@@ -0,0 +1,76 @@
+"""
+Span aggregates over frame-level tracks.
+
+Per-word (or per-segment) statistics are computed from tracks that were
+extracted once for the whole file. `frame_range` maps time spans to frame
+index ranges with a binary search, and `PrefixStats` keeps prefix sums of a
+track (NaN = missing frame) so count, sum, mean and standard deviation over
+any frame range cost O(1). Both accept scalars or arrays of spans;
+`span_means` combines them for many spans and tracks at once.
+"""
+import numpy as np
+
+
+def frame_range(times, start_s, end_s, min_frames=0):
+    """
+    Index range [i0, i1) of the frames with start_s <= time < end_s.
+
+    `times` must be sorted. With `min_frames`, spans shorter than that many
+    frames are widened to the right (within the track) so very short words
+    still cover the frame they fall into.
+    """
+    times = np.asarray(times)
+    i0 = np.searchsorted(times, start_s, side='left')
+    i1 = np.searchsorted(times, end_s, side='left')
+    if min_frames:
+        n = len(times)
+        i0 = np.minimum(i0, max(n - min_frames, 0))
+        i1 = np.maximum(i1, np.minimum(i0 + min_frames, n))
+    return i0, i1
+
+
+class PrefixStats:
+    """O(1) range count/sum/mean/std over a 1-D track, ignoring NaNs."""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        # Shift by the track mean so the sum of squares does not lose precision
+        self.offset = float(np.mean(values[valid])) if np.any(valid) else 0.0
+        shifted = np.where(valid, values - self.offset, 0.0)
+        self._count = np.concatenate(([0], np.cumsum(valid)))
+        self._sum = np.concatenate(([0.0], np.cumsum(shifted)))
+        self._sumsq = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+
+    def count(self, i0, i1):
+        return self._count[i1] - self._count[i0]
+
+    def sum(self, i0, i1):
+        return self._sum[i1] - self._sum[i0] + self.offset * self.count(i0, i1)
+
+    def mean(self, i0, i1):
+        """Mean of the valid frames in [i0, i1); NaN where there are none."""
+        n = self.count(i0, i1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self._sum[i1] - self._sum[i0]) / n + self.offset
+
+    def std(self, i0, i1):
+        """Population standard deviation (like np.std); NaN where there are no valid frames."""
+        n = self.count(i0, i1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shifted_mean = (self._sum[i1] - self._sum[i0]) / n
+            var = (self._sumsq[i1] - self._sumsq[i0]) / n - shifted_mean ** 2
+        return np.sqrt(np.maximum(var, 0.0))
+
+
+def span_means(times, tracks, starts, ends):
+    """
+    NaN-aware mean of each track over each [start, end) time span.
+
+    `tracks` maps names to arrays aligned with the sorted frame `times`.
+    Returns (frame_counts, {name: means}); a span with no frames, or no valid
+    values, has a NaN mean. O((n_frames + n_spans) + n_spans log n_frames).
+    """
+    i0, i1 = frame_range(times, np.asarray(starts, dtype=float), np.asarray(ends, dtype=float))
+    means = {name: PrefixStats(values).mean(i0, i1) for name, values in tracks.items()}
+    return i1 - i0, means
@@ -0,0 +1,172 @@
+"""
+Energy / zero-crossing voice activity detection.
+
+`detect_speech` finds the speech spans of a recording once per request, on the
+same strided RMS framing the RBI analysis uses (`frame_signal`,
+`frame_energy_db`). The result, a `SpeechSegments`, cuts the silences out of
+the signal (`trim`) so Praat, pitch tracking and ASR only process speech, and
+maps times between the trimmed signal and the original recording
+(`to_original`, `to_trimmed`).
+
+A frame counts as speech when its energy clears an adaptive threshold above
+the recording's noise floor, or when it is a quieter but noisy frame (high
+zero-crossing rate, i.e. a fricative). Short gaps are bridged, blips dropped
+and every span padded, so word edges and the pauses around them are kept and
+the joins in the trimmed signal fall in near-silence.
+
+ANALYSIS_VAD (environment, default: true) turns the trimming on or off for
+the analysis endpoints.
+"""
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ANALYSIS_VAD = os.environ.get('ANALYSIS_VAD', 'true').lower() in ('1', 'true', 'yes')
+
+
+def frame_signal(y, sr, frame_length_s=0.04, hop_length_s=0.01):
+    """
+    Strided (n_frames, frame_len) view of `y`, one frame every hop, with
+    (len(y) - frame_len) // hop_len + 1 frames (none if `y` is too short).
+    """
+    frame_len = int(frame_length_s * sr)
+    hop_len = int(hop_length_s * sr)
+    if len(y) < frame_len or frame_len <= 0:
+        return np.zeros((0, max(frame_len, 0)), dtype=np.asarray(y).dtype)
+    return sliding_window_view(y, frame_len)[::hop_len]
+
+
+def frame_energy_db(frames):
+    """RMS energy of each frame in dB."""
+    rms = np.sqrt(np.mean(frames**2, axis=1) + 1e-12)
+    return 20 * np.log10(rms)
+
+
+def frame_zcr(frames):
+    """Zero-crossing rate of each frame (crossings per sample)."""
+    signs = np.signbit(frames)
+    return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(frames.shape[1] - 1, 1)
+
+
+def _runs(mask):
+    """(start, end) frame indices of the runs of True in `mask`."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges.reshape(-1, 2)
+
+
+class SpeechSegments:
+    """Speech spans of a signal of `n_samples` samples, as [start, end) sample indices."""
+
+    def __init__(self, spans, sr, n_samples):
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.spans = spans if len(spans) else np.array([[0, n_samples]], dtype=np.int64)
+        self.sr = sr
+        self.n_samples = n_samples
+        lengths = self.spans[:, 1] - self.spans[:, 0]
+        # Start of each span inside the trimmed signal
+        self._trimmed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.n_speech_samples = int(lengths.sum())
+
+    @classmethod
+    def whole(cls, sr, n_samples):
+        return cls([[0, n_samples]], sr, n_samples)
+
+    @classmethod
+    def from_list(cls, segments, sr, n_samples):
+        """Inverse of `to_list`."""
+        spans = [[int(round(s["start_s"] * sr)), int(round(s["end_s"] * sr))] for s in segments]
+        return cls(spans, sr, n_samples)
+
+    @property
+    def is_whole(self):
+        return len(self.spans) == 1 and self.spans[0, 0] == 0 and self.spans[0, 1] == self.n_samples
+
+    @property
+    def speech_fraction(self):
+        return self.n_speech_samples / self.n_samples if self.n_samples else 1.0
+
+    def trim(self, y):
+        """The speech spans of `y`, concatenated (`y` itself if nothing is cut)."""
+        if self.is_whole:
+            return y
+        return np.concatenate([y[start:end] for start, end in self.spans])
+
+    def to_original(self, t, is_end=False):
+        """
+        Map times in the trimmed signal (s) to times in the original recording.
+        A time exactly on a join maps to the start of the later span, or with
+        `is_end` (for end times) to the end of the earlier one.
+        """
+        samples = np.asarray(t, dtype=float) * self.sr
+        side = 'left' if is_end else 'right'
+        k = np.clip(np.searchsorted(self._trimmed_starts, samples, side=side) - 1, 0, len(self.spans) - 1)
+        return (samples - self._trimmed_starts[k] + self.spans[k, 0]) / self.sr
+
+    def to_trimmed(self, t):
+        """Map original times (s) into the trimmed signal; NaN where `t` falls in a cut silence."""
+        samples = np.asarray(t, dtype=float) * self.sr
+        k = np.clip(np.searchsorted(self.spans[:, 0], samples, side='right') - 1, 0, len(self.spans) - 1)
+        inside = (samples >= self.spans[k, 0]) & (samples < self.spans[k, 1])
+        return np.where(inside, (samples - self.spans[k, 0] + self._trimmed_starts[k]) / self.sr, np.nan)
+
+    def to_list(self):
+        return [{"start_s": start / self.sr, "end_s": end / self.sr} for start, end in self.spans.tolist()]
+
+
+def detect_speech(y, sr, frame_length_s=0.04, hop_length_s=0.01, min_speech_s=0.08, min_gap_s=0.3,
+                  pad_s=0.15, min_saving=0.1):
+    """
+    Speech spans of `y` as a SpeechSegments.
+
+    Returns the whole signal as one span when nothing (or less than
+    `min_saving` of the recording) would be cut, or when no frame qualifies,
+    so continuous recordings are analysed exactly as before.
+    """
+    n_samples = len(y)
+    frames = frame_signal(y, sr, frame_length_s, hop_length_s)
+    if len(frames) == 0:
+        return SpeechSegments.whole(sr, n_samples)
+
+    energy_db = frame_energy_db(frames)
+    zcr = frame_zcr(frames)
+
+    # Adaptive thresholds: well above the noise floor, within 50 dB of the peak
+    noise_floor = np.percentile(energy_db, 10)
+    peak = np.max(energy_db)
+    threshold = max(noise_floor + 10.0, peak - 50.0)
+    is_speech = energy_db > threshold
+    # Fricatives: quieter, but noise-like and still above the floor
+    is_speech |= (energy_db > noise_floor + 5.0) & (zcr > 0.25)
+
+    runs = _runs(is_speech)
+    if len(runs) == 0:
+        return SpeechSegments.whole(sr, n_samples)
+
+    # Bridge short gaps, then drop blips
+    gaps = runs[1:, 0] - runs[:-1, 1]
+    keep_break = gaps * hop_length_s >= min_gap_s
+    starts = runs[np.concatenate(([True], keep_break)), 0]
+    ends = runs[np.concatenate((keep_break, [True])), 1]
+    long_enough = (ends - starts) * hop_length_s >= min_speech_s
+    starts, ends = starts[long_enough], ends[long_enough]
+    if len(starts) == 0:
+        return SpeechSegments.whole(sr, n_samples)
+
+    # Frames -> samples (a frame covers [i * hop, i * hop + frame_len)), padded
+    hop_len = int(hop_length_s * sr)
+    frame_len = int(frame_length_s * sr)
+    pad = int(pad_s * sr)
+    sample_starts = np.maximum(starts * hop_len - pad, 0)
+    sample_ends = np.minimum((ends - 1) * hop_len + frame_len + pad, n_samples)
+
+    # Padding can make neighbours overlap; merge them
+    overlap = sample_starts[1:] <= sample_ends[:-1]
+    merged_starts = sample_starts[np.concatenate(([True], ~overlap))]
+    merged_ends = sample_ends[np.concatenate((~overlap, [True]))]
+
+    segments = SpeechSegments(np.stack([merged_starts, merged_ends], axis=1), sr, n_samples)
+    if segments.speech_fraction > 1.0 - min_saving:
+        return SpeechSegments.whole(sr, n_samples)
+    return segments
@@ -0,0 +1,155 @@
+"""
+In-process vector index for the RAG knowledge base.
+
+`VectorIndex` keeps every embedding as one row of a contiguous float32
+matrix, L2-normalised on insert, next to an int64 array of document ids.
+A query is a single matrix-vector product (cosine similarity, since all rows
+are unit length) followed by `argpartition` for the top k, so search cost is
+one BLAS call instead of a Python loop over deserialised JSON lists.
+
+Rows are appended in place (capacity doubles as needed) and removed by
+compaction. `save` writes a snapshot (`<path>.vectors.npy`, `<path>.ids.npy`
+and a `<path>.json` header) with atomic renames, and `load` memory-maps it
+read-only, so every worker shares the same pages instead of rebuilding the
+index from the database; the first write copies the mapped rows into memory.
+"""
+import itertools
+import json
+import os
+import threading
+
+import numpy as np
+
+# Index versions are unique within the process, across instances too
+_versions = itertools.count(1)
+
+
+def _normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    def __init__(self, dim=None):
+        self.dim = dim
+        self.meta = {}
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._lock = threading.Lock()
+        # New value on every add/remove (and per instance), so callers can invalidate derived caches
+        self.version = next(_versions)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    def add(self, ids, vectors):
+        """Append documents `ids` with their embeddings (one row per id)."""
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        vectors = _normalize(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        if len(ids) == 0:
+            return
+        with self._lock:
+            if self.dim is None or self._size == 0:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            self._reserve(self._size + len(ids))
+            self._vectors[self._size:self._size + len(ids)] = vectors
+            self._ids[self._size:self._size + len(ids)] = ids
+            self._size += len(ids)
+            self.version = next(_versions)
+
+    def _reserve(self, needed):
+        capacity = len(self._ids)
+        writable = self._vectors.flags.writeable and self._vectors.shape[1] == self.dim
+        if needed <= capacity and writable:
+            return
+        # Grow geometrically; a memory-mapped snapshot is copied on first write
+        capacity = max(needed, 2 * capacity, 64)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        if self._size:
+            vectors[:self._size] = self._vectors[:self._size]
+            ids[:self._size] = self._ids[:self._size]
+        self._vectors, self._ids = vectors, ids
+
+    def remove(self, ids):
+        """Drop the rows of documents `ids`. Returns how many rows were removed."""
+        with self._lock:
+            keep = ~np.isin(self._ids[:self._size], np.asarray(ids, dtype=np.int64))
+            removed = self._size - int(keep.sum())
+            if removed:
+                self._vectors = np.ascontiguousarray(self._vectors[:self._size][keep])
+                self._ids = self._ids[:self._size][keep].copy()
+                self._size = len(self._ids)
+                self.version = next(_versions)
+            return removed
+
+    def search(self, vector, k=3):
+        """Top-`k` (id, cosine similarity) pairs for `vector`, best first."""
+        with self._lock:
+            size = self._size
+            vectors = self._vectors[:size]
+            ids = self._ids[:size]
+        if size == 0 or k <= 0:
+            return []
+        query = _normalize(vector)[0]
+        if len(query) != vectors.shape[1]:
+            raise ValueError(f"Expected a {vectors.shape[1]}-dimensional query, got {len(query)}")
+        scores = vectors @ query
+        if k < size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(size)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(ids[top].tolist(), scores[top].tolist()))
+
+    def save(self, path):
+        """Write the snapshot next to `path` (atomically, file by file)."""
+        with self._lock:
+            vectors = self._vectors[:self._size]
+            ids = self._ids[:self._size]
+            header = dict(self.meta, size=self._size, dim=self.dim)
+            # Arrays first, header last: a header always describes complete arrays
+            for suffix, array in (('.vectors.npy', vectors), ('.ids.npy', ids)):
+                tmp = f"{path}{suffix}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp, path + suffix)
+            tmp = f"{path}.json.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(header, f)
+            os.replace(tmp, path + '.json')
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """The snapshot at `path`, memory-mapped read-only; None if missing or inconsistent."""
+        try:
+            with open(path + '.json') as f:
+                header = json.load(f)
+            mode = 'r' if mmap else None
+            vectors = np.load(path + '.vectors.npy', mmap_mode=mode)
+            ids = np.load(path + '.ids.npy', mmap_mode=mode)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Vector index snapshot unavailable ({e})")
+            return None
+        size = header.get('size')
+        if size != len(ids) or size != len(vectors) or (size and vectors.shape[1] != header.get('dim')):
+            print("Vector index snapshot is inconsistent; ignoring it")
+            return None
+        index = cls(dim=header.get('dim'))
+        index.meta = {key: value for key, value in header.items() if key not in ('size', 'dim')}
+        index._vectors = vectors
+        index._ids = ids
+        index._size = size
+        return index
@@ -5,6 +5,9 @@ try:
     import soundfile as sf
     import scipy.signal
     from numpy.lib.stride_tricks import sliding_window_view
+    from app.utils.resample import resample_audio
+    from app.utils.span_stats import span_means
+    from app.utils.vad import ANALYSIS_VAD, SpeechSegments, detect_speech, frame_energy_db, frame_signal
     _deps_available = True
 except ImportError:
     _deps_available = False
@@ -14,6 +17,16 @@ except ImportError:
     sf = None
     scipy = None
     sliding_window_view = None
+    resample_audio = None
+    span_means = None
+    ANALYSIS_VAD = False
+    SpeechSegments = None
+    detect_speech = None
+    frame_energy_db = None
+    frame_signal = None
+
+from app.services.analysis_context import AnalysisContext, sample_pitch, pitch_frame_times
+from app.services.feature_bundle import FeatureBundle
 
 # VoiceLab-inspired advanced analysis
 try:
@@ -27,6 +40,10 @@ except ImportError:
     measure_speech_rate = None
     run_voicelab_analysis = None
 
+# Version of the analysis algorithms. Bump it whenever a change alters the
+# analysis output so cached results from the previous version are not reused.
+ANALYSIS_VERSION = "2026.10.2"
+
 # ----------------------
 # Goal presets
 # ----------------------
@@ -103,8 +120,8 @@ def load_audio(path, target_sr=16000):
         y = np.mean(y, axis=1)
     
     if sr != target_sr:
-        number_of_samples = int(round(len(y) * float(target_sr) / sr))
-        y = scipy.signal.resample(y, number_of_samples)
+        # Polyphase resampling: linear in the input length, no FFT edge effects
+        y = resample_audio(y, sr, target_sr)
         sr = target_sr
         
     # Simple normalization
@@ -179,32 +196,32 @@ def clean_audio_signal(y, sr):
         
     return y_clean
 
+# The metric functions below accept a parselmouth Sound, a raw array or an
+# AnalysisContext; passing the request's context lets them share Praat objects.
+
 def compute_cpp_praat(sound):
-    if not isinstance(sound, parselmouth.Sound):
-        sound = parselmouth.Sound(sound)
-    pcg = call(sound, "To PowerCepstrogram", 75, 600, 0.0001, 0.02, 50)
+    ctx = AnalysisContext.of(sound)
+    pcg = ctx.power_cepstrogram()
     cpp = call(pcg, "Get peak prominence", 0, 0, 60)
     return cpp
 
 def compute_hnr(sound):
-    if not isinstance(sound, parselmouth.Sound):
-        sound = parselmouth.Sound(sound)
-    harmonicity = call(sound, "To Harmonicity (cc)", 0.01, 75, 0.1, 1.0)
+    ctx = AnalysisContext.of(sound)
+    harmonicity = ctx.harmonicity(0.01, 75, 0.1, 1.0)
     hnr = call(harmonicity, "Get mean", 0, 0)
     return hnr
 
 def compute_jitter_shimmer(sound):
-    if not isinstance(sound, parselmouth.Sound):
-        sound = parselmouth.Sound(sound)
+    ctx = AnalysisContext.of(sound)
     pitch_floor = 75
     pitch_ceiling = 600
-    point_proc = call(sound, "To PointProcess (periodic, cc)", pitch_floor, pitch_ceiling)
+    point_proc = ctx.point_process(pitch_floor, pitch_ceiling)
     jitter_local = call(point_proc, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3) * 100
-    shimmer_local = call([sound, point_proc], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6) * 100
+    shimmer_local = call([ctx.sound, point_proc], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6) * 100
     return jitter_local, shimmer_local
 
 def compute_f0_stats(sound):
-    pitch = sound.to_pitch(pitch_floor=75, pitch_ceiling=600)
+    pitch = AnalysisContext.of(sound).pitch(floor=75, ceiling=600)
     f0_values = pitch.selected_array['frequency']
     f0_values = f0_values[f0_values > 0]
     if len(f0_values) == 0:
@@ -1114,53 +1131,93 @@ def compute_raw_rbi_features_vectorized(frames, sr):
     
     return ratio_hl, centroid, tilt_flipped
 
-def compute_rbi_series(y, sr, frame_length_s=0.04, hop_length_s=0.01):
+def _normalize_rbi_feature(val, vmin, vmax):
+    width = vmax - vmin
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.clip((val - vmin) / width, 0.0, 1.0)
+    return np.where(width > 1e-9, scaled, 0.5)
+
+def score_rbi_frames(ratios, centroids, tilts, f0s, stats):
+    """
+    Combine raw RBI features of voiced frames into 0-100 RBI scores.
+
+    Shared by the offline series and the live stream. `stats` holds the
+    `<feature>_min` / `<feature>_max` normalisation bounds, either as scalars
+    (per-file percentiles) or as per-frame arrays (running live min/max).
+    """
+    r_norm = _normalize_rbi_feature(ratios, stats["ratio_min"], stats["ratio_max"])
+    c_norm = _normalize_rbi_feature(centroids, stats["centroid_min"], stats["centroid_max"])
+    t_norm = _normalize_rbi_feature(tilts, stats["tilt_min"], stats["tilt_max"])
+
+    f0_clip = np.clip(f0s, 120, 300)
+    f0_norm = (f0_clip - 120) / (300 - 120)
+
+    raw_score = (RBI_WEIGHTS["ratio"] * r_norm) + \
+                (RBI_WEIGHTS["centroid"] * c_norm) + \
+                (RBI_WEIGHTS["tilt"] * t_norm) + \
+                (RBI_WEIGHTS["f0"] * f0_norm)
+
+    return np.clip(raw_score * 100, 0, 100)
+
+def smooth_rbi(values, initial=50.0, alpha=0.2):
+    """
+    Exponential smoothing y[n] = alpha * x[n] + (1 - alpha) * y[n-1], seeded with
+    `initial`, run as a single lfilter recurrence.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return values
+    smoothed, _ = scipy.signal.lfilter([alpha], [1.0, alpha - 1.0], values, zi=[(1 - alpha) * initial])
+    return smoothed
+
+def compute_rbi_series(y, sr, frame_length_s=0.04, hop_length_s=0.01, context=None, speech=None):
     """
     Compute RBI for the entire file using the 3-pass approach (Vectorized).
     Optimized version using vectorized operations.
+
+    Pass the request's AnalysisContext as `context` to reuse its pitch track.
+    With `speech` (SpeechSegments), the context holds the trimmed speech
+    signal: frame times are mapped into it and frames in cut silences count
+    as unvoiced.
+    Returns (series, stats): series is a float32 array with one value per
+    frame and NaN for unvoiced frames; use to_json_safe() to serialize it.
     """
     # Pre-processing
     y_pre = pre_emphasis(y)
     
     # Frame settings
-    frame_len = int(frame_length_s * sr)
     hop_len = int(hop_length_s * sr)
     
     # 1. Create Frames using stride tricks for efficiency
-    n_samples = len(y_pre)
-    if n_samples < frame_len:
-        return [], {}
-
-    # Standard sliding window
     # Number of frames: (n_samples - frame_len) // hop_len + 1
-    n_frames = (n_samples - frame_len) // hop_len + 1
+    frames = frame_signal(y_pre, sr, frame_length_s, hop_length_s)
+    n_frames = len(frames)
 
     if n_frames <= 0:
-        return [], {}
-
-    shape = (n_frames, frame_len)
-    strides = (y_pre.strides[0] * hop_len, y_pre.strides[0])
-    frames = np.lib.stride_tricks.as_strided(y_pre, shape=shape, strides=strides)
+        return np.zeros(0, dtype=np.float32), {}
 
     # 2. RMS Energy (Vectorized)
-    rms_values = np.sqrt(np.mean(frames**2, axis=1) + 1e-12)
-    energy_db = 20 * np.log10(rms_values)
+    energy_db = frame_energy_db(frames)
 
     # Adaptive Threshold
     mean_energy = np.mean(energy_db) if len(energy_db) > 0 else -100
     energy_threshold = max(mean_energy - 20, -50)
 
     # 3. F0 Tracking
-    sound = parselmouth.Sound(y, sr)
-    pitch_obj = sound.to_pitch(time_step=hop_length_s, pitch_floor=75, pitch_ceiling=600)
+    if speech is None:
+        speech = SpeechSegments.whole(sr, len(y))
+    if context is None:
+        context = AnalysisContext(speech.trim(y), sr)
+    pitch_obj = context.pitch(time_step=hop_length_s, floor=75, ceiling=600)
     
     # Query times: center of each frame
     starts = np.arange(n_frames) * hop_len
     times = starts / sr
     query_times = times + frame_length_s/2
+    if not speech.is_whole:
+        query_times = speech.to_trimmed(query_times)
 
-    # Vectorized lookup using list comp (fastest way for Parselmouth)
-    f0_values = np.array([pitch_obj.get_value_at_time(t) for t in query_times])
+    f0_values = sample_pitch(pitch_obj, query_times)
     f0_values = np.nan_to_num(f0_values, nan=0.0)
 
     # 4. Voiced Mask
@@ -1170,8 +1227,9 @@ def compute_rbi_series(y, sr, frame_length_s=0.04, hop_length_s=0.01):
     # We will compute features only for voiced frames
     voiced_indices = np.where(is_voiced)[0]
 
+    rbi_series = np.full(n_frames, np.nan, dtype=np.float32)
     if len(voiced_indices) == 0:
-        return [None] * n_frames, {}
+        return rbi_series, {}
         
     voiced_frames = frames[voiced_indices]
     
@@ -1186,44 +1244,104 @@ def compute_rbi_series(y, sr, frame_length_s=0.04, hop_length_s=0.01):
     }
     
     # 7. Normalize and Score
-    def norm_vec(val, vmin, vmax):
-        width = vmax - vmin
-        if width <= 1e-9: return np.full_like(val, 0.5)
-        return np.clip((val - vmin) / width, 0.0, 1.0)
+    current_rbi_voiced = score_rbi_frames(ratios, centroids, tilts, f0_values[voiced_indices], stats)
 
-    r_norm = norm_vec(ratios, stats["ratio_min"], stats["ratio_max"])
-    c_norm = norm_vec(centroids, stats["centroid_min"], stats["centroid_max"])
-    t_norm = norm_vec(tilts, stats["tilt_min"], stats["tilt_max"])
-    
-    voiced_f0s = f0_values[voiced_indices]
-    f0_clip = np.clip(voiced_f0s, 120, 300)
-    f0_norm = (f0_clip - 120) / (300 - 120)
-    
-    raw_score = (RBI_WEIGHTS["ratio"] * r_norm) + \
-                (RBI_WEIGHTS["centroid"] * c_norm) + \
-                (RBI_WEIGHTS["tilt"] * t_norm) + \
-                (RBI_WEIGHTS["f0"] * f0_norm)
+    # 8. Smooth across the voiced frames only; unvoiced frames stay NaN
+    rbi_series[voiced_indices] = smooth_rbi(current_rbi_voiced)
 
-    current_rbi_voiced = np.clip(raw_score * 100, 0, 100)
+    return rbi_series, stats
 
-    # 8. Smoothing and Construct Final Series
-    final_rbi_values = [None] * n_frames
-    
-    last_rbi = 50.0
-    alpha = 0.2
-    voiced_idx = 0
-    
-    for i in range(n_frames):
-        if is_voiced[i]:
-            val = current_rbi_voiced[voiced_idx]
-            smoothed_rbi = (alpha * val) + ((1 - alpha) * last_rbi)
-            last_rbi = smoothed_rbi
-            final_rbi_values[i] = smoothed_rbi
-            voiced_idx += 1
-        else:
-            final_rbi_values[i] = None
-            
-    return final_rbi_values, stats
+# ----------------------
+# Timeline
+# ----------------------
+
+# Index 0 is reserved for frames without an RBI value
+TIMELINE_LABELS = np.array(["silence", "back_dark", "neutral", "bright_forward", "sharp"]) if _deps_available else None
+
+def _nan_to_none(values):
+    obj = np.asarray(values, dtype=float).astype(object)
+    obj[np.isnan(values)] = None
+    return obj.tolist()
+
+def to_json_safe(result):
+    """
+    Convert an analysis result for jsonify: NumPy arrays (e.g. the RBI series)
+    become lists with NaN mapped to None. Call once at the route boundary.
+    """
+    if isinstance(result, dict):
+        return {key: to_json_safe(value) for key, value in result.items()}
+    if isinstance(result, (list, tuple)):
+        return [to_json_safe(value) for value in result]
+    if isinstance(result, np.ndarray):
+        if result.dtype.kind == 'f':
+            return _nan_to_none(result)
+        return result.tolist()
+    return result
+
+def build_timeline(y, sr, pitch, rbi_series, frame_length_s=0.04, hop_length_s=0.01, speech=None):
+    """
+    Build the per-frame timeline payload (times, energy, F0, RBI labels, segments)
+    from one strided frame matrix instead of a per-hop Python loop. Per-frame
+    entries are NumPy arrays (F0 is NaN where unvoiced); to_json_safe turns
+    them into the JSON lists.
+
+    `pitch` may be tracked on the trimmed speech signal of `speech`; the
+    timeline itself always follows the original recording.
+    """
+    frame_len = int(frame_length_s * sr)
+    hop_len = int(hop_length_s * sr)
+
+    # Frame starts follow range(0, len(y) - frame_len, hop_len)
+    n_frames = max(0, (len(y) - frame_len - 1) // hop_len + 1) if len(y) > frame_len else 0
+    starts = np.arange(n_frames) * hop_len
+    times = starts / sr
+
+    if n_frames > 0:
+        frames = sliding_window_view(y, frame_len)[::hop_len][:n_frames]
+        rms = np.sqrt(np.mean(frames**2, axis=1) + 1e-12)
+        energy_db = 20 * np.log10(rms)
+    else:
+        energy_db = np.zeros(0)
+
+    query_times = times + frame_length_s / 2
+    if speech is not None and not speech.is_whole:
+        query_times = speech.to_trimmed(query_times)
+    f0 = sample_pitch(pitch, query_times)
+
+    # RBI label bins: <40 dark, <60 neutral, <=80 bright, >80 sharp
+    rbi = np.full(n_frames, np.nan)
+    rbi_head = rbi_series[:n_frames]
+    rbi[:len(rbi_head)] = rbi_head
+    voiced = ~np.isnan(rbi)
+    codes = np.zeros(n_frames, dtype=np.int64)
+    codes[voiced] = np.digitize(rbi[voiced], [40, 60]) + 1
+    codes[voiced & (rbi > 80)] = 4
+    labels = TIMELINE_LABELS[codes]
+
+    # Run-length encode the labels into segments
+    segments = []
+    if n_frames > 0:
+        change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        seg_starts = np.concatenate(([0], change))
+        seg_ends = np.append(times[change], times[-1] + hop_length_s)
+        segments = [
+            {"start_s": start_s, "end_s": end_s, "label": label}
+            for start_s, end_s, label in zip(times[seg_starts].tolist(), seg_ends.tolist(), TIMELINE_LABELS[codes[seg_starts]].tolist())
+        ]
+
+    if speech is None:
+        speech = SpeechSegments.whole(sr, len(y))
+
+    return {
+        "frame_hop_s": hop_length_s,
+        "times": times,
+        "labels": labels,
+        "energy_db": energy_db,
+        "f0": f0,
+        "rbi": rbi_series,
+        "segments": segments,
+        "speech_segments": speech.to_list()
+    }
 
 # ----------------------
 # Main Analysis
@@ -1348,7 +1466,17 @@ def compare_to_goal(summary, features_global, goal_name):
 
     return comparison
 
-def analyze_file(path, goal_name="transfem_soft_slightly_breathy"):
+def _report(progress, stage):
+    if progress is not None:
+        progress(stage)
+
+def analyze_file(path, goal_name="transfem_soft_slightly_breathy", progress=None):
+    """
+    Full offline analysis of an audio file.
+
+    `progress`, if given, is called with the name of each stage as it starts
+    ("load", "praat", "rbi").
+    """
     if not _deps_available:
         return {
             "error": "Analysis dependencies (numpy, scipy, parselmouth) not installed.",
@@ -1358,48 +1486,98 @@ def analyze_file(path, goal_name="transfem_soft_slightly_breathy"):
             "goals": {}
         }
 
+    _report(progress, "load")
     y, sr = load_audio(path) # 16kHz
-    
+    return analyze_audio(y, sr, goal_name, progress=progress)
+
+def analyze_audio(y, sr, goal_name="transfem_soft_slightly_breathy", progress=None):
+    """analyze_file for audio that is already decoded (16 kHz mono, normalised)."""
+    return apply_goal(extract_audio_features(y, sr, progress=progress), goal_name)
+
+def score_against_goal(bundle, goal_name):
+    """
+    Goal comparison for an extracted FeatureBundle. Pure: no audio, no Praat,
+    so scoring one bundle against every preset costs next to nothing.
+    """
+    if bundle.error:
+        return {}
+    return compare_to_goal(bundle.summary, bundle.features_global, goal_name)
+
+def apply_goal(bundle, goal_name):
+    """Build the analyze_file result for `goal_name` from a FeatureBundle."""
+    result = {}
+    if bundle.error:
+        result["error"] = bundle.error
+    result["summary"] = bundle.summary
+    result["features_global"] = bundle.features_global
+    result["timeline"] = bundle.timeline
+    result["goals"] = score_against_goal(bundle, goal_name)
+    if bundle.bundle_id:
+        result["bundle_id"] = bundle.bundle_id
+    return result
+
+def extract_features(path, progress=None):
+    """Load `path` and extract its goal-independent FeatureBundle."""
+    _report(progress, "load")
+    y, sr = load_audio(path)
+    return extract_audio_features(y, sr, progress=progress)
+
+def extract_audio_features(y, sr, progress=None):
+    """
+    Goal-independent part of the analysis for decoded audio: summary, global
+    features and the timeline (or an error for unusable audio), as a
+    FeatureBundle. Reports the "praat" and "rbi" stages to `progress`.
+    """
     # Check duration
     duration = len(y) / sr
     if duration < 1.0:
-        return {
-            "error": "Audio too short (< 1.0s). Please record at least 1 second for reliable analysis.",
-            "summary": {},
-            "features_global": {},
-            "timeline": {},
-            "goals": {}
-        }
+        return FeatureBundle(
+            error="Audio too short (< 1.0s). Please record at least 1 second for reliable analysis.",
+            version=ANALYSIS_VERSION
+        )
+
+    # Speech spans, once per request: the heavy metrics below only see speech
+    speech = detect_speech(y, sr) if ANALYSIS_VAD else SpeechSegments.whole(sr, len(y))
+    y_speech = speech.trim(y)
 
     # Standard metrics
-    sound = parselmouth.Sound(y, sr)
-    cpp = compute_cpp_praat(sound)
-    hnr = compute_hnr(sound)
-    jitter, shimmer = compute_jitter_shimmer(sound)
-    f0_mean, f0_range = compute_f0_stats(sound)
-    h1_h2 = compute_spectral_tilt_h1_h2(y, sr, f0_mean)
+    # One context per request: every Praat object below is built at most once.
+    _report(progress, "praat")
+    ctx = AnalysisContext(y_speech, sr)
+    cpp = compute_cpp_praat(ctx)
+    hnr = compute_hnr(ctx)
+    jitter, shimmer = compute_jitter_shimmer(ctx)
+    f0_mean, f0_range = compute_f0_stats(ctx)
+    h1_h2 = compute_spectral_tilt_h1_h2(y_speech, sr, f0_mean)
     
     # NEW: F3-region noise analysis (research-based breathiness detection)
     # Per "Breathiness as a Feminine Voice Characteristic" study
-    f3_noise_ratio = compute_f3_noise_ratio(y, sr, f0_mean)
+    f3_noise_ratio = compute_f3_noise_ratio(y_speech, sr, f0_mean)
     
     # NEW: Flow Phonation analysis
     # Per "Applying Flow Phonation in Voice Care for Transgender Women"
-    spectral_tilt_slope = compute_spectral_tilt_slope(y, sr)
+    spectral_tilt_slope = compute_spectral_tilt_slope(y_speech, sr)
+    # The onset needs the lead-in before phonation, so it reads the untrimmed signal
     onset_analysis = detect_onset_type(y, sr)
     phonation_state = classify_phonation_state(spectral_tilt_slope, h1_h2, hnr, jitter, shimmer)
     
     # RBI Analysis
-    rbi_series, rbi_stats = compute_rbi_series(y, sr)
+    _report(progress, "rbi")
+    rbi_series, rbi_stats = compute_rbi_series(y, sr, context=ctx, speech=speech)
     
     # VoiceLab-inspired advanced metrics (VTL, enhanced perturbations)
     voicelab_data = {}
     if _voicelab_available:
         try:
-            vtl_result = estimate_vtl(sound)
-            perturbation_result = compute_perturbation_pca(sound, 75, 600)
-            ltas_result = measure_ltas(sound)
-            rate_result = measure_speech_rate(sound)
+            vtl_result = estimate_vtl(ctx)
+            perturbation_result = compute_perturbation_pca(ctx, 75, 600)
+            ltas_result = measure_ltas(ctx)
+            rate_result = measure_speech_rate(ctx)
+            if not speech.is_whole and "syllables_estimated" in rate_result:
+                # Syllables were counted on speech only; the rate covers the whole recording
+                duration_s = len(y) / sr
+                rate_result["duration_s"] = round(duration_s, 2)
+                rate_result["speech_rate_syl_per_sec"] = round(rate_result["syllables_estimated"] / duration_s, 1)
             
             voicelab_data = {
                 "vtl": vtl_result,
@@ -1410,9 +1588,9 @@ def analyze_file(path, goal_name="transfem_soft_slightly_breathy"):
         except Exception as e:
             voicelab_data = {"error": str(e)}
     
-    # Mean RBI (ignoring Nones)
-    valid_rbis = [x for x in rbi_series if x is not None]
-    rbi_mean = float(np.mean(valid_rbis)) if valid_rbis else 0.0
+    # Mean RBI (ignoring unvoiced NaNs)
+    valid_rbis = rbi_series[~np.isnan(rbi_series)]
+    rbi_mean = float(np.mean(valid_rbis, dtype=np.float64)) if len(valid_rbis) else 0.0
     
     # Classify with F3 noise data for enhanced breathiness detection
     summary = classify_voice_quality(cpp, hnr, h1_h2, jitter, shimmer, rbi_mean, f3_noise_ratio)
@@ -1450,91 +1628,78 @@ def analyze_file(path, goal_name="transfem_soft_slightly_breathy"):
         "syllable_count": voicelab_data.get("speech_rate", {}).get("syllables_estimated")
     }
     
-    # Reconstruct frame data for timeline
-    # We need to regenerate basic frame data to match the timeline structure expected by frontend
-    # or just use what we have.
-    # Let's do a quick pass to get energy/f0 aligned with RBI
-    times = []
-    energy_db = []
-    f0_list = []
-    labels = []
-    
-    frame_len = int(0.04 * sr)
-    hop_len = int(0.01 * sr)
-    pitch_obj = sound.to_pitch(time_step=0.01, pitch_floor=75, pitch_ceiling=600)
-    
-    for i, start in enumerate(range(0, len(y) - frame_len, hop_len)):
-        t = start / sr
-        times.append(t)
-        frame = y[start:start+frame_len]
-        rms = np.sqrt(np.mean(frame**2) + 1e-12)
-        energy_db.append(float(20*np.log10(rms)))
-        
-        f0_val = pitch_obj.get_value_at_time(t + 0.02)
-        f0_list.append(f0_val if not np.isnan(f0_val) else None)
-        
-        # Label based on RBI
-        rbi_val = rbi_series[i] if i < len(rbi_series) else None
-        if rbi_val is None:
-            labels.append("silence")
-        elif rbi_val < 40:
-            labels.append("back_dark")
-        elif rbi_val < 60:
-            labels.append("neutral")
-        elif rbi_val <= 80:
-            labels.append("bright_forward")
-        else:
-            labels.append("sharp")
-
-    # Build segments
-    segments = []
-    if times:
-        curr_label = labels[0]
-        seg_start = times[0]
-        for i in range(1, len(times)):
-            if labels[i] != curr_label:
-                segments.append({"start_s": seg_start, "end_s": times[i], "label": curr_label})
-                curr_label = labels[i]
-                seg_start = times[i]
-        segments.append({"start_s": seg_start, "end_s": times[-1] + 0.01, "label": curr_label})
-
-    goal_comparison = compare_to_goal(summary, features_global, goal_name)
+    # Timeline frames are aligned with the RBI series and share the request's pitch track
+    timeline = build_timeline(y, sr, ctx.pitch(time_step=0.01, floor=75, ceiling=600), rbi_series, speech=speech)
 
-    return {
-        "summary": summary,
-        "features_global": features_global,
-        "timeline": {
-            "frame_hop_s": 0.01,
-            "times": times,
-            "labels": labels,
-            "energy_db": energy_db,
-            "f0": f0_list,
-            "rbi": rbi_series,
-            "segments": segments
-        },
-        "goals": goal_comparison
-    }
+    return FeatureBundle(
+        summary=summary,
+        features_global=features_global,
+        timeline=timeline,
+        version=ANALYSIS_VERSION
+    )
 
-def analyze_file_with_transcript(path, goal_name="transfem_soft_slightly_breathy", transcriber=None, language="en"):
-    base = analyze_file(path, goal_name)
-    if not transcriber: return base
+def analyze_file_with_transcript(path, goal_name="transfem_soft_slightly_breathy", transcriber=None, language="en", progress=None):
+    """
+    analyze_file plus word-level RBI from an ASR transcript.
+    Adds the "asr" and "align" stages to the `progress` callback.
+
+    `transcriber(audio, language=...)` receives the samples decoded here
+    (16 kHz float32), so the file is decoded only once, trimmed to the
+    speech spans (see transcribe_speech).
+    """
+    if not _deps_available or not transcriber:
+        return analyze_file(path, goal_name, progress=progress)
+
+    _report(progress, "load")
+    y, sr = load_audio(path) # 16kHz
+    base = analyze_audio(y, sr, goal_name, progress=progress)
     
-    asr = transcriber(path, language=language)
+    _report(progress, "asr")
+    asr = transcribe_speech(y, sr, base["timeline"], transcriber, language)
+
+    _report(progress, "align")
+    base["transcript"] = align_transcript(base["timeline"], asr)
+    return base
+
+def transcribe_speech(y, sr, timeline, transcriber, language="en"):
+    """
+    Run `transcriber` on the speech spans recorded in the timeline only, and
+    map the word times back onto the original recording.
+    """
+    segments = timeline.get("speech_segments")
+    speech = SpeechSegments.from_list(segments, sr, len(y)) if segments else SpeechSegments.whole(sr, len(y))
+    asr = transcriber(speech.trim(y).astype(np.float32), language=language)
+    if not speech.is_whole:
+        for w in asr.get("words", []):
+            w["start_s"] = float(speech.to_original(w["start_s"]))
+            w["end_s"] = float(speech.to_original(w["end_s"], is_end=True))
+    return asr
+
+def align_transcript(timeline, asr):
+    """
+    Attach the mean RBI and RBI label of its timeline frames to each ASR word.
+    Frames are found by binary search on the sorted frame times and averaged
+    with prefix sums (utils/span_stats), so alignment is O((frames + words) log frames).
+    """
     words = asr.get("words", [])
     
     # Align words with RBI
-    times = base["timeline"]["times"]
-    rbis = base["timeline"]["rbi"]
-    
     aligned_words = []
-    for w in words:
+    if not words:
+        return {"full_text": asr.get("full_text", ""), "words": aligned_words}
+
+    n_frames = len(timeline["times"])
+    frame_counts, means = span_means(
+        timeline["times"],
+        {"rbi": timeline["rbi"][:n_frames]},
+        [w["start_s"] for w in words],
+        [w["end_s"] for w in words]
+    )
+    word_rbis = np.nan_to_num(means["rbi"], nan=0.0)
+
+    for w, count, avg_rbi in zip(words, frame_counts.tolist(), word_rbis.tolist()):
         ws, we = w["start_s"], w["end_s"]
-        # Find indices
-        indices = [i for i, t in enumerate(times) if ws <= t < we]
-        if not indices: continue
-        
-        word_rbis = [rbis[i] for i in indices if rbis[i] is not None]
-        avg_rbi = float(np.mean(word_rbis)) if word_rbis else 0
+        if not count: continue
         
         label = "neutral"
         if avg_rbi < 40: label = "back_dark"
@@ -1550,11 +1715,10 @@ def analyze_file_with_transcript(path, goal_name="transfem_soft_slightly_breathy
             "label": label
         })
         
-    base["transcript"] = {
+    return {
         "full_text": asr.get("full_text", ""),
         "words": aligned_words
     }
-    return base
 
 # ----------------------
 # Live Analysis Helpers (for sockets.py)
@@ -1565,37 +1729,33 @@ def compute_frame_features(y, sr, frame_length_s=0.04, hop_length_s=0.01, energy
     Compute frame-level features for a chunk of audio (used in live streaming).
     Returns a dictionary of lists.
     """
-    sound = parselmouth.Sound(y, sr)
+    ctx = AnalysisContext(y, sr)
     
     # F0
-    pitch = sound.to_pitch(pitch_floor=75, pitch_ceiling=600)
+    pitch = ctx.pitch(floor=75, ceiling=600)
     f0_values = pitch.selected_array['frequency']
     # Filter 0s
     f0_valid = [f for f in f0_values if f > 0]
     f0_mean = float(np.mean(f0_valid)) if f0_valid else None
     
     # CPP
-    cpp = compute_cpp_praat(sound)
+    cpp = compute_cpp_praat(ctx)
     
     # HNR
-    hnr = compute_hnr(sound)
+    hnr = compute_hnr(ctx)
     
     # H1-H2
     h1_h2 = compute_spectral_tilt_h1_h2(y, sr, f0_mean)
     
     # Jitter/Shimmer (might be unstable on short chunks)
-    jitter, shimmer = compute_jitter_shimmer(sound)
+    jitter, shimmer = compute_jitter_shimmer(ctx)
     
     # NEW: Spectral Slope (Full Tilt) for Register Classification
     spectral_slope = compute_spectral_tilt_slope(y, sr)
     
     # Align F0 with the hop size expected by RBI (10ms)
-    pitch_framed = sound.to_pitch(time_step=hop_length_s, pitch_floor=75, pitch_ceiling=600)
-    n_frames = pitch_framed.n_frames
-    f0_list = []
-    for i in range(n_frames):
-        val = pitch_framed.get_value_in_frame(i+1) # 1-based
-        f0_list.append(val if not np.isnan(val) else None)
+    pitch_framed = ctx.pitch(time_step=hop_length_s, floor=75, ceiling=600)
+    f0_list = _nan_to_none(sample_pitch(pitch_framed, pitch_frame_times(pitch_framed)))
         
     return {
         "f0": f0_list,
@@ -0,0 +1,112 @@
+"""
+Offline ingestion benchmark for the knowledge base (app/services/embeddings.py).
+
+Builds a synthetic corpus (topic paragraphs plus boilerplate repeated across
+documents, as in real handouts), then ingests it through SimpleRAG.add_document
+into an in-memory SQLite database with the deterministic hashing provider. A
+fixed per-call delay stands in for the embedding API's network round trip.
+
+    python benchmark_embeddings.py
+    python benchmark_embeddings.py --docs 40 --latency 120 --concurrency 8
+
+Configurations:
+    serial       one text per call, one call at a time, no cache (the old path)
+    batched      --batch-size texts per call
+    concurrent   batched, --concurrency calls in flight
+    warm cache   concurrent again over the same corpus; every chunk cached
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from flask import Flask  # noqa: E402
+
+from app.extensions import db  # noqa: E402
+from app.services.analysis_cache import MemoryLRUCache, NullCache  # noqa: E402
+from app.services.embeddings import EmbeddingService, HashingEmbeddings  # noqa: E402
+from app.utils import rag  # noqa: E402
+
+WORDS = ("breath support resonance vowel formant pitch larynx tilt airflow onset phrase "
+         "register chest head mix brightness warmth placement twang glide vibrato").split()
+
+
+class DelayedEmbeddings(HashingEmbeddings):
+    """Hashing embeddings plus a fixed delay per call (simulated API latency)."""
+
+    def __init__(self, latency_s):
+        super().__init__()
+        self.latency_s = latency_s
+
+    def embed(self, texts, task_type="retrieval_document"):
+        time.sleep(self.latency_s)
+        return super().embed(texts, task_type)
+
+
+def make_corpus(docs, chars, seed=0):
+    rng = np.random.default_rng(seed)
+    boilerplate = [" ".join(rng.choice(WORDS, 160)) + "." for _ in range(3)]
+    corpus = {}
+    for d in range(docs):
+        parts = []
+        while sum(len(p) for p in parts) < chars:
+            if rng.random() < 0.2:
+                parts.append(boilerplate[rng.integers(len(boilerplate))])
+            else:
+                parts.append(" ".join(rng.choice(WORDS, 160)) + ".")
+        corpus[f"doc_{d:03d}.md"] = "\n".join(parts)
+    return corpus
+
+
+def ingest(app, service, corpus):
+    rag.embedding_service = service
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        chunks = sum(rag.SimpleRAG().add_document(text, source=name) for name, text in corpus.items())
+        return chunks, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20, help="documents in the corpus")
+    parser.add_argument("--chars", type=int, default=20000, help="characters per document")
+    parser.add_argument("--latency", type=float, default=80.0, help="simulated ms per embedding call")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    rag.RAG_INDEX_PATH = ''
+
+    corpus = make_corpus(args.docs, args.chars)
+    provider = DelayedEmbeddings(args.latency / 1000.0)
+    cache = MemoryLRUCache(1 << 30)
+    runs = [
+        ("serial", EmbeddingService(provider, NullCache(), batch_size=1, concurrency=1)),
+        ("batched", EmbeddingService(provider, NullCache(), args.batch_size, concurrency=1)),
+        ("concurrent", EmbeddingService(provider, cache, args.batch_size, args.concurrency)),
+        ("warm cache", EmbeddingService(provider, cache, args.batch_size, args.concurrency)),
+    ]
+
+    header = f"{'config':<12} {'chunks':>7} {'seconds':>8} {'chunks/s':>9} {'calls':>6} {'hits':>6}"
+    print(f"{args.docs} documents x {args.chars} chars, {args.latency:.0f} ms per call")
+    print(header)
+    print("-" * len(header))
+    for name, service in runs:
+        chunks, elapsed = ingest(app, service, corpus)
+        stats = service.stats()
+        print(f"{name:<12} {chunks:>7} {elapsed:>8.2f} {chunks / elapsed:>9.1f} "
+              f"{stats['provider_calls']:>6} {stats['cache_hits']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark and accuracy comparison for the pitch engines (app/services/pitch_engines.py).
+
+Synthetic signals with a known F0 contour (harmonic source, vibrato/glides,
+silent gaps, added noise) are the ground truth by default. Audio files given
+on the command line are scored against the pyin track instead.
+
+    python benchmark_pitch.py                      # synthetic corpus
+    python benchmark_pitch.py --snr 10 --repeat 5
+    python benchmark_pitch.py recording.wav --engines praat yin
+
+Reported per engine:
+    x realtime   seconds of audio processed per second of compute
+    voicing      recall (truth voiced -> estimated voiced) / false alarms
+    GPE          gross pitch error: share of frames voiced in both that are
+                 more than 20% off
+    cents        median absolute error on frames voiced in both, excluding gross errors
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.pitch_engines import (  # noqa: E402
+    DEFAULT_HOP_LENGTH,
+    available_pitch_engines,
+    estimate_pitch,
+    frame_count
+)
+
+SR = 16000
+
+
+def synth_voice(contour, sr=SR, snr_db=30.0, seed=0):
+    """Harmonic-rich tone following `contour(t)` (Hz, 0 = silence) plus white noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(3.0 * sr)) / sr
+    f0 = contour(t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(k * phase) / k ** 1.2 for k in range(1, 12))
+    y *= f0 > 0
+    y = 0.3 * y / np.max(np.abs(y))
+    noise_rms = np.sqrt(np.mean(y[f0 > 0] ** 2)) * 10 ** (-snr_db / 20)
+    y = y + noise_rms * rng.standard_normal(len(y))
+
+    times = np.arange(frame_count(len(y), DEFAULT_HOP_LENGTH)) * DEFAULT_HOP_LENGTH / sr
+    truth = np.interp(times, t, f0)
+    # Frames near a voicing boundary are ambiguous; leave them out of the score
+    gated = np.interp(times, t, (f0 > 0).astype(float))
+    truth[gated < 1.0] = np.nan
+    truth[(gated > 0.0) & (gated < 1.0)] = -1.0
+    return y.astype(np.float32), truth
+
+
+def gapped(contour):
+    def with_gaps(t):
+        f0 = contour(t)
+        return np.where(((t > 0.9) & (t < 1.2)) | ((t > 2.1) & (t < 2.25)), 0.0, f0)
+    return with_gaps
+
+
+SYNTHETIC = {
+    "low steady 95 Hz": gapped(lambda t: np.full_like(t, 95.0)),
+    "mid vibrato 200 Hz": gapped(lambda t: 200 + 12 * np.sin(2 * np.pi * 5.5 * t)),
+    "glide 160-320 Hz": gapped(lambda t: 160 * 2 ** (t / 3.0)),
+    "high 440 Hz": gapped(lambda t: 440 + 8 * np.sin(2 * np.pi * 4 * t)),
+}
+
+
+def score(f0, truth):
+    scored = truth >= 0  # -1 marks ambiguous boundary frames
+    truth_voiced = scored & ~np.isnan(truth)
+    est_voiced = scored & ~np.isnan(f0)
+    both = truth_voiced & est_voiced
+    recall = both.sum() / max(truth_voiced.sum(), 1)
+    false_alarm = (est_voiced & ~truth_voiced).sum() / max((scored & ~truth_voiced).sum(), 1)
+    ratio = f0[both] / truth[both]
+    gross = np.abs(ratio - 1.0) > 0.2
+    cents = 1200 * np.abs(np.log2(ratio[~gross])) if np.any(~gross) else np.array([np.nan])
+    return {
+        "recall": recall,
+        "false_alarm": false_alarm,
+        "gpe": gross.mean() if len(gross) else np.nan,
+        "cents": float(np.median(cents))
+    }
+
+
+def timed(engine, y, sr, repeat):
+    estimate_pitch(y[:sr], sr, engine=engine)  # warm-up (pyin JIT, FFT plans)
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f0 = estimate_pitch(y, sr, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return f0, best
+
+
+def load_files(paths):
+    import librosa
+
+    cases = {}
+    for path in paths:
+        y, sr = librosa.load(path, sr=SR)
+        print(f"Computing pyin reference for {path}...")
+        cases[os.path.basename(path)] = (y, estimate_pitch(y, sr, engine="pyin"))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="audio files to score against pyin")
+    parser.add_argument("--engines", nargs="+", default=available_pitch_engines())
+    parser.add_argument("--snr", type=float, default=30.0, help="SNR of the synthetic signals in dB")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per engine (best is kept)")
+    args = parser.parse_args()
+
+    if args.files:
+        cases = load_files(args.files)
+    else:
+        cases = {name: synth_voice(contour, snr_db=args.snr, seed=i)
+                 for i, (name, contour) in enumerate(SYNTHETIC.items())}
+
+    header = f"{'signal':<22} {'engine':<7} {'x realtime':>10} {'recall':>7} {'false+':>7} {'GPE':>6} {'cents':>7}"
+    print(header)
+    print("-" * len(header))
+    totals = {engine: [0.0, 0.0] for engine in args.engines}
+    for name, (y, truth) in cases.items():
+        duration = len(y) / SR
+        for engine in args.engines:
+            f0, elapsed = timed(engine, y, SR, args.repeat)
+            totals[engine][0] += duration
+            totals[engine][1] += elapsed
+            s = score(f0, truth)
+            print(f"{name:<22} {engine:<7} {duration / elapsed:>10.1f} {s['recall']:>7.3f} "
+                  f"{s['false_alarm']:>7.3f} {s['gpe']:>6.3f} {s['cents']:>7.2f}")
+    print("-" * len(header))
+    for engine, (audio_s, compute_s) in totals.items():
+        print(f"{engine:<7} {audio_s / compute_s:8.1f}x realtime overall ({compute_s:.3f} s for {audio_s:.1f} s of audio)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Gunicorn settings (picked up automatically from the working directory).
+
+With WHISPER_PRELOAD=true each worker loads the shared Whisper models (the
+default one and the /api/analyze one, within WHISPER_MAX_MODELS) right after
+it is forked, so the first transcription request does not pay for it.
+The load happens after the fork rather than in the master (preload_app), so
+CTranslate2's threads and memory are never shared across a fork.
+"""
+
+
+def post_fork(server, worker):
+    from app.services.whisper_registry import WHISPER_ANALYZE_MODEL_SIZE, WHISPER_PRELOAD, whisper_registry
+
+    if WHISPER_PRELOAD:
+        whisper_registry.preload(whisper_registry.model_size, WHISPER_ANALYZE_MODEL_SIZE)
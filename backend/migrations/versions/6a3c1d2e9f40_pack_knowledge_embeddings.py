@@ -0,0 +1,92 @@
+"""Store knowledge document embeddings as packed float32 blobs
+
+Revision ID: 6a3c1d2e9f40
+Revises: 502f95b96bf3
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+import json
+import struct
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3c1d2e9f40'
+down_revision = '502f95b96bf3'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the version-1 blob layout from app/utils/embedding_codec.py
+# (magic, version, dtype code, dim, scale), so this migration never changes
+# when the application codec does. Rows are converted as float32 (code 0).
+HEADER = struct.Struct('<2sBBIf')
+BATCH = 500
+
+
+def _pack(vector):
+    values = [float(x) for x in vector]
+    return HEADER.pack(b'EV', 1, 0, len(values), 1.0) + struct.pack(f'<{len(values)}f', *values)
+
+
+def _unpack(blob):
+    blob = bytes(blob)
+    magic, version, code, dim, scale = HEADER.unpack_from(blob)
+    formats = {0: 'f', 1: 'e', 2: 'b'}
+    if magic != b'EV' or version != 1 or code not in formats:
+        raise ValueError("Unsupported embedding blob")
+    values = struct.unpack_from(f'<{dim}{formats[code]}', blob, HEADER.size)
+    return [v * scale for v in values] if code == 2 else list(values)
+
+
+def _convert(source, target, encode):
+    """
+    Copy `source` into `target` for every row, `BATCH` rows per round trip.
+    `target` is a new column, so rows without a value keep its SQL NULL
+    (binding None to a JSON column would write the JSON literal 'null').
+    """
+    conn = op.get_bind()
+    docs = sa.table('knowledge_document', sa.column('id', sa.Integer), source, target)
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(docs.c.id, source).where(docs.c.id > last_id).order_by(docs.c.id).limit(BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        updates = [{'doc_id': doc_id, 'value': encode(value)} for doc_id, value in rows if value]
+        if updates:
+            conn.execute(
+                docs.update().where(docs.c.id == sa.bindparam('doc_id')).values({target.name: sa.bindparam('value')}),
+                updates
+            )
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    with op.batch_alter_table('knowledge_document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('embedding_blob', sa.LargeBinary(), nullable=True))
+
+    def encode(value):
+        # Some drivers hand JSON back as text
+        return _pack(json.loads(value) if isinstance(value, str) else value)
+
+    _convert(sa.column('embedding', sa.JSON), sa.column('embedding_blob', sa.LargeBinary), encode)
+
+    with op.batch_alter_table('knowledge_document', schema=None) as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_blob', new_column_name='embedding',
+                              existing_type=sa.LargeBinary(), existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('knowledge_document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('embedding_json', sa.JSON(), nullable=True))
+
+    _convert(sa.column('embedding', sa.LargeBinary), sa.column('embedding_json', sa.JSON), _unpack)
+
+    with op.batch_alter_table('knowledge_document', schema=None) as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_json', new_column_name='embedding',
+                              existing_type=sa.JSON(), existing_nullable=True)
@@ -0,0 +1,31 @@
+"""Add knowledge base generation counter
+
+Revision ID: 7b4e2f1a8c53
+Revises: 6a3c1d2e9f40
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4e2f1a8c53'
+down_revision = '6a3c1d2e9f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    state = op.create_table('knowledge_base_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('removal_generation', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # The one row every writer updates
+    op.bulk_insert(state, [{'id': 1, 'generation': 0, 'removal_generation': 0}])
+
+
+def downgrade():
+    op.drop_table('knowledge_base_state')
@@ -0,0 +1,186 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.analysis_cache import (
+    MemoryLRUCache, NullCache, SQLiteCache, analyze_file_cached, analyze_file_for_transcript_cached,
+    analyze_file_with_transcript_cached, audio_cache_key, complete_transcript, load_feature_bundle
+)
+from app.services.feature_bundle import FeatureBundle
+from app.voice_quality_analysis import ANALYSIS_VERSION, load_audio
+
+
+class TestCacheBackends(unittest.TestCase):
+    def _check_lru(self, cache):
+        blob = np.zeros(1000).tobytes()  # 8 KB
+        cache.set("a", blob)
+        cache.set("b", blob)
+        self.assertIsNotNone(cache.get("a"))  # "a" is now the most recently used
+        cache.set("c", blob)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_memory_lru_evicts_by_size(self):
+        self._check_lru(MemoryLRUCache(max_bytes=20000))
+
+    def test_sqlite_lru_evicts_by_size_and_persists(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite3")
+            self._check_lru(SQLiteCache(path, max_bytes=20000))
+            reopened = SQLiteCache(path, max_bytes=20000)
+            self.assertEqual(reopened.get("c"), np.zeros(1000).tobytes())
+
+    def test_only_bytes_are_stored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for cache in (MemoryLRUCache(), SQLiteCache(os.path.join(tmp, "cache.sqlite3"))):
+                with self.assertRaises(TypeError):
+                    cache.set("k", {"goals": None})
+                cache.set("k", bytearray(b"abc"))
+                self.assertEqual(cache.get("k"), b"abc")
+
+    def test_key_depends_on_audio_kind_and_version(self):
+        y = np.linspace(-1, 1, 1600)
+        key = audio_cache_key(y, 16000, "features", "1")
+        self.assertEqual(key, audio_cache_key(y.copy(), 16000, "features", "1"))
+        self.assertNotEqual(key, audio_cache_key(y[::-1], 16000, "features", "1"))
+        self.assertNotEqual(key, audio_cache_key(y, 16000, "asr:en", "1"))
+        self.assertNotEqual(key, audio_cache_key(y, 16000, "features", "2"))
+
+
+class TestFeatureBundle(unittest.TestCase):
+    def test_round_trip(self):
+        bundle = FeatureBundle(
+            summary={"label": "balanced", "is_flow": np.bool_(True), "rbi_score": np.float64(51.5)},
+            features_global={"f0_mean_hz": None, "formant_means": [500.0, 1500.0]},
+            timeline={
+                "frame_hop_s": 0.01,
+                "times": np.arange(3) * 0.01,
+                "labels": np.array(["silence", "neutral", "sharp"]),
+                "f0": np.array([np.nan, 180.0, 181.5]),
+                "rbi": np.array([np.nan, 50.0, 82.0], dtype=np.float32),
+                "segments": [{"start_s": 0.0, "end_s": 0.01, "label": "silence"}]
+            },
+            version="1",
+            bundle_id="abc"
+        )
+        restored = FeatureBundle.from_bytes(bundle.to_bytes())
+        self.assertEqual(restored.summary, {"label": "balanced", "is_flow": True, "rbi_score": 51.5})
+        self.assertEqual(restored.features_global, bundle.features_global)
+        self.assertEqual((restored.version, restored.bundle_id, restored.error), ("1", "abc", None))
+        for key in ("times", "labels", "f0", "rbi"):
+            np.testing.assert_array_equal(restored.timeline[key], bundle.timeline[key])
+        self.assertEqual(restored.timeline["rbi"].dtype, np.float32)
+        self.assertEqual(restored.timeline["segments"], bundle.timeline["segments"])
+
+
+class TestAnalyzeFileCached(unittest.TestCase):
+    def test_goal_switch_reuses_features(self):
+        bundle = FeatureBundle(
+            summary={"breathiness_score": 50, "roughness_score": 10, "strain_score": 10, "rbi_score": 50},
+            features_global={"hnr_mean": 15.0, "cpp_mean": 8.0},
+            timeline={"frame_hop_s": 0.01, "rbi": np.array([np.nan, 50.0], dtype=np.float32)}
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.wav")
+            sf.write(path, np.sin(np.arange(16000) / 10.0), 16000)
+            cache = SQLiteCache(os.path.join(tmp, "cache.sqlite3"))
+            with mock.patch("app.voice_quality_analysis.extract_audio_features", return_value=bundle) as extract:
+                first = analyze_file_cached(path, "transfem_soft_slightly_breathy", cache=cache)
+                second = analyze_file_cached(path, "clean_smooth", cache=cache)
+            self.assertEqual(extract.call_count, 1)
+            self.assertEqual(first["goals"]["goal_name"], "transfem_soft_slightly_breathy")
+            self.assertEqual(second["goals"]["goal_name"], "clean_smooth")
+
+            # The bundle id resolves back to the cached features
+            self.assertEqual(first["bundle_id"], second["bundle_id"])
+            cached = load_feature_bundle(first["bundle_id"], cache)
+            self.assertEqual(cached.summary, bundle.summary)
+            np.testing.assert_array_equal(cached.timeline["rbi"], bundle.timeline["rbi"])
+
+    def test_no_bundle_id_without_a_shared_cache(self):
+        bundle = FeatureBundle(
+            summary={"breathiness_score": 50, "roughness_score": 10, "strain_score": 10, "rbi_score": 50},
+            features_global={"hnr_mean": 15.0, "cpp_mean": 8.0},
+            timeline={"frame_hop_s": 0.01, "rbi": np.array([np.nan, 50.0], dtype=np.float32)}
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.wav")
+            sf.write(path, np.sin(np.arange(16000) / 10.0), 16000)
+            # Memory and null backends live in the worker; the web process could never resolve the id
+            for cache in (MemoryLRUCache(), NullCache()):
+                with mock.patch("app.voice_quality_analysis.extract_audio_features", return_value=bundle):
+                    first = analyze_file_cached(path, cache=cache)
+                    second = analyze_file_cached(path, cache=cache)
+                self.assertNotIn("bundle_id", first)
+                self.assertNotIn("bundle_id", second)
+
+    def test_transcript_is_cached_as_json(self):
+        bundle = FeatureBundle(
+            summary={"breathiness_score": 50, "roughness_score": 10, "strain_score": 10, "rbi_score": 50},
+            features_global={"hnr_mean": 15.0, "cpp_mean": 8.0},
+            timeline={"frame_hop_s": 0.01, "times": np.arange(100) * 0.01,
+                      "rbi": np.full(100, 40.0, dtype=np.float32)}
+        )
+        calls = []
+
+        def transcriber(audio, language="en"):
+            calls.append(language)
+            return {"full_text": "hello", "words": [{"text": "hello", "start_s": np.float32(0.1), "end_s": 0.4}]}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.wav")
+            sf.write(path, np.sin(np.arange(16000) / 10.0), 16000)
+            cache = MemoryLRUCache()
+            with mock.patch("app.voice_quality_analysis.extract_audio_features", return_value=bundle):
+                first = analyze_file_with_transcript_cached(path, transcriber=transcriber, cache=cache)
+                second = analyze_file_with_transcript_cached(path, "clean_smooth", transcriber=transcriber, cache=cache)
+            self.assertEqual(calls, ["en"])
+            self.assertEqual(first["transcript"], second["transcript"])
+
+            key = audio_cache_key(*load_audio(path), "asr:en", ANALYSIS_VERSION)
+            self.assertEqual(json.loads(cache.get(key))["full_text"], "hello")
+
+    def test_worker_defers_transcription_to_the_parent(self):
+        bundle = FeatureBundle(
+            summary={"breathiness_score": 50, "roughness_score": 10, "strain_score": 10, "rbi_score": 50},
+            features_global={"hnr_mean": 15.0, "cpp_mean": 8.0},
+            timeline={"frame_hop_s": 0.01, "times": np.arange(100) * 0.01,
+                      "rbi": np.full(100, 40.0, dtype=np.float32)}
+        )
+        calls = []
+
+        def transcriber(audio, language="en"):
+            calls.append(len(audio))
+            return {"full_text": "hello", "words": [{"text": "hello", "start_s": 0.1, "end_s": 0.4}]}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.wav")
+            sf.write(path, np.sin(np.arange(16000) / 10.0), 16000)
+            shared = SQLiteCache(os.path.join(tmp, "cache.sqlite3"))
+            with mock.patch("app.voice_quality_analysis.extract_audio_features", return_value=bundle):
+                # Worker: features only, plus the decoded audio to transcribe
+                result, pending = analyze_file_for_transcript_cached(path, cache=shared)
+                self.assertNotIn("transcript", result)
+                self.assertEqual((pending["audio"].dtype, len(pending["audio"])), (np.float32, 16000))
+
+                # Parent: transcribes and caches the ASR output for the next worker run
+                result = complete_transcript(result, pending, transcriber, cache=shared)
+                self.assertEqual(result["transcript"]["full_text"], "hello")
+                again, pending = analyze_file_for_transcript_cached(path, "clean_smooth", cache=shared)
+            self.assertIsNone(pending)
+            self.assertEqual(again["transcript"], result["transcript"])
+            self.assertEqual(calls, [16000])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import unittest
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.analysis_executor import AnalysisExecutor, AnalysisQueueFull, AnalysisTimeout
+
+
+class TestAnalysisExecutor(unittest.TestCase):
+    def setUp(self):
+        # Builtins only, so spawned workers need no test-module imports
+        self.executor = AnalysisExecutor(max_workers=1, max_queue=0, timeout=30, retry_after=7, initializer=None)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_run_returns_worker_result(self):
+        self.assertEqual(self.executor.run(pow, 2, 10), 1024)
+
+    def test_rejects_when_full(self):
+        busy = self.executor.submit(time.sleep, 1)
+        with self.assertRaises(AnalysisQueueFull) as ctx:
+            self.executor.submit(pow, 2, 3)
+        self.assertEqual(ctx.exception.retry_after, 7)
+
+        # The slot frees up once the running job is done
+        busy.result()
+        self.assertEqual(self.executor.run(pow, 2, 3), 8)
+
+    def test_timeout(self):
+        with self.assertRaises(AnalysisTimeout):
+            self.executor.run(time.sleep, 2, timeout=0.2)
+
+    def test_cleanup_waits_for_a_timed_out_job(self):
+        done = []
+        with self.assertRaises(AnalysisTimeout):
+            self.executor.run(time.sleep, 1, timeout=0.2, on_done=lambda: done.append("running"))
+        # Still running: its inputs must stay in place
+        self.assertEqual(done, [])
+
+        # Still waiting for a worker: cancelled, so cleaned up right away. The
+        # pool hands one job beyond the running one to its call queue early,
+        # so two busy jobs go first.
+        queued = AnalysisExecutor(max_workers=1, max_queue=2, timeout=30, initializer=None)
+        self.addCleanup(queued.shutdown)
+        busy = [queued.submit(time.sleep, 1) for _ in range(2)]
+        with self.assertRaises(AnalysisTimeout):
+            queued.run(pow, 2, 3, timeout=0.1, on_done=lambda: done.append("queued"))
+        self.assertEqual(done, ["queued"])
+
+        busy[0].result()
+        deadline = time.time() + 5
+        while "running" not in done and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertIn("running", done)
+
+    def test_inline_mode(self):
+        inline = AnalysisExecutor(max_workers=0, max_queue=0, initializer=None)
+        self.assertEqual(inline.run(pow, 3, 2), 9)
+        with self.assertRaises(ZeroDivisionError):
+            inline.run(divmod, 1, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.analysis_executor import AnalysisExecutor, report_progress
+from app.services.analysis_jobs import JobStore, JobStoreFull
+
+
+class TestJobStore(unittest.TestCase):
+    def test_lifecycle(self):
+        store = JobStore(ttl=60)
+        job = store.create({"goal": "x"})
+        self.assertEqual(job.status, "queued")
+
+        store.record_progress(job.id, "praat")
+        self.assertEqual((job.status, job.stage), ("running", "praat"))
+        self.assertGreater(job.progress, 0)
+
+        store.finish(job.id, result={"ok": True})
+        self.assertEqual((job.status, job.progress, job.result), ("done", 1.0, {"ok": True}))
+
+        # Late progress events do not reopen a finished job
+        store.record_progress(job.id, "align")
+        self.assertEqual(job.status, "done")
+
+    def test_error(self):
+        store = JobStore(ttl=60)
+        job = store.create()
+        store.finish(job.id, error="boom")
+        self.assertEqual(store.get(job.id).to_dict()["error"], "boom")
+
+    def test_finished_jobs_expire(self):
+        store = JobStore(ttl=0.05)
+        done = store.create()
+        pending = store.create()
+        store.finish(done.id, result={})
+        time.sleep(0.1)
+        self.assertIsNone(store.get(done.id))
+        self.assertIs(store.get(pending.id), pending)
+
+    def test_full_store_evicts_least_recently_used_finished_job(self):
+        store = JobStore(ttl=60, max_jobs=3)
+        first, second, running = store.create(), store.create(), store.create()
+        store.finish(first.id, result={})
+        store.finish(second.id, result={})
+        store.get(first.id)  # polled: second is now the least recently used
+
+        newest = store.create()
+        self.assertIsNone(store.get(second.id))
+        self.assertIs(store.get(first.id), first)
+        self.assertIs(store.get(running.id), running)
+
+        store.create()
+        self.assertIsNone(store.get(first.id))
+        # Only unfinished jobs left: nothing can be evicted
+        self.assertIs(store.get(newest.id), newest)
+        with self.assertRaises(JobStoreFull):
+            store.create()
+
+
+class TestProgressChannel(unittest.TestCase):
+    def test_worker_progress_reaches_parent(self):
+        executor = AnalysisExecutor(max_workers=1, max_queue=0, initializer=None)
+        received = []
+        arrived = threading.Event()
+
+        def on_progress(job_id, stage):
+            received.append((job_id, stage))
+            arrived.set()
+
+        executor.on_progress = on_progress
+        try:
+            executor.run(report_progress, "job-1", "rbi")
+            self.assertTrue(arrived.wait(10))
+        finally:
+            executor.shutdown()
+        self.assertEqual(received, [("job-1", "rbi")])
+
+
+if __name__ == '__main__':
+    unittest.main()
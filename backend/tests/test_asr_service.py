@@ -0,0 +1,128 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.asr_service import ASRQueueFull, ASRService, ASRUnavailable, to_whisper_audio
+from app.services.whisper_registry import WhisperRegistry
+
+
+class BlockingModel:
+    """Stands in for a WhisperModel: one segment per call, released by `gate`."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = []
+
+    def transcribe(self, path, **kwargs):
+        self.calls.append((path, kwargs))
+
+        def segments():
+            self.gate.wait(5)
+            word = SimpleNamespace(word=" hello", start=0.1, end=0.4)
+            yield SimpleNamespace(text=" hello", start=0.0, end=0.5, words=[word])
+
+        return segments(), SimpleNamespace(language="en")
+
+
+class TestASRService(unittest.TestCase):
+    def setUp(self):
+        self.model = BlockingModel()
+        registry = WhisperRegistry(loader=lambda size, **kwargs: self.model)
+        self.service = ASRService(workers=1, max_queue=1, retry_after=3, beam_size=2, batched=False,
+                                  registry=registry)
+        self.paths = []
+        for content in (b"a", b"b", b"c"):
+            fd, path = tempfile.mkstemp(suffix=".wav")
+            os.write(fd, content)
+            os.close(fd)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.model.gate.set()
+        self.service.shutdown()
+        for path in self.paths:
+            os.remove(path)
+
+    def test_result_shape_and_beam_size(self):
+        self.model.gate.set()
+        result = self.service.transcribe(self.paths[0])
+        self.assertEqual(result["language"], "en")
+        self.assertEqual(result["segments"][0]["words"], [{"word": " hello", "start": 0.1, "end": 0.4}])
+        self.assertEqual(self.model.calls[0][1]["beam_size"], 2)
+
+    def test_bounded_queue_and_coalescing(self):
+        first = self.service.submit(self.paths[0])
+        queued = self.service.submit(self.paths[1])
+        # Same bytes and options as a request in flight: shares its future
+        self.assertIs(self.service.submit(self.paths[0]), first)
+        with self.assertRaises(ASRQueueFull) as ctx:
+            self.service.submit(self.paths[2])
+        self.assertEqual(ctx.exception.retry_after, 3)
+
+        self.model.gate.set()
+        first.result(5)
+        queued.result(5)
+        self.assertEqual(len(self.model.calls), 2)
+        self.service.transcribe(self.paths[2])
+
+    def test_decoded_audio_input(self):
+        self.model.gate.set()
+        pcm = to_whisper_audio(np.ones((44100, 2)), 44100)
+        self.assertEqual((pcm.dtype, pcm.shape), (np.float32, (16000,)))
+        self.service.transcribe(pcm)
+        passed = self.model.calls[0][0]
+        self.assertIsInstance(passed, np.ndarray)
+        self.assertEqual(passed.dtype, np.float32)
+
+    def test_model_size_selects_the_model(self):
+        models = {"tiny": BlockingModel(), "base": BlockingModel()}
+        registry = WhisperRegistry(model_size="tiny", loader=lambda size, **kwargs: models[size])
+        service = ASRService(workers=1, max_queue=2, batched=False, registry=registry)
+        try:
+            # Same audio for two models is two requests, not one coalesced one
+            default = service.submit(self.paths[0])
+            base = service.submit(self.paths[0], model_size="base")
+            self.assertIsNot(default, base)
+            for model in models.values():
+                model.gate.set()
+            default.result(5)
+            base.result(5)
+            self.assertEqual([len(models["tiny"].calls), len(models["base"].calls)], [1, 1])
+        finally:
+            service.shutdown()
+
+    def test_one_pipeline_per_model_until_unloaded(self):
+        models = {"tiny": BlockingModel(), "base": BlockingModel()}
+        registry = WhisperRegistry(model_size="tiny", loader=lambda size, **kwargs: models[size], idle_unload=30)
+        service = ASRService(workers=1, max_queue=0, batched=False, registry=registry)
+        with mock.patch("app.services.asr_service.BatchedInferencePipeline", SimpleNamespace):
+            tiny = service._pipeline(registry.get("tiny"))
+            base = service._pipeline(registry.get("base"))
+            # Alternating between models reuses each one's pipeline
+            self.assertIs(service._pipeline(models["tiny"]), tiny)
+            self.assertIs(service._pipeline(models["base"]), base)
+            self.assertEqual(registry.unload_idle(now=10 ** 12), 2)
+            self.assertEqual(service._pipelines, {})
+        service.shutdown()
+
+    def test_unavailable_model(self):
+        def failing_loader(size, **kwargs):
+            raise RuntimeError("no model files")
+
+        service = ASRService(workers=1, max_queue=0, batched=False, registry=WhisperRegistry(loader=failing_loader))
+        with self.assertRaises(ASRUnavailable):
+            service.transcribe(self.paths[0])
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
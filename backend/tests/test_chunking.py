@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.chunking import estimate_tokens, iter_chunks, iter_paragraphs, split_sentences
+
+
+class TestParagraphs(unittest.TestCase):
+    def test_normalises_and_stitches_pages(self):
+        pages = [
+            "Chapter 1\n\nThe ﬁrst exer-\ncise trains   breath\nsupport. It takes",
+            "ten minutes a day.\n\nRest afterwards.",
+            "",
+        ]
+        self.assertEqual(list(iter_paragraphs(pages)), [
+            "Chapter 1",
+            "The first exercise trains breath support. It takes ten minutes a day.",
+            "Rest afterwards.",
+        ])
+
+    def test_is_lazy(self):
+        def pages():
+            yield "One complete paragraph."
+            raise AssertionError("read past the first paragraph")
+        self.assertEqual(next(iter_paragraphs(pages())), "One complete paragraph.")
+
+
+class TestChunks(unittest.TestCase):
+    def setUp(self):
+        self.sentences = [f"Sentence number {i} talks about resonance and breath." for i in range(60)]
+        self.paragraphs = [" ".join(self.sentences[i:i + 6]) for i in range(0, 60, 6)]
+
+    def test_chunks_respect_budget_and_sentence_boundaries(self):
+        chunks = list(iter_chunks(self.paragraphs, max_tokens=64, overlap_tokens=16))
+        self.assertGreater(len(chunks), 5)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk.replace('\n\n', ' ')), 64 + 2)
+            for sentence in split_sentences(chunk.replace('\n\n', ' ')):
+                self.assertIn(sentence, self.sentences)
+
+        # Consecutive chunks share the carried-over sentence
+        for previous, chunk in zip(chunks, chunks[1:]):
+            last = split_sentences(previous.replace('\n\n', ' '))[-1]
+            self.assertTrue(chunk.startswith(last))
+
+        # Every sentence is covered, in order
+        seen = []
+        for chunk in chunks:
+            for sentence in split_sentences(chunk.replace('\n\n', ' ')):
+                if not seen or sentence != seen[-1]:
+                    seen.append(sentence)
+        self.assertEqual(seen, self.sentences)
+
+    def test_paragraph_breaks_and_long_sentences(self):
+        chunks = list(iter_chunks(["First paragraph.", "Second paragraph."], max_tokens=64))
+        self.assertEqual(chunks, ["First paragraph.\n\nSecond paragraph."])
+
+        long_sentence = " ".join(["word"] * 400) + "."
+        chunks = list(iter_chunks([long_sentence], max_tokens=50, overlap_tokens=0))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(c) <= 51 for c in chunks))
+        self.assertEqual(" ".join(chunks), long_sentence)
+
+    def test_words_longer_than_a_chunk_are_hard_split(self):
+        blob = "".join(chr(ord('a') + i % 26) for i in range(1000))
+        chunks = list(iter_chunks([blob], max_tokens=50, overlap_tokens=0))
+        self.assertEqual([len(c) for c in chunks], [200] * 5)
+        self.assertEqual("".join(chunks), blob)
+
+        # The tail of the cut word still shares a chunk with the words after it
+        chunks = list(iter_chunks(["x" * 450 + " after the blob."], max_tokens=50, overlap_tokens=0))
+        self.assertEqual(chunks, ["x" * 200, "x" * 200, "x" * 50 + " after the blob."])
+
+
+if __name__ == '__main__':
+    unittest.main()
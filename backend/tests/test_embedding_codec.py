@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.embedding_codec import HEADER, decode_embedding, encode_embedding
+
+
+class TestEmbeddingCodec(unittest.TestCase):
+    def setUp(self):
+        self.vector = np.random.default_rng(5).standard_normal(768)
+
+    def test_float32_round_trip_is_zero_copy(self):
+        blob = encode_embedding(self.vector, 'float32')
+        self.assertEqual(len(blob), HEADER.size + 768 * 4)
+        decoded = decode_embedding(blob)
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_allclose(decoded, self.vector, rtol=1e-6)
+        # A view over the blob, not a copy
+        self.assertFalse(decoded.flags.owndata)
+        self.assertFalse(decoded.flags.writeable)
+
+    def test_compact_encodings_preserve_cosine(self):
+        for dtype, size, tolerance in (('float16', 2, 1e-5), ('int8', 1, 1e-3)):
+            blob = encode_embedding(self.vector, dtype)
+            self.assertEqual(len(blob), HEADER.size + 768 * size)
+            decoded = decode_embedding(blob).astype(np.float64)
+            cosine = decoded @ self.vector / (np.linalg.norm(decoded) * np.linalg.norm(self.vector))
+            self.assertGreater(cosine, 1 - tolerance, dtype)
+
+    def test_legacy_json_values_and_errors(self):
+        values = self.vector[:4].tolist()
+        np.testing.assert_allclose(decode_embedding(values), values, rtol=1e-6)
+        np.testing.assert_allclose(decode_embedding(json.dumps(values)), values, rtol=1e-6)
+        np.testing.assert_allclose(decode_embedding(json.dumps(values).encode()), values, rtol=1e-6)
+        self.assertIsNone(decode_embedding(None))
+        self.assertIsNone(decode_embedding([]))
+
+        with self.assertRaises(ValueError):
+            decode_embedding(encode_embedding(self.vector)[:-4])
+        with self.assertRaises(ValueError):
+            encode_embedding(self.vector, 'float64')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.analysis_cache import MemoryLRUCache, SQLiteCache
+from app.services.embeddings import EmbeddingService, HashingEmbeddings, get_embedding_provider
+from app.utils.embedding_codec import HEADER, MAGIC
+
+
+class RecordingProvider:
+    """Hashing embeddings that record batch sizes and peak concurrency."""
+
+    key = 'recording'
+
+    def __init__(self, delay=0.0, fail_on=None):
+        self.inner = HashingEmbeddings(dim=16)
+        self.delay = delay
+        self.fail_on = fail_on
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed(self, texts, task_type="retrieval_document"):
+        with self._lock:
+            self.batches.append(list(texts))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on is not None and self.fail_on in texts:
+                raise RuntimeError("provider failure")
+            return self.inner.embed(texts, task_type)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestHashingEmbeddings(unittest.TestCase):
+    def test_deterministic_normalised_and_similarity_preserving(self):
+        provider = get_embedding_provider('hashing')
+        a, b, c = provider.embed([
+            "Breath support keeps the voice steady through long phrases.",
+            "Breath support keeps your voice steady through long phrases!",
+            "Formant tuning changes the perceived brightness of a vowel."
+        ])
+        self.assertEqual(len(a), 768)
+        self.assertEqual(a, HashingEmbeddings().embed(["Breath support keeps the voice steady through long phrases."])[0])
+        self.assertAlmostEqual(np.linalg.norm(a), 1.0)
+        self.assertGreater(np.dot(a, b), np.dot(a, c) + 0.3)
+
+        with self.assertRaises(ValueError):
+            get_embedding_provider('nope')
+
+
+class TestEmbeddingService(unittest.TestCase):
+    def test_batches_deduplicates_and_caches(self):
+        provider = RecordingProvider()
+        service = EmbeddingService(provider, MemoryLRUCache(1 << 20), batch_size=4, concurrency=2)
+        texts = [f"chunk {i}" for i in range(10)] + ["chunk 3", "chunk 7"]
+
+        vectors = service.embed(texts)
+        self.assertEqual([len(b) for b in provider.batches], [4, 4, 2])
+        np.testing.assert_array_equal(vectors[3], vectors[10])
+        np.testing.assert_allclose(vectors[0], provider.inner.embed(["chunk 0"])[0], rtol=1e-6)
+
+        # Second pass is served from the cache
+        again = service.embed(texts[:5] + ["chunk new"])
+        self.assertEqual(provider.batches[-1], ["chunk new"])
+        np.testing.assert_array_equal(again[0], vectors[0])
+        stats = service.stats()
+        self.assertEqual(stats["cache_misses"], 11)
+        self.assertEqual(stats["cache_hits"], 2 + 5)
+        self.assertEqual(stats["provider_calls"], 4)
+
+    def test_cache_stores_float32_blobs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SQLiteCache(os.path.join(tmp, "embeddings.sqlite3"), 1 << 20, table="embedding_cache")
+            provider = RecordingProvider()
+            vector = EmbeddingService(provider, cache).embed(["chunk"])[0]
+
+            blob = cache.get(EmbeddingService(provider)._key("chunk", "retrieval_document"))
+            self.assertEqual(blob[:2], MAGIC)
+            self.assertEqual(len(blob), HEADER.size + 16 * 4)
+            # A fresh service reads the vector back without calling the provider
+            again = EmbeddingService(provider, SQLiteCache(cache.path, 1 << 20, table="embedding_cache"))
+            np.testing.assert_array_equal(again.embed(["chunk"])[0], vector)
+            self.assertEqual(len(provider.batches), 1)
+
+    def test_concurrency_is_bounded(self):
+        provider = RecordingProvider(delay=0.05)
+        service = EmbeddingService(provider, MemoryLRUCache(1 << 20), batch_size=1, concurrency=3)
+        service.embed([f"text {i}" for i in range(12)])
+        self.assertEqual(len(provider.batches), 12)
+        self.assertLessEqual(provider.peak, 3)
+        self.assertGreater(provider.peak, 1)
+
+    def test_failed_batch_yields_none_and_is_not_cached(self):
+        provider = RecordingProvider(fail_on="bad")
+        service = EmbeddingService(provider, MemoryLRUCache(1 << 20), batch_size=2, concurrency=2)
+        vectors = service.embed(["good 1", "good 2", "bad", "good 3"])
+        self.assertIsNotNone(vectors[0])
+        self.assertIsNone(vectors[2])
+        self.assertIsNone(vectors[3])
+
+        provider.fail_on = None
+        self.assertIsNotNone(service.embed(["bad"])[0])
+        self.assertIsNotNone(service.embed_query("anything"))
+
+
+if __name__ == '__main__':
+    unittest.main()
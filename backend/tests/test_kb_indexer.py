@@ -0,0 +1,175 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.extensions import db
+from app.models import KnowledgeDocument
+from app.services.analysis_cache import MemoryLRUCache
+from app.services.embeddings import EmbeddingService, HashingEmbeddings
+from app.utils import auto_loader, instance, rag
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dim=32)
+        self.texts = 0
+
+    def embed(self, texts, task_type="retrieval_document"):
+        self.texts += len(texts)
+        return super().embed(texts, task_type)
+
+
+class TestKnowledgeBaseIndexer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.kb_dir = os.path.join(self.tmpdir, 'kb')
+        os.makedirs(self.kb_dir)
+        self.manifest = os.path.join(self.tmpdir, 'manifest.json')
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir, 'kb.db')
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        # No cache, so every ingested chunk reaches the provider
+        self.provider = CountingEmbeddings()
+        service = EmbeddingService(self.provider, MemoryLRUCache(0), batch_size=16, concurrency=1)
+        patches = [
+            mock.patch.object(rag, 'embedding_service', service),
+            mock.patch.object(rag, 'RAG_INDEX_PATH', ''),
+            mock.patch.object(auto_loader, 'rag_system', rag.SimpleRAG()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write(self, name, text):
+        with open(os.path.join(self.kb_dir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def sync(self, **kwargs):
+        return auto_loader.sync_knowledge_base(self.kb_dir, self.manifest, **kwargs)
+
+    def sources(self):
+        return sorted(source for (source,) in db.session.query(KnowledgeDocument.source).distinct())
+
+    def test_only_changed_files_are_reprocessed(self):
+        self.write('breath.md', "Breath support and steady airflow. " * 60)
+        self.write('resonance.txt', "Forward resonance and bright placement. " * 60)
+        self.write('notes.docx', "ignored")
+        summary = self.sync()
+        self.assertEqual((summary["added"], summary["unchanged"]), (2, 0))
+        self.assertEqual(self.sources(), ['breath.md', 'resonance.txt'])
+        embedded = self.provider.texts
+
+        # Nothing changed: no file is read, nothing embedded
+        summary = self.sync()
+        self.assertEqual(summary["unchanged"], 2)
+        self.assertEqual(self.provider.texts, embedded)
+
+        # Touched but identical content: the hash check avoids re-embedding
+        path = os.path.join(self.kb_dir, 'breath.md')
+        os.utime(path, (0, 12345))
+        self.assertEqual(self.sync()["unchanged"], 2)
+        self.assertEqual(self.provider.texts, embedded)
+
+        # Edited: re-ingested, and the old chunks are replaced
+        old_count = KnowledgeDocument.query.filter_by(source='breath.md').count()
+        self.write('breath.md', "Breath support, rewritten and shorter. " * 30)
+        summary = self.sync()
+        self.assertEqual(summary["updated"], 1)
+        self.assertGreater(self.provider.texts, embedded)
+        self.assertLess(KnowledgeDocument.query.filter_by(source='breath.md').count(), old_count)
+
+        # Deleted: its chunks go too
+        os.remove(os.path.join(self.kb_dir, 'resonance.txt'))
+        self.assertEqual(self.sync()["removed"], 1)
+        self.assertEqual(self.sources(), ['breath.md'])
+
+    def test_adopts_documents_ingested_before_the_manifest(self):
+        self.write('legacy.md', "Legacy handout on vocal fry and onset. " * 40)
+        auto_loader.rag_system.add_document("Legacy handout on vocal fry and onset. " * 40, source='legacy.md')
+        embedded = self.provider.texts
+        summary = self.sync()
+        self.assertEqual(summary["adopted"], 1)
+        self.assertEqual(self.provider.texts, embedded)
+
+    def test_held_lock_skips_the_run(self):
+        self.write('a.md', "Some text about twang and brightness. " * 40)
+        with auto_loader.IndexLock(self.manifest + '.lock') as lock:
+            self.assertTrue(lock.acquired)
+            self.assertIsNone(self.sync())
+        self.assertEqual(self.sync()["added"], 1)
+
+
+    def test_default_manifest_lives_in_the_instance_dir(self):
+        instance_dir = os.path.join(self.tmpdir, 'instance')
+        with mock.patch.object(instance, 'INSTANCE_DIR', instance_dir):
+            path = auto_loader.default_manifest_path(self.kb_dir)
+            self.assertEqual(os.path.dirname(path), instance_dir)
+            # One manifest per database: another database has not ingested anything yet
+            other = Flask(__name__)
+            other.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir, 'other.db')
+            db.init_app(other)
+            with other.app_context():
+                self.assertNotEqual(auto_loader.default_manifest_path(self.kb_dir), path)
+
+            self.write('a.md', "Some text about twang and brightness. " * 40)
+            self.assertEqual(auto_loader.sync_knowledge_base(self.kb_dir)["added"], 1)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(os.listdir(self.kb_dir), ['a.md'])
+
+    def test_windows_commit_before_the_next_embedding_call(self):
+        db_path = os.path.join(self.tmpdir, 'kb.db')
+        locked = []
+
+        class ProbingEmbeddings(CountingEmbeddings):
+            def embed(self, texts, task_type="retrieval_document"):
+                # Another writer must get in while we wait on the provider
+                probe = sqlite3.connect(db_path, timeout=0)
+                try:
+                    probe.execute("BEGIN IMMEDIATE")
+                    probe.execute("ROLLBACK")
+                except sqlite3.OperationalError:
+                    locked.append(len(texts))
+                finally:
+                    probe.close()
+                return super().embed(texts, task_type)
+
+        service = EmbeddingService(ProbingEmbeddings(), MemoryLRUCache(0), batch_size=16, concurrency=1)
+        with mock.patch.object(rag, 'embedding_service', service), mock.patch.object(rag, 'RAG_INGEST_WINDOW', 2):
+            chunks = [f"Chunk {i} about resonance, breath support and vocal weight." for i in range(5)]
+            self.assertEqual(auto_loader.rag_system.add_chunks(chunks, source='windows.md'), 5)
+        self.assertEqual(locked, [])
+
+    def test_failed_ingestion_leaves_no_partial_rows(self):
+        def chunks():
+            for i in range(5):
+                yield f"Chunk {i} about resonance, breath support and vocal weight."
+            raise ValueError("unreadable page")
+
+        with mock.patch.object(rag, 'RAG_INGEST_WINDOW', 2):
+            self.assertEqual(auto_loader.rag_system.add_chunks(chunks(), source='broken.md'), 0)
+        self.assertGreater(self.provider.texts, 0)
+        self.assertEqual(KnowledgeDocument.query.filter_by(source='broken.md').count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.pitch_engines import available_pitch_engines, estimate_pitch, frame_count
+
+
+class TestPitchEngines(unittest.TestCase):
+    def setUp(self):
+        self.sr = 16000
+        t = np.arange(int(1.2 * self.sr)) / self.sr
+        phase = 2 * np.pi * 220.0 * t
+        self.y = 0.3 * sum(np.sin(k * phase) / k for k in range(1, 6))
+        # Silent gap in the middle
+        self.y[int(0.5 * self.sr):int(0.8 * self.sr)] = 0.0
+
+    def test_engines_share_grid_and_agree(self):
+        n_frames = frame_count(len(self.y))
+        for engine in available_pitch_engines():
+            with self.subTest(engine=engine):
+                f0 = estimate_pitch(self.y, self.sr, engine=engine)
+                self.assertEqual(len(f0), n_frames)
+                # Steady voiced frames read 220 Hz
+                voiced = f0[5:12]
+                self.assertTrue(np.all(np.abs(voiced - 220.0) < 2.0), voiced)
+                # Frames in the middle of the gap are unvoiced
+                gap = f0[int(0.6 * self.sr) // 512:int(0.7 * self.sr) // 512]
+                self.assertTrue(np.all(np.isnan(gap)), gap)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            estimate_pitch(self.y, self.sr, engine='crepe')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.extensions import db
+from app.services.analysis_cache import NullCache
+from app.services.embeddings import EmbeddingService, HashingEmbeddings
+from app.utils import rag
+from app.utils.query_cache import QueryCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_normalized_questions_share_a_key(self):
+        self.assertEqual(normalize_query("How do I raise my pitch?"), "how do i raise my pitch")
+        self.assertEqual(normalize_query("  how do I raise   my PITCH "), "how do i raise my pitch")
+        self.assertNotEqual(normalize_query("raise pitch"), normalize_query("lower pitch"))
+
+    def test_lru_eviction_ttl_and_counters(self):
+        clock = FakeClock()
+        cache = QueryCache(max_entries=2, ttl=10, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)  # evicts b, the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), {"entries": 1, "hits": 2, "misses": 2, "hit_rate": 0.5})
+
+        disabled = QueryCache(max_entries=0)
+        disabled.set("a", 1)
+        self.assertIsNone(disabled.get("a"))
+
+
+
+class TestCachedRetrieval(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.provider = HashingEmbeddings(dim=64)
+        self.service = EmbeddingService(self.provider, NullCache(), batch_size=8, concurrency=1)
+        for patch in (mock.patch.object(rag, 'embedding_service', self.service),
+                      mock.patch.object(rag, 'RAG_INDEX_PATH', '')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.rag = rag.SimpleRAG()
+        self.rag.add_document("Raising your pitch starts with lighter vocal weight and a brighter resonance. " * 8,
+                              source="pitch.md")
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_repeated_questions_hit_and_new_documents_invalidate(self):
+        first = self.rag.query("How do I raise my pitch?", k=2)
+        calls = self.service.stats()["provider_calls"]
+        second = self.rag.query("how do i raise my pitch", k=2)
+        self.assertEqual(second, first)
+        self.assertEqual(self.service.stats()["provider_calls"], calls)
+        stats = self.rag.cache_stats()
+        self.assertEqual(stats["query_results"]["hits"], 1)
+        self.assertIsNotNone(stats["latency"]["cached_avg_ms"])
+
+        # A new document changes the index version: results are recomputed,
+        # but the query embedding is still reused
+        self.rag.add_document("Forward resonance and twang make the voice sound brighter and higher. " * 8,
+                              source="resonance.md")
+        third = self.rag.query("How do I raise my pitch?", k=2)
+        self.assertEqual({r["source"] for r in third}, {"pitch.md", "resonance.md"})
+        self.assertEqual(self.rag.cache_stats()["query_embeddings"]["hits"], 1)
+        self.assertEqual(self.service.stats()["provider_calls"], calls + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
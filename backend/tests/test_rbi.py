@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.voice_quality_analysis import score_rbi_frames, smooth_rbi, to_json_safe
+
+
+class TestRbiHelpers(unittest.TestCase):
+    def test_smooth_rbi_matches_recursive_ema(self):
+        values = np.random.default_rng(0).uniform(0, 100, size=200)
+        expected = []
+        last = 50.0
+        for v in values:
+            last = 0.2 * v + 0.8 * last
+            expected.append(last)
+        np.testing.assert_allclose(smooth_rbi(values, initial=50.0), expected, rtol=1e-12)
+
+    def test_smooth_rbi_empty(self):
+        self.assertEqual(len(smooth_rbi([])), 0)
+
+    def test_score_accepts_scalar_and_per_frame_bounds(self):
+        rng = np.random.default_rng(1)
+        ratios, centroids, tilts = rng.standard_normal((3, 50))
+        f0s = rng.uniform(100, 350, size=50)
+        stats = {}
+        for name, values in (("ratio", ratios), ("centroid", centroids), ("tilt", tilts)):
+            stats[f"{name}_min"] = values.min()
+            stats[f"{name}_max"] = values.max()
+        per_frame = {key: np.full(50, value) for key, value in stats.items()}
+
+        scores = score_rbi_frames(ratios, centroids, tilts, f0s, stats)
+        np.testing.assert_allclose(scores, score_rbi_frames(ratios, centroids, tilts, f0s, per_frame))
+        self.assertTrue(np.all((scores >= 0) & (scores <= 100)))
+
+    def test_degenerate_bounds_normalise_to_midpoint(self):
+        stats = {key: 1.0 for key in ("ratio_min", "ratio_max", "centroid_min",
+                                      "centroid_max", "tilt_min", "tilt_max")}
+        score = score_rbi_frames(np.array([1.0]), np.array([1.0]), np.array([1.0]), np.array([120.0]), stats)
+        # 0.5 on every spectral feature, F0 at the bottom of its range
+        self.assertAlmostEqual(float(score[0]), 45.0)
+
+    def test_to_json_safe_maps_nan_to_none(self):
+        result = {"timeline": {"rbi": np.array([np.nan, 42.5], dtype=np.float32), "labels": ["silence", "neutral"]}}
+        self.assertEqual(to_json_safe(result), {"timeline": {"rbi": [None, 42.5], "labels": ["silence", "neutral"]}})
+
+
+if __name__ == '__main__':
+    unittest.main()
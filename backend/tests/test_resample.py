@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import scipy.signal
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.resample import StreamingResampler, polyphase_ratio, resample_audio
+
+
+class TestStreamingResampler(unittest.TestCase):
+    def _stream(self, x, src_sr, chunk_sizes):
+        resampler = StreamingResampler(src_sr, 16000)
+        parts = []
+        i = 0
+        for n in chunk_sizes:
+            parts.append(resampler.process(x[i:i + n]))
+            i += n
+        parts.append(resampler.process(x[i:]))
+        parts.append(resampler.flush())
+        return np.concatenate(parts)
+
+    def test_chunked_output_matches_whole_signal(self):
+        rng = np.random.default_rng(0)
+        for src_sr in (48000, 44100, 22050, 8000):
+            x = rng.standard_normal(src_sr)
+            chunks = rng.integers(0, 2000, size=20)
+            y = self._stream(x, src_sr, chunks)
+
+            up, down = polyphase_ratio(src_sr, 16000)
+            expected = scipy.signal.resample_poly(x, up, down)
+            self.assertEqual(len(y), len(expected))
+            np.testing.assert_allclose(y, expected, atol=1e-9)
+
+    def test_no_discontinuity_at_chunk_boundaries(self):
+        sr = 48000
+        t = np.arange(sr) / sr
+        x = np.sin(2 * np.pi * 220 * t)
+        y = self._stream(x, sr, [960] * 40)
+        # A clean 220 Hz tone never jumps by more than one sample's worth of slope
+        max_step = 2 * np.pi * 220 / 16000
+        self.assertLess(np.max(np.abs(np.diff(y[100:-100]))), max_step * 1.05)
+
+    def test_equal_rates_pass_through(self):
+        x = np.arange(10, dtype=float)
+        resampler = StreamingResampler(16000, 16000)
+        np.testing.assert_array_equal(resampler.process(x), x)
+
+    def test_resample_audio_length(self):
+        y = resample_audio(np.zeros(44100), 44100, 16000)
+        self.assertEqual(len(y), 16000)
+
+
+if __name__ == '__main__':
+    unittest.main()
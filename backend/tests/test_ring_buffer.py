@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.ring_buffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_latest_returns_newest_samples_in_order(self):
+        buf = RingBuffer(8)
+        buf.append(np.arange(5))
+        buf.append(np.arange(5, 11))
+
+        self.assertEqual(len(buf), 8)
+        np.testing.assert_array_equal(buf.latest(), np.arange(3, 11, dtype=np.float32))
+        np.testing.assert_array_equal(buf.latest(3), [8, 9, 10])
+
+    def test_matches_concatenate_and_trim(self):
+        rng = np.random.default_rng(0)
+        buf = RingBuffer(100)
+        reference = np.zeros(0, dtype=np.float32)
+        written = 0
+        for size in rng.integers(0, 140, size=50):
+            chunk = rng.standard_normal(size).astype(np.float32)
+            self.assertEqual(buf.append(chunk), size)
+            written += size
+            reference = np.concatenate([reference, chunk])[-100:]
+            np.testing.assert_array_equal(buf.latest(), reference)
+        self.assertEqual(buf.total_written, written)
+
+    def test_latest_is_a_read_only_view(self):
+        buf = RingBuffer(4)
+        buf.append([1, 2, 3])
+        view = buf.latest()
+        self.assertFalse(view.flags.writeable)
+        self.assertFalse(view.flags.owndata)
+
+    def test_append_does_not_reallocate(self):
+        buf = RingBuffer(16)
+        storage = buf._data
+        for _ in range(10):
+            buf.append(np.ones(7))
+        self.assertIs(buf._data, storage)
+
+    def test_clear(self):
+        buf = RingBuffer(4)
+        buf.append([1, 2, 3])
+        buf.clear()
+        self.assertEqual(len(buf), 0)
+        self.assertEqual(buf.latest().size, 0)
+        self.assertEqual(buf.total_written, 0)
+        buf.append([4, 5])
+        self.assertEqual(buf.total_written, 2)
+        self.assertEqual(buf.latest().tolist(), [4, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import parselmouth
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.analysis_context import pitch_frame_times, sample_pitch
+
+
+class TestSamplePitch(unittest.TestCase):
+    def setUp(self):
+        sr = 16000
+        t = np.arange(int(1.5 * sr)) / sr
+        tone = np.sin(2 * np.pi * np.cumsum(180 + 40 * np.sin(2 * t)) / sr)
+        # Voiced / silent / voiced, so the track has unvoiced gaps
+        tone[int(0.5 * sr):int(0.8 * sr)] = 0.0
+        self.pitch = parselmouth.Sound(tone, sr).to_pitch(time_step=0.01, pitch_floor=75, pitch_ceiling=600)
+
+    def test_matches_get_value_at_time(self):
+        times = np.linspace(-0.1, 1.6, 997)
+        expected = np.array([self.pitch.get_value_at_time(t) for t in times])
+        np.testing.assert_array_equal(sample_pitch(self.pitch, times), expected)
+
+    def test_frame_centres_give_frame_values(self):
+        values = sample_pitch(self.pitch, pitch_frame_times(self.pitch))
+        expected = [self.pitch.get_value_in_frame(i + 1) for i in range(self.pitch.n_frames)]
+        np.testing.assert_array_equal(values, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.span_stats import PrefixStats, frame_range, span_means
+
+
+class TestPrefixStats(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.values = 200.0 + 15.0 * rng.standard_normal(500)
+        self.values[rng.random(500) < 0.3] = np.nan
+        self.stats = PrefixStats(self.values)
+
+    def test_matches_nan_aware_numpy(self):
+        for i0, i1 in [(0, 500), (10, 60), (123, 124), (250, 499)]:
+            segment = self.values[i0:i1]
+            if np.all(np.isnan(segment)):
+                continue
+            self.assertEqual(self.stats.count(i0, i1), np.count_nonzero(~np.isnan(segment)))
+            self.assertAlmostEqual(self.stats.sum(i0, i1), np.nansum(segment), places=6)
+            self.assertAlmostEqual(self.stats.mean(i0, i1), np.nanmean(segment), places=9)
+            self.assertAlmostEqual(self.stats.std(i0, i1), np.nanstd(segment), places=6)
+
+    def test_empty_or_unvoiced_range_is_nan(self):
+        values = np.array([1.0, np.nan, np.nan, 4.0])
+        stats = PrefixStats(values)
+        self.assertTrue(np.isnan(stats.mean(1, 3)))
+        self.assertTrue(np.isnan(stats.std(2, 2)))
+
+    def test_vectorized_ranges(self):
+        i0 = np.array([0, 100, 300])
+        i1 = np.array([50, 200, 500])
+        expected = [np.nanmean(self.values[a:b]) for a, b in zip(i0, i1)]
+        np.testing.assert_allclose(self.stats.mean(i0, i1), expected)
+
+
+class TestFrameRange(unittest.TestCase):
+    def test_half_open_time_span(self):
+        times = np.arange(10) * 0.1
+        self.assertEqual(frame_range(times, 0.25, 0.55), (3, 6))
+        self.assertEqual(frame_range(times, 0.3, 0.6), (3, 6))
+
+    def test_min_frames_widens_short_spans(self):
+        times = np.arange(10) * 0.1
+        self.assertEqual(frame_range(times, 0.31, 0.33, min_frames=1), (4, 5))
+        # A span past the end still covers the last frame
+        self.assertEqual(frame_range(times, 2.0, 2.5, min_frames=1), (9, 10))
+
+
+class TestSpanMeans(unittest.TestCase):
+    def test_matches_per_span_scan(self):
+        times = np.arange(100) * 0.01
+        values = np.linspace(0.0, 99.0, 100)
+        values[40:60] = np.nan
+        counts, means = span_means(times, {"v": values}, [0.1, 0.45, 0.5, 2.0], [0.2, 0.55, 0.7, 3.0])
+        np.testing.assert_array_equal(counts, [10, 10, 20, 0])
+        self.assertAlmostEqual(means["v"][0], np.mean(values[10:20]))
+        # All-NaN and empty spans have no mean
+        self.assertTrue(np.isnan(means["v"][1]))
+        self.assertAlmostEqual(means["v"][2], np.mean(values[60:70]))
+        self.assertTrue(np.isnan(means["v"][3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
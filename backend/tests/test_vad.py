@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.vad import SpeechSegments, detect_speech
+
+
+class TestVAD(unittest.TestCase):
+    def setUp(self):
+        self.sr = 16000
+        rng = np.random.default_rng(0)
+
+        def tone(d):
+            t = np.arange(int(d * self.sr)) / self.sr
+            return 0.3 * np.sin(2 * np.pi * 200 * t)
+
+        def silence(d):
+            return 1e-4 * rng.standard_normal(int(d * self.sr))
+
+        # Speech at 1.0-2.0 s and 3.5-4.0 s
+        self.y = np.concatenate([silence(1.0), tone(1.0), silence(1.5), tone(0.5), silence(1.0)])
+
+    def test_finds_padded_speech_spans(self):
+        speech = detect_speech(self.y, self.sr)
+        spans = speech.spans / self.sr
+        self.assertEqual(len(spans), 2)
+        np.testing.assert_allclose(spans, [[0.85, 2.15], [3.35, 4.15]], atol=0.03)
+        self.assertLess(speech.speech_fraction, 0.5)
+
+        trimmed = speech.trim(self.y)
+        self.assertEqual(len(trimmed), speech.n_speech_samples)
+
+    def test_time_mapping_round_trip(self):
+        speech = detect_speech(self.y, self.sr)
+        original = np.array([1.0, 1.5, 3.6, 3.9])
+        trimmed = speech.to_trimmed(original)
+        np.testing.assert_allclose(speech.to_original(trimmed), original)
+        # Times in a cut silence have no trimmed position
+        self.assertTrue(np.isnan(speech.to_trimmed(2.8)))
+
+        # A join maps to the later span's start, or the earlier span's end for end times
+        join = (speech.spans[0, 1] - speech.spans[0, 0]) / self.sr
+        self.assertAlmostEqual(float(speech.to_original(join)), speech.spans[1, 0] / self.sr)
+        self.assertAlmostEqual(float(speech.to_original(join, is_end=True)), speech.spans[0, 1] / self.sr)
+
+    def test_continuous_speech_is_left_whole(self):
+        t = np.arange(2 * self.sr) / self.sr
+        speech = detect_speech(0.3 * np.sin(2 * np.pi * 200 * t), self.sr)
+        self.assertTrue(speech.is_whole)
+
+        restored = SpeechSegments.from_list(detect_speech(self.y, self.sr).to_list(), self.sr, len(self.y))
+        np.testing.assert_array_equal(restored.spans, detect_speech(self.y, self.sr).spans)
+
+
+if __name__ == '__main__':
+    unittest.main()
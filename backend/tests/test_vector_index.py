@@ -0,0 +1,157 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from flask import Flask
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.extensions import db
+from app.models import KnowledgeBaseState
+from app.services.analysis_cache import NullCache
+from app.services.embeddings import EmbeddingService, HashingEmbeddings
+from app.utils import instance, rag
+from app.utils.vector_index import VectorIndex
+
+
+def brute_force(ids, vectors, query, k):
+    """The old per-document cosine loop."""
+    scored = []
+    for doc_id, vec in zip(ids, vectors):
+        score = np.dot(query, vec) / (np.linalg.norm(query) * np.linalg.norm(vec))
+        scored.append((doc_id, float(score)))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:k]
+
+
+class TestVectorIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.ids = np.arange(1, 501) * 7
+        self.vectors = rng.standard_normal((500, 32)) * rng.uniform(0.5, 3.0, (500, 1))
+        self.query = rng.standard_normal(32)
+        self.index = VectorIndex()
+        # Added in batches to exercise growth
+        for start in range(0, 500, 64):
+            self.index.add(self.ids[start:start + 64], self.vectors[start:start + 64])
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_matches_brute_force_cosine(self):
+        self.assertEqual(len(self.index), 500)
+        for k in (1, 3, 10, 500, 600):
+            hits = self.index.search(self.query, k)
+            expected = brute_force(self.ids, self.vectors, self.query, k)
+            self.assertEqual([doc_id for doc_id, _ in hits], [doc_id for doc_id, _ in expected])
+            np.testing.assert_allclose([s for _, s in hits], [s for _, s in expected], atol=1e-5)
+
+    def test_remove_and_dimension_checks(self):
+        best = self.index.search(self.query, 1)[0][0]
+        version = self.index.version
+        self.assertEqual(self.index.remove([best, 99999]), 1)
+        self.assertGreater(self.index.version, version)
+        self.assertNotIn(best, [doc_id for doc_id, _ in self.index.search(self.query, 10)])
+
+        with self.assertRaises(ValueError):
+            self.index.add([1], np.ones((1, 8)))
+        with self.assertRaises(ValueError):
+            self.index.search(np.ones(8))
+        self.assertEqual(VectorIndex().search(self.query), [])
+
+    def test_snapshot_is_memory_mapped_and_writable_after_copy(self):
+        path = os.path.join(self.tmpdir, 'index')
+        self.index.meta['signature'] = [500, 3500]
+        self.index.save(path)
+
+        loaded = VectorIndex.load(path)
+        self.assertIsInstance(loaded._vectors, np.memmap)
+        self.assertEqual(loaded.meta, {'signature': [500, 3500]})
+        self.assertEqual(loaded.search(self.query, 5), self.index.search(self.query, 5))
+
+        # The first write copies the read-only mapping
+        loaded.add([5000], self.query)
+        self.assertEqual(loaded.search(self.query, 1)[0][0], 5000)
+        self.assertEqual(len(VectorIndex.load(path)), 500)
+
+        self.assertIsNone(VectorIndex.load(os.path.join(self.tmpdir, 'missing')))
+
+
+class TestRagIndexSync(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir, 'kb.db')
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        service = EmbeddingService(HashingEmbeddings(dim=64), NullCache(), batch_size=8, concurrency=1)
+        for patch in (mock.patch.object(rag, 'embedding_service', service),
+                      mock.patch.object(rag, 'RAG_INDEX_PATH', None),
+                      mock.patch.object(rag, 'RAG_INDEX_REFRESH', 0),
+                      mock.patch.object(instance, 'INSTANCE_DIR', os.path.join(self.tmpdir, 'instance'))):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_snapshot_path_is_per_database_in_the_instance_dir(self):
+        path = rag.SimpleRAG()._index_path()
+        self.assertEqual(os.path.dirname(path), os.path.join(self.tmpdir, 'instance'))
+        other = Flask(__name__)
+        other.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir, 'other.db')
+        db.init_app(other)
+        with other.app_context():
+            self.assertNotEqual(rag.SimpleRAG()._index_path(), path)
+        memory = Flask(__name__)
+        memory.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(memory)
+        with memory.app_context():
+            self.assertEqual(rag.SimpleRAG()._index_path(), '')
+
+    def test_reused_ids_do_not_leave_a_stale_index(self):
+        writer, reader = rag.SimpleRAG(), rag.SimpleRAG()
+        writer.add_document("Breath support keeps long phrases steady and relaxed. " * 3, source='breath.md')
+        writer.add_document("Vocal weight is lightened by thinning the folds gently. " * 3, source='weight.md')
+        self.assertEqual(reader.query("breath support for long phrases", k=1)[0]["source"], 'breath.md')
+
+        # SQLite hands the deleted max id out again: same row count, same max id
+        weight_ids = writer.document_ids('weight.md')
+        writer.remove_documents(weight_ids)
+        twang = "Twang narrows the epilarynx for a brighter, ringing tone. " * 3
+        writer.add_document(twang, source='twang.md')
+        self.assertEqual(writer.document_ids('twang.md'), weight_ids)
+
+        top = reader.query(twang, k=1)[0]
+        self.assertEqual(top["source"], 'twang.md')
+        self.assertAlmostEqual(top["score"], 1.0, places=4)
+
+    def test_generation_row_is_created_once(self):
+        writer = rag.SimpleRAG()
+        # create_all leaves no state row; the first write creates it
+        writer._bump_generation()
+        self.assertEqual(writer._table_signature()[2], 1)
+        db.session.commit()
+
+        # A worker that lost the race to insert the row just counts its write
+        writer._ensure_state_row()
+        writer._bump_generation(removal=True)
+        db.session.commit()
+        state = db.session.get(KnowledgeBaseState, 1)
+        self.assertEqual((state.generation, state.removal_generation), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
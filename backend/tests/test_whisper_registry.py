@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+import unittest
+
+# Adjust path to import the app package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.whisper_registry import WhisperRegistry
+
+
+class CountingLoader:
+    """Stands in for WhisperModel's constructor; records every load."""
+
+    def __init__(self):
+        self.loads = []
+        self._lock = threading.Lock()
+
+    def __call__(self, model_size, **kwargs):
+        with self._lock:
+            self.loads.append((model_size, kwargs))
+        return object()
+
+
+class TestWhisperRegistry(unittest.TestCase):
+    def test_one_shared_model_per_key(self):
+        loader = CountingLoader()
+        registry = WhisperRegistry(model_size='tiny', loader=loader)
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(registry.get())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(loader.loads), 1)
+        self.assertEqual(len({id(m) for m in models}), 1)
+        self.assertEqual(loader.loads[0], ('tiny', {'device': 'cpu', 'compute_type': 'int8'}))
+
+        registry.get(model_size='base')
+        self.assertEqual(len(loader.loads), 2)
+        stats = registry.stats()
+        self.assertEqual(sorted(m['model_size'] for m in stats['models']), ['base', 'tiny'])
+        self.assertEqual(sum(m['uses'] for m in stats['models']), 9)
+
+    def test_idle_unload_skips_models_in_use(self):
+        loader = CountingLoader()
+        registry = WhisperRegistry(loader=loader, idle_unload=30)
+        with registry.use() as model:
+            self.assertIsNotNone(model)
+            self.assertEqual(registry.unload_idle(now=10 ** 12), 0)
+        self.assertEqual(registry.unload_idle(now=10 ** 12), 1)
+        self.assertEqual(registry.stats()['models'], [])
+        registry.get()
+        self.assertEqual(len(loader.loads), 2)
+
+    def test_max_models_evicts_least_recently_used_idle_model(self):
+        loader = CountingLoader()
+        registry = WhisperRegistry(model_size='tiny', loader=loader, max_models=2)
+        unloaded = []
+        registry.on_unload(unloaded.append)
+        tiny = registry.get('tiny')
+        base = registry.get('base')
+        registry.get('tiny')  # base is now the least recently used
+
+        small = registry.get('small')
+        self.assertEqual(unloaded, [base])
+        self.assertEqual(sorted(m['model_size'] for m in registry.stats()['models']), ['small', 'tiny'])
+
+        # A model in use is never evicted, even if it is the oldest
+        with registry.use('tiny') as model:
+            self.assertIs(model, tiny)
+            registry.get('medium')
+        self.assertEqual(unloaded, [base, small])
+        self.assertEqual(len(loader.loads), 4)
+
+    def test_failed_load_yields_none(self):
+        def failing_loader(model_size, **kwargs):
+            raise RuntimeError("no model files")
+
+        registry = WhisperRegistry(loader=failing_loader)
+        with registry.use() as model:
+            self.assertIsNone(model)
+
+
+if __name__ == '__main__':
+    unittest.main()
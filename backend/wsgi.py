@@ -4,6 +4,11 @@ import os
 app = create_app()
 
 from app.extensions import socketio
+from app.utils.auto_loader import start_background_indexer
+
+# Index new/changed knowledge base files without delaying startup (once per
+# web worker; the indexer lock lets only one of them work at a time)
+start_background_indexer(app)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))